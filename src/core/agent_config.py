@@ -57,6 +57,25 @@ __all__ = [
     "EMPTY_STATE_MESSAGE",
     "PROCESS_STATE_FILE",
     "PROCESS_HISTORY_FILE",
+    "REVIEW_CACHE_FILE",
+    "COMMIT_INDEX_DIR",
+    "TRACE_DIR",
+    "LLM_PRICING",
+    "TOKEN_LEDGER_FILE",
+    "TOKEN_LEDGER_MAX_BYTES",
+    "TOKEN_LEDGER_BACKUP_COUNT",
+    "TOKEN_LEDGER_CURRENCY",
+    "GIT_LARGE_REPO_AUTO_ENABLE",
+    "METRICS_PROMETHEUS_PORT",
+    "METRICS_PROMETHEUS_HOST",
+    "METRICS_TEXTFILE",
+    "METRICS_TEXTFILE_INTERVAL",
+    "RETRY_BUDGET_RATIO",
+    "RETRY_BUDGET_WINDOW",
+    "RETRY_BUDGET_MIN_RETRIES",
+    "CONTEXT_TOKEN_BUDGETS",
+    "DEFAULT_CONTEXT_TOKEN_BUDGET",
+    "FILE_CACHE_MB",
 ]
 
 # ============================================
@@ -123,6 +142,13 @@ LLM_CONFIG = _config.get("llm_configs", {}).get("primary", {})
 # 代码生成专用LLM配置 - 用于生成命令和代码
 LLM_CONFIG2 = _config.get("llm_configs", {}).get("secondary", {})
 
+# 模型单价（每百万 token）：模型名 -> {"prompt", "completion", "cached_prompt"}，未配置时费用按 0 计
+LLM_PRICING = {
+    cfg["model"]: cfg["pricing"]
+    for cfg in (LLM_CONFIG, LLM_CONFIG2)
+    if cfg.get("model") and cfg.get("pricing")
+}
+
 # 默认请求头
 DEFAULT_HEADERS = _config.get("headers", {})
 
@@ -180,6 +206,46 @@ AUTO_SAVE_DAILY_REPORT = _config.get("daily_report", {}).get("auto_save", False)
 # 统一的空状态提示语
 EMPTY_STATE_MESSAGE = _config.get("messages", {}).get("empty_state", "没有运行的项目")
 
+# ============================================
+# Git 配置
+# ============================================
+
+# 检测到大仓库时是否自动开启 core.fsmonitor / core.untrackedCache（写入仓库本地配置）
+GIT_LARGE_REPO_AUTO_ENABLE = _config.get("git", {}).get("large_repo_auto_enable", False)
+
+# ============================================
+# 指标导出配置（Prometheus / OpenMetrics）
+# ============================================
+
+_metrics_cfg = _config.get("metrics", {})
+
+# HTTP 抓取端口（0 表示不启动）
+METRICS_PROMETHEUS_PORT = int(_metrics_cfg.get("prometheus_port", 0) or 0)
+
+# HTTP 监听地址（默认只监听本机）
+METRICS_PROMETHEUS_HOST = _metrics_cfg.get("prometheus_host", "127.0.0.1")
+
+# node_exporter textfile 路径（空表示不写入）
+METRICS_TEXTFILE = _metrics_cfg.get("prometheus_textfile", "")
+
+# textfile 写入间隔（秒）
+METRICS_TEXTFILE_INTERVAL = float(_metrics_cfg.get("textfile_interval", 15))
+
+# ============================================
+# 重试预算配置（LLM / MCP / git 网络操作共享）
+# ============================================
+
+_resilience_cfg = _config.get("resilience", {})
+
+# 窗口内重试次数最多为请求数的比例
+RETRY_BUDGET_RATIO = float(_resilience_cfg.get("retry_budget_ratio", 0.1))
+
+# 统计窗口（秒）
+RETRY_BUDGET_WINDOW = int(_resilience_cfg.get("retry_budget_window", 60))
+
+# 每个窗口保底允许的重试次数（低流量时不至于完全不能重试）
+RETRY_BUDGET_MIN_RETRIES = int(_resilience_cfg.get("retry_budget_min_retries", 3))
+
 # ============================================
 # 进程状态与历史配置
 # ============================================
@@ -198,6 +264,68 @@ PROCESS_HISTORY_FILE = _paths_cfg.get(
     os.path.join(os.path.expanduser("~"), ".dnm_process_history.json")
 )
 
+# Code Review 增量缓存文件（按 hunk 缓存审查结果）
+REVIEW_CACHE_FILE = _paths_cfg.get(
+    "review_cache_file",
+    os.path.join(os.path.expanduser("~"), ".dnm", "review_cache.json")
+)
+
+# 提交历史索引目录（每个仓库一个索引文件）
+COMMIT_INDEX_DIR = _paths_cfg.get(
+    "commit_index_dir",
+    os.path.join(os.path.expanduser("~"), ".dnm", "commit_index")
+)
+
+# Token 与费用账本（JSONL，只追加，按大小轮转）
+TOKEN_LEDGER_FILE = _paths_cfg.get(
+    "token_ledger_file",
+    os.path.join(os.path.expanduser("~"), ".dnm", "token_ledger.jsonl")
+)
+
+_ledger_cfg = _config.get("ledger", {})
+
+# 单个账本文件上限（字节）与保留的轮转文件数
+TOKEN_LEDGER_MAX_BYTES = int(_ledger_cfg.get("max_bytes", 10 * 1024 * 1024))
+TOKEN_LEDGER_BACKUP_COUNT = int(_ledger_cfg.get("backup_count", 5))
+
+# 费用报告中的货币符号
+TOKEN_LEDGER_CURRENCY = _ledger_cfg.get("currency", "$")
+
+# 追踪导出目录（Chrome trace-event JSON）
+TRACE_DIR = _paths_cfg.get(
+    "trace_dir",
+    os.path.join(os.path.expanduser("~"), ".dnm", "traces")
+)
+
+# ============================================
+# 文件上下文配置
+# ============================================
+
+# @ 引用文件嵌入提示词时的默认 token 预算
+DEFAULT_CONTEXT_TOKEN_BUDGET = 8000
+
+# 按模型配置的 token 预算（键为模型名，"default" 为兜底）
+CONTEXT_TOKEN_BUDGETS = _config.get("context", {}).get(
+    "token_budgets", {"default": DEFAULT_CONTEXT_TOKEN_BUDGET}
+)
+
+
+def _positive_int(value, default: int) -> int:
+    """解析正整数配置，非法或非正值时回退到默认值"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+# 文件读取缓存的内存上限（MB），环境变量 DNM_FILE_CACHE_MB 优先
+DEFAULT_FILE_CACHE_MB = 64
+FILE_CACHE_MB = _positive_int(
+    os.environ.get("DNM_FILE_CACHE_MB") or _config.get("context", {}).get("file_cache_mb"),
+    DEFAULT_FILE_CACHE_MB,
+)
+
 # ============================================
 # 状态类型定义
 # ============================================
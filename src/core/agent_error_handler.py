@@ -4,7 +4,6 @@ LLM 错误处理和降级策略模块
 """
 
 import time
-import random
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -13,7 +12,9 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage
 
 from src.core.agent_config import LLM_CONFIG, LLM_CONFIG2, DEFAULT_HEADERS
-from src.core.agent_resilience import ErrorContext, ErrorType, FallbackResult, FallbackStrategy
+from src.core.agent_resilience import (
+    ErrorContext, ErrorType, FallbackResult, FallbackStrategy, RetryPolicy, get_retry_budget,
+)
 from src.core.agent_metrics import get_metrics_collector
 
 
@@ -40,6 +41,8 @@ class LLMFallbackHandler:
     
     def __init__(self):
         self.metrics = get_metrics_collector()
+        self.retry_budget = get_retry_budget()
+        self.retry_policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
         
         # 初始化两个 LLM 实例
         self.primary_llm = ChatOpenAI(
@@ -102,6 +105,7 @@ class LLMFallbackHandler:
         )
         
         # 尝试直接调用
+        self.retry_budget.record_request("llm_call")
         with self.metrics.measure_operation("llm_call", model_name) as ctx:
             try:
                 result = current_llm.invoke(messages)
@@ -152,14 +156,22 @@ class LLMFallbackHandler:
     
     def _retry_with_exponential_backoff(self, messages: List, error_context: ErrorContext, 
                                       context_type: str, max_retries: int) -> LLMCallResult:
-        """指数退避重试策略"""
+        """退避重试策略（受进程级重试预算限制，decorrelated jitter 退避）"""
         
+        delay = 0.0
         for attempt in range(max_retries):
-            if attempt > 0:
-                # 计算延迟时间
-                delay = min(2 ** attempt + random.uniform(0, 1), 30)  # 最大30秒
-                print(f"⏱️ 重试延迟: {delay:.1f}s (第 {attempt + 1} 次)")
-                time.sleep(delay)
+            # 重试预算耗尽时立即放弃，交给后续降级策略，避免故障期间放大负载
+            if not self.retry_budget.try_acquire("llm_call"):
+                return LLMCallResult(
+                    success=False,
+                    content="",
+                    model_used=LLM_CONFIG["model"],
+                    error_message="重试预算已耗尽，跳过重试"
+                )
+            
+            delay = self.retry_policy.next_delay(delay)
+            print(f"⏱️ 重试延迟: {delay:.1f}s (第 {attempt + 1} 次)")
+            time.sleep(delay)
             
             try:
                 # 重新尝试原始 LLM
@@ -379,14 +391,17 @@ class LLMFallbackHandler:
                 return {
                     "prompt_tokens": result.usage_metadata.get('input_tokens', 0),
                     "completion_tokens": result.usage_metadata.get('output_tokens', 0),
-                    "total_tokens": result.usage_metadata.get('total_tokens', 0)
+                    "total_tokens": result.usage_metadata.get('total_tokens', 0),
+                    # 命中提示缓存的输入 token
+                    "cached_tokens": (result.usage_metadata.get('input_token_details') or {}).get('cache_read', 0)
                 }
             elif hasattr(result, 'response_metadata') and result.response_metadata:
                 usage = result.response_metadata.get('token_usage', {})
                 return {
                     "prompt_tokens": usage.get('prompt_tokens', 0),
                     "completion_tokens": usage.get('completion_tokens', 0),
-                    "total_tokens": usage.get('total_tokens', 0)
+                    "total_tokens": usage.get('total_tokens', 0),
+                    "cached_tokens": (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
                 }
         except Exception as e:
             print(f"⚠️ 提取 Token 使用信息失败: {e}")
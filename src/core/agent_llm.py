@@ -3,6 +3,7 @@
 集成错误处理、性能监控和降级策略
 """
 
+import time
 from typing import List, Optional, Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage
@@ -10,6 +11,10 @@ from langchain_core.messages import BaseMessage
 from src.core.agent_config import LLM_CONFIG, LLM_CONFIG2, DEFAULT_HEADERS
 from src.core.agent_metrics import get_metrics_collector
 from src.core.agent_error_handler import get_llm_fallback_handler, LLMType, LLMCallResult
+from src.core.token_ledger import get_token_ledger
+
+# 不对应实际模型调用的结果标记（模板回复 / 最终降级 / 简化提示失败），不计入账本
+_NON_LLM_MODELS = ("template", "fallback", "simplified")
 
 
 class EnhancedLLM:
@@ -52,12 +57,14 @@ class EnhancedLLM:
         self.call_count += 1
         
         # 使用降级处理器调用 LLM
+        started = time.time()
         result: LLMCallResult = self.fallback_handler.call_llm_with_fallback(
             messages=messages,
             llm_type=self.llm_type,
             context_type=context_type,
             max_retries=max_retries
         )
+        self._record_ledger(messages, result, (time.time() - started) * 1000, context_type)
         
         # 更新统计信息
         if result.success:
@@ -98,18 +105,39 @@ class EnhancedLLM:
         self.call_count += 1
         
         # 尝试使用原始 LLM 进行流式调用
+        started = time.time()
         try:
             with self.metrics.measure_operation("llm_stream", self.model_name) as ctx:
                 total_content = ""
+                usage = None
+                ttft_ms = None
                 
                 for chunk in self._base_llm.stream(messages):
                     if hasattr(chunk, "content") and chunk.content:
+                        if ttft_ms is None:
+                            # 首个内容块到达时间（TTFT）
+                            ttft_ms = (time.time() - started) * 1000
                         total_content += chunk.content
+                    # 服务端返回 usage 时在最后一个块中
+                    if getattr(chunk, "usage_metadata", None):
+                        usage = self.fallback_handler._extract_token_usage(chunk)
                     yield chunk
                 
                 # 记录成功的流式调用
                 self.success_count += 1
-                ctx["additional_data"] = {"stream_mode": True, "content_length": len(total_content)}
+                if usage:
+                    ctx["token_usage"] = usage
+                entry = get_token_ledger().record_call(
+                    self.model_name, messages, usage, (time.time() - started) * 1000,
+                    context_type=context_type, stream=True, completion_text=total_content
+                )
+                ctx["additional_data"] = {
+                    "stream_mode": True,
+                    "content_length": len(total_content),
+                    "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+                    # 没有 usage 时为估算值（用于 /perf 的 tokens/s）
+                    "completion_tokens": entry.completion_tokens,
+                }
                 
         except Exception as e:
             print(f"🚨 流式调用失败: {self.model_name} - {str(e)}")
@@ -122,6 +150,7 @@ class EnhancedLLM:
                     context_type=context_type,
                     max_retries=max_retries
                 )
+                self._record_ledger(messages, result, (time.time() - started) * 1000, context_type)
                 
                 if result.success:
                     # 模拟流式输出：将完整响应分块返回
@@ -155,6 +184,19 @@ class EnhancedLLM:
                 
                 yield StreamChunk("抱歉，AI 服务暂时不可用，请稍后重试。")
     
+    def _record_ledger(self, messages: List[BaseMessage], result: LLMCallResult,
+                       latency_ms: float, context_type: str):
+        """把一次（可能经过降级的）调用写入 Token 账本"""
+        if result.model_used in _NON_LLM_MODELS or not result.model_used:
+            return
+        get_token_ledger().record_call(
+            result.model_used, messages, result.token_usage, latency_ms,
+            success=result.success,
+            context_type=context_type,
+            fallback=result.strategy_used is not None,
+            completion_text=result.content,
+        )
+    
     def get_stats(self) -> Dict[str, Any]:
         """获取 LLM 统计信息"""
         success_rate = self.success_count / max(self.call_count, 1)
@@ -3,21 +3,51 @@
 用于收集 LLM 调用、工具执行、命令执行等性能数据
 """
 
+import math
+import os
+import tempfile
 import time
 import json
 import threading
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, ContextManager
+from itertools import islice
+from typing import Callable, Deque, Dict, List, Optional, Any, ContextManager, Tuple
 from dataclasses import dataclass, field, asdict
 from contextlib import contextmanager
 from pathlib import Path
 
+from src.core.agent_tracing import get_tracer
+
+
+# 直方图桶的相对宽度：相邻桶边界之比为 2^(1/8)，分位数相对误差约 4.5%
+_HISTOGRAM_GAMMA = 2 ** (1 / 8)
+_LOG_GAMMA = math.log(_HISTOGRAM_GAMMA)
+
+# 报告中展示的分位数
+REPORT_PERCENTILES = (50, 90, 99)
+
+# 后台线程汇总待处理样本的间隔（秒）
+FLUSH_INTERVAL = 1.0
+
+# 待处理样本超过该数量时由记录线程直接汇总（没有后台线程时也保持有界）
+MAX_PENDING_METRICS = 1024
+
+# 健康评估使用的滑动窗口（秒）：1 分钟 / 5 分钟 / 15 分钟
+HEALTH_WINDOWS = (60, 300, 900)
+
+# 滑动窗口的桶宽（秒）
+WINDOW_BUCKET_SECONDS = 10
+
+# 延迟 SLO 阈值：超过该耗时的操作计为慢操作
+SLO_LATENCY_MS = 5000
+
 
 @dataclass
 class PerformanceMetrics:
     """性能指标数据结构"""
     timestamp: datetime
-    operation_type: str  # 'llm_call', 'tool_call', 'command_exec', 'file_op'
+    operation_type: str  # 'llm_call', 'tool_call', 'command_exec', 'file_op', 'git_call'
     operation_name: str
     duration_ms: float
     success: bool = True
@@ -63,15 +93,230 @@ class SessionStats:
         return (datetime.now() - self.start_time).total_seconds() / 60
 
 
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图
+
+    记录为 O(1)（计算桶下标后计数加一），内存只与出现过的桶数有关；
+    分位数取所在桶的几何中点，相对误差约 4.5%。
+    """
+
+    def __init__(self):
+        # 桶下标 -> 计数；桶 i 覆盖 (gamma^(i-1), gamma^i] 毫秒，<=0 的值记入 zero_count
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def record(self, value_ms: float) -> None:
+        """记录一个样本"""
+        self.count += 1
+        if value_ms <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value_ms) / _LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """合并另一个直方图"""
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+
+    def percentile(self, q: float) -> float:
+        """第 q 百分位（0-100）的近似值；没有样本时返回 0"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = self.zero_count
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return _HISTOGRAM_GAMMA ** (index - 0.5)
+        return _HISTOGRAM_GAMMA ** (max(self.buckets) - 0.5)
+
+    def cumulative_counts(self, bounds_ms: List[float]) -> List[int]:
+        """
+        各上界（毫秒，升序）以内的累计样本数，用于导出固定分桶的直方图
+
+        样本按所在桶的几何中点归入上界，与 percentile 的近似方式一致。
+        """
+        counts = []
+        for bound in bounds_ms:
+            total = self.zero_count
+            for index, n in self.buckets.items():
+                if _HISTOGRAM_GAMMA ** (index - 0.5) <= bound:
+                    total += n
+            counts.append(total)
+        return counts
+
+
+@dataclass
+class OperationAggregate:
+    """单个 (operation_type, operation_name) 的流式聚合"""
+    count: int = 0
+    success_count: int = 0
+    total_ms: float = 0.0
+    min_ms: float = math.inf
+    max_ms: float = 0.0
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def record(self, duration_ms: float, success: bool) -> None:
+        """O(1) 更新"""
+        self.count += 1
+        if success:
+            self.success_count += 1
+        self.total_ms += duration_ms
+        self.min_ms = min(self.min_ms, duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.histogram.record(duration_ms)
+
+    def merge(self, other: "OperationAggregate") -> None:
+        """合并另一个聚合（按操作类型汇总时使用）"""
+        self.count += other.count
+        self.success_count += other.success_count
+        self.total_ms += other.total_ms
+        self.min_ms = min(self.min_ms, other.min_ms)
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.histogram.merge(other.histogram)
+
+    def to_stats(self) -> Dict[str, Any]:
+        """转换为统计字典"""
+        if self.count == 0:
+            return {"count": 0, "success_rate": 0.0, "avg_duration_ms": 0.0}
+        stats = {
+            "count": self.count,
+            "success_rate": self.success_count / self.count,
+            "avg_duration_ms": self.total_ms / self.count,
+            "total_duration_ms": self.total_ms,
+            "min_duration_ms": self.min_ms,
+            "max_duration_ms": self.max_ms,
+            "successful_operations": self.success_count,
+            "failed_operations": self.count - self.success_count,
+        }
+        for q in REPORT_PERCENTILES:
+            # 分位数不会超出实际观测到的范围
+            stats[f"p{q}_ms"] = min(max(self.histogram.percentile(q), self.min_ms), self.max_ms)
+        return stats
+
+
+@dataclass
+class WindowBucket:
+    """滑动窗口中的一个时间桶"""
+    start: float
+    count: int = 0
+    failures: int = 0
+    total_ms: float = 0.0
+    slow: int = 0
+    tokens: int = 0
+
+
+class SlidingWindowStats:
+    """
+    按时间分桶的滑动窗口统计
+
+    每个样本 O(1) 累加到所在的桶，超出最长窗口的桶随新样本淘汰；
+    查询窗口时只合并桶（15 分钟 / 10 秒 = 最多 90 个），不扫描原始样本。
+    """
+
+    def __init__(self, horizon_seconds: int = max(HEALTH_WINDOWS),
+                 bucket_seconds: int = WINDOW_BUCKET_SECONDS, slow_threshold_ms: float = SLO_LATENCY_MS):
+        self.horizon_seconds = horizon_seconds
+        self.bucket_seconds = bucket_seconds
+        self.slow_threshold_ms = slow_threshold_ms
+        # 按 start 升序
+        self.buckets: Deque[WindowBucket] = deque()
+
+    def record(self, ts: float, duration_ms: float, success: bool, tokens: int = 0) -> None:
+        """记录一个样本（ts 为完成时间戳）"""
+        start = ts - ts % self.bucket_seconds
+        if not self.buckets or self.buckets[-1].start < start:
+            self.buckets.append(WindowBucket(start=start))
+            bucket = self.buckets[-1]
+            # 淘汰超出最长窗口的桶
+            while self.buckets[0].start <= start - self.horizon_seconds:
+                self.buckets.popleft()
+        else:
+            # 多线程完成顺序与汇总顺序可能略有出入：从最新的桶向前找
+            bucket = None
+            for candidate in reversed(self.buckets):
+                if candidate.start == start:
+                    bucket = candidate
+                    break
+                if candidate.start < start:
+                    break
+            if bucket is None:
+                # 早于最旧的桶或落在空洞中的迟到样本，直接丢弃
+                return
+        bucket.count += 1
+        bucket.failures += 0 if success else 1
+        bucket.total_ms += duration_ms
+        bucket.slow += 1 if duration_ms > self.slow_threshold_ms else 0
+        bucket.tokens += tokens
+
+    def window(self, seconds: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        最近 seconds 秒的统计
+
+        Returns:
+            {"window_seconds", "count", "failures", "success_rate", "error_rate",
+             "avg_duration_ms", "slow_rate", "tokens"}
+        """
+        now = time.time() if now is None else now
+        # 与窗口有重叠的桶都计入（窗口边界精度为一个桶宽）
+        oldest = now - seconds - self.bucket_seconds
+        count = failures = slow = tokens = 0
+        total_ms = 0.0
+        for bucket in reversed(self.buckets):
+            if bucket.start <= oldest:
+                break
+            count += bucket.count
+            failures += bucket.failures
+            slow += bucket.slow
+            tokens += bucket.tokens
+            total_ms += bucket.total_ms
+        return {
+            "window_seconds": seconds,
+            "count": count,
+            "failures": failures,
+            "success_rate": (count - failures) / count if count else 1.0,
+            "error_rate": failures / count if count else 0.0,
+            "avg_duration_ms": total_ms / count if count else 0.0,
+            "slow_rate": slow / count if count else 0.0,
+            "tokens": tokens,
+        }
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+
 class MetricsCollector:
     """性能指标收集器"""
     
     def __init__(self, buffer_size: int = 1000, auto_export: bool = True):
         self.buffer_size = buffer_size
         self.auto_export = auto_export
-        self.metrics_buffer: List[PerformanceMetrics] = []
+        # 原始样本环形缓冲区（只保留最近 buffer_size 条）
+        self.metrics_buffer: Deque[PerformanceMetrics] = deque(maxlen=buffer_size)
+        # (operation_type, operation_name) -> 流式聚合（覆盖整个会话，不受缓冲区大小限制）
+        self._aggregates: Dict[Tuple[str, str], OperationAggregate] = {}
         self.session_stats = SessionStats()
+        # 最近 15 分钟的滑动窗口统计（健康评估使用）
+        self.windows = SlidingWindowStats()
         self._lock = threading.Lock()
+        # 待汇总的样本：记录时只做一次 append（deque.append 线程安全），由后台线程或读取方汇总
+        self._pending: Deque[PerformanceMetrics] = deque()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_lock = threading.Lock()
+        
+        # 缓存统计来源: 名称 -> 返回统计字典的函数（hits/misses/hit_rate 等）
+        self._cache_stats_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        
+        # 进行中的操作：id(context) -> (类型, 名称, 开始时间, 线程名)
+        # 只做一次字典插入/删除（GIL 下原子），不加锁
+        self._inflight: Dict[int, Tuple[str, str, float, str]] = {}
         
         # 导出配置
         self.export_file = Path("performance_metrics.json")
@@ -84,7 +329,7 @@ class MetricsCollector:
         性能测量上下文管理器
         
         Args:
-            op_type: 操作类型 ('llm_call', 'tool_call', 'command_exec', 'file_op')
+            op_type: 操作类型 ('llm_call', 'tool_call', 'command_exec', 'file_op', 'git_call')
             op_name: 操作名称
             **kwargs: 额外数据
         
@@ -95,31 +340,41 @@ class MetricsCollector:
         """
         start_time = time.time()
         context = {"additional_data": kwargs}
+        inflight_key = id(context)
+        self._inflight[inflight_key] = (op_type, op_name, start_time, threading.current_thread().name)
         
-        try:
-            yield context
-            # 成功完成
-            duration = (time.time() - start_time) * 1000
-            self._record_metric(
-                op_type=op_type,
-                op_name=op_name,
-                duration_ms=duration,
-                success=True,
-                token_usage=context.get("token_usage"),
-                additional_data=context.get("additional_data")
-            )
-        except Exception as e:
-            # 执行失败
-            duration = (time.time() - start_time) * 1000
-            self._record_metric(
-                op_type=op_type,
-                op_name=op_name,
-                duration_ms=duration,
-                success=False,
-                error_message=str(e),
-                additional_data=context.get("additional_data")
-            )
-            raise
+        # 同时记录一个追踪 span（不在对话轮次内时为空操作）
+        with get_tracer().span(op_name, op_type, **kwargs) as span:
+            try:
+                yield context
+                # 成功完成
+                duration = (time.time() - start_time) * 1000
+                self._record_metric(
+                    op_type=op_type,
+                    op_name=op_name,
+                    duration_ms=duration,
+                    success=True,
+                    token_usage=context.get("token_usage"),
+                    additional_data=context.get("additional_data")
+                )
+            except Exception as e:
+                # 执行失败
+                duration = (time.time() - start_time) * 1000
+                self._record_metric(
+                    op_type=op_type,
+                    op_name=op_name,
+                    duration_ms=duration,
+                    success=False,
+                    error_message=str(e),
+                    additional_data=context.get("additional_data")
+                )
+                raise
+            finally:
+                self._inflight.pop(inflight_key, None)
+                if span is not None:
+                    span.attrs.update(context.get("additional_data") or {})
+                    if context.get("token_usage"):
+                        span.attrs["token_usage"] = context["token_usage"]
     
     def _record_metric(self, op_type: str, op_name: str, duration_ms: float, 
                       success: bool, error_message: Optional[str] = None,
@@ -137,20 +392,59 @@ class MetricsCollector:
             additional_data=additional_data
         )
         
+        # 热路径只追加到待处理队列；汇总与导出在后台线程中完成
+        self._pending.append(metric)
+        if len(self._pending) > MAX_PENDING_METRICS:
+            self._drain()
+        if self.auto_export and self._flusher is None:
+            self._start_flusher()
+    
+    def _start_flusher(self):
+        """启动后台汇总/导出线程（只启动一次）"""
+        with self._flusher_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="dnm-metrics-flusher", daemon=True)
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        """后台线程：定期汇总待处理样本，到期时导出"""
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self._drain()
+            if self._should_export():
+                self._export_metrics()
+    
+    def _drain(self):
+        """把待处理样本汇总进环形缓冲区、会话统计与流式聚合"""
         with self._lock:
-            # 添加到缓冲区
+            self._drain_locked()
+    
+    def _drain_locked(self):
+        """_drain 的实现（调用方持有锁）"""
+        pending = self._pending
+        while pending:
+            try:
+                metric = pending.popleft()
+            except IndexError:
+                break
+            # 添加到环形缓冲区（超出容量时自动丢弃最旧的样本）
             self.metrics_buffer.append(metric)
             
-            # 更新会话统计
+            # 更新会话统计与流式聚合
             self._update_session_stats(metric)
-            
-            # 检查缓冲区大小
-            if len(self.metrics_buffer) > self.buffer_size:
-                self.metrics_buffer = self.metrics_buffer[-self.buffer_size:]
-            
-            # 检查是否需要导出
-            if self.auto_export and self._should_export():
-                self._export_metrics()
+            key = (metric.operation_type, metric.operation_name)
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                aggregate = self._aggregates[key] = OperationAggregate()
+            aggregate.record(metric.duration_ms, metric.success)
+            tokens = ((metric.token_usage or {}).get("total_tokens") or 0) if metric.operation_type == "llm_call" else 0
+            self.windows.record(metric.timestamp.timestamp(), metric.duration_ms, metric.success, tokens)
+    
+    def flush(self):
+        """立即汇总待处理样本并导出（退出前或测试时使用）"""
+        self._drain()
+        self._export_metrics()
     
     def _update_session_stats(self, metric: PerformanceMetrics):
         """更新会话统计信息"""
@@ -180,63 +474,150 @@ class MetricsCollector:
         return datetime.now() - self.last_export_time > self.export_interval
     
     def _export_metrics(self):
-        """导出指标到文件"""
+        """导出指标到文件（锁内只复制快照，序列化与写文件在锁外，原子替换目标文件）"""
         try:
+            with self._lock:
+                self._drain_locked()
+                session_stats = asdict(self.session_stats)
+                operation_stats = {
+                    f"{op_type}/{op_name}": aggregate.to_stats()
+                    for (op_type, op_name), aggregate in self._aggregates.items()
+                }
+                # 最近100条（样本记录后不再修改，可在锁外序列化）
+                recent = list(islice(self.metrics_buffer, max(len(self.metrics_buffer) - 100, 0), None))
+                self.last_export_time = datetime.now()
+            
             export_data = {
                 "export_time": datetime.now().isoformat(),
-                "session_stats": asdict(self.session_stats),
-                "recent_metrics": [asdict(m) for m in self.metrics_buffer[-100:]]  # 最近100条
+                "session_stats": session_stats,
+                "operation_stats": operation_stats,
+                "recent_metrics": [asdict(m) for m in recent],
             }
-            
-            with open(self.export_file, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2, default=str)
-            
-            self.last_export_time = datetime.now()
+            directory = self.export_file.resolve().parent
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".performance_metrics.")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(export_data, f, ensure_ascii=False, indent=2, default=str)
+                os.replace(tmp_path, self.export_file)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
         except Exception as e:
             print(f"⚠️ 导出性能指标失败: {e}")
     
     def get_session_stats(self) -> SessionStats:
         """获取当前会话统计"""
         with self._lock:
+            self._drain_locked()
             return self.session_stats
     
     def get_recent_metrics(self, count: int = 50) -> List[PerformanceMetrics]:
         """获取最近的性能指标"""
         with self._lock:
-            return self.metrics_buffer[-count:] if self.metrics_buffer else []
+            self._drain_locked()
+            return list(islice(self.metrics_buffer, max(len(self.metrics_buffer) - count, 0), None))
     
     def get_operation_stats(self, op_type: Optional[str] = None) -> Dict[str, Any]:
-        """获取操作统计信息"""
+        """
+        获取操作统计信息（整个会话，含 p50/p90/p99 延迟）
+        
+        只合并各操作名称的聚合，不扫描原始样本。
+        """
+        total = OperationAggregate()
         with self._lock:
-            metrics = self.metrics_buffer
-            if op_type:
-                metrics = [m for m in metrics if m.operation_type == op_type]
-            
-            if not metrics:
-                return {"count": 0, "success_rate": 0.0, "avg_duration_ms": 0.0}
-            
-            successful = sum(1 for m in metrics if m.success)
-            total_duration = sum(m.duration_ms for m in metrics)
-            
-            return {
-                "count": len(metrics),
-                "success_rate": successful / len(metrics),
-                "avg_duration_ms": total_duration / len(metrics),
-                "total_duration_ms": total_duration,
-                "successful_operations": successful,
-                "failed_operations": len(metrics) - successful
+            self._drain_locked()
+            for (agg_type, _), aggregate in self._aggregates.items():
+                if op_type is None or agg_type == op_type:
+                    total.merge(aggregate)
+        return total.to_stats()
+    
+    def get_window_stats(self, seconds: int) -> Dict[str, Any]:
+        """最近 seconds 秒的滑动窗口统计（见 SlidingWindowStats.window）"""
+        with self._lock:
+            self._drain_locked()
+            return self.windows.window(seconds)
+    
+    def get_operation_breakdown(self, op_type: str) -> Dict[str, Dict[str, Any]]:
+        """
+        按操作名称细分某类操作的耗时（如 git_call 下的 status / diff / log）
+        
+        Returns:
+            {操作名称: get_operation_stats 同结构的统计}，按总耗时降序
+        """
+        with self._lock:
+            self._drain_locked()
+            breakdown = {
+                op_name: aggregate.to_stats()
+                for (agg_type, op_name), aggregate in self._aggregates.items()
+                if agg_type == op_type
             }
+        return dict(sorted(breakdown.items(), key=lambda kv: kv[1]["total_duration_ms"], reverse=True))
+    
+    def get_aggregates(self) -> Dict[Tuple[str, str], OperationAggregate]:
+        """各 (operation_type, operation_name) 聚合的副本（供指标导出使用）"""
+        with self._lock:
+            self._drain_locked()
+            copies = {}
+            for key, aggregate in self._aggregates.items():
+                copy = OperationAggregate()
+                copy.merge(aggregate)
+                copies[key] = copy
+        return copies
+    
+    def get_inflight_operations(self) -> List[Dict[str, Any]]:
+        """进行中的操作（按已耗时降序）"""
+        now = time.time()
+        inflight = [
+            {"type": op_type, "name": op_name, "elapsed_ms": (now - started) * 1000, "thread": thread}
+            for op_type, op_name, started, thread in dict(self._inflight).values()
+        ]
+        return sorted(inflight, key=lambda op: op["elapsed_ms"], reverse=True)
+    
+    def get_operation_types(self) -> List[str]:
+        """已记录过的操作类型"""
+        with self._lock:
+            self._drain_locked()
+            return sorted({op_type for op_type, _ in self._aggregates})
+    
+    def register_cache(self, name: str, stats_provider: Callable[[], Dict[str, Any]]):
+        """
+        注册缓存统计来源，使其命中率出现在统计报告中
+        
+        Args:
+            name: 缓存名称
+            stats_provider: 返回统计字典的函数（至少包含 hits、misses、hit_rate）
+        """
+        with self._lock:
+            self._cache_stats_providers[name] = stats_provider
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有已注册缓存的统计"""
+        with self._lock:
+            providers = dict(self._cache_stats_providers)
+        
+        stats = {}
+        for name, provider in providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                stats[name] = {"error": str(e)}
+        return stats
     
     def get_token_usage_summary(self) -> Dict[str, int]:
         """获取 Token 使用汇总"""
         with self._lock:
+            self._drain_locked()
             return self.session_stats.total_tokens.copy()
     
     def reset_session_stats(self):
         """重置会话统计"""
         with self._lock:
+            self._pending.clear()
             self.session_stats = SessionStats()
             self.metrics_buffer.clear()
+            self._aggregates.clear()
+            self.windows.clear()
     
     def format_stats_report(self) -> str:
         """格式化统计报告"""
@@ -270,6 +651,34 @@ class MetricsCollector:
    成功操作: {stats.successful_operations}
    失败操作: {stats.failed_operations}
 """
+        op_types = self.get_operation_types()
+        if op_types:
+            report += "\n⏱️  延迟分位 (p50 / p90 / p99):\n"
+            for op_type in op_types:
+                st = self.get_operation_stats(op_type)
+                report += (
+                    f"   {op_type}: {st['p50_ms']:.1f} / {st['p90_ms']:.1f} / {st['p99_ms']:.1f}ms"
+                    f"（{st['count']} 次，最长 {st['max_duration_ms']:.1f}ms）\n"
+                )
+        git_calls = self.get_operation_breakdown("git_call")
+        if git_calls:
+            report += "\n🐙 Git 调用耗时:\n"
+            for name, item in git_calls.items():
+                report += (
+                    f"   git {name}: {item['count']} 次，平均 {item['avg_duration_ms']:.1f}ms，"
+                    f"p90 {item['p90_ms']:.1f}ms，最长 {item['max_duration_ms']:.1f}ms\n"
+                )
+        cache_stats = self.get_cache_stats()
+        if cache_stats:
+            report += "\n📦 缓存命中:\n"
+            for name, cs in cache_stats.items():
+                if "error" in cs:
+                    report += f"   {name}: ⚠️ {cs['error']}\n"
+                    continue
+                report += (
+                    f"   {name}: 命中 {cs.get('hits', 0)} / 未命中 {cs.get('misses', 0)}"
+                    f" ({cs.get('hit_rate', 0.0):.1%})\n"
+                )
         return report
 
 
@@ -11,11 +11,24 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
-from src.core.agent_metrics import get_metrics_collector, SessionStats
+from src.core.agent_metrics import get_metrics_collector, SessionStats, HEALTH_WINDOWS, SLO_LATENCY_MS
 from src.core.agent_resilience import get_resilience_manager
 from src.core.agent_error_handler import get_llm_fallback_handler
 
 
+# SLO 燃烧率告警规则：(严重程度, 短窗口, 长窗口, 燃烧率阈值)
+# 短窗口与长窗口同时超过阈值才告警：长窗口避免偶发抖动，短窗口保证恢复后告警及时解除
+# （延迟 SLO 的错误预算为 10%，燃烧率最高 10x，只会触发 degraded）
+BURN_RATE_RULES = (
+    ("critical", "1m", "5m", 14.4),
+    ("degraded", "5m", "15m", 6.0),
+)
+
+
+def _window_label(seconds: int) -> str:
+    return f"{seconds // 60}m"
+
+
 @dataclass
 class SystemHealth:
     """系统健康状态"""
@@ -37,10 +50,13 @@ class MonitoringDashboard:
         # 监控配置
         self.health_check_interval = 60  # 秒
         self.performance_threshold = {
-            "avg_response_time_ms": 5000,  # 5秒
+            "avg_response_time_ms": SLO_LATENCY_MS,  # 5秒
             "success_rate": 0.95,  # 95%
             "error_rate": 0.05,  # 5%
-            "token_usage_per_hour": 50000  # 每小时50k tokens
+            "token_usage_per_hour": 50000,  # 每小时50k tokens
+            "slo_success_target": 0.99,  # 可用性 SLO：99% 的操作成功
+            "slo_latency_target": 0.90,  # 延迟 SLO：90% 的操作在 SLO_LATENCY_MS 内完成
+            "min_window_operations": 5  # 窗口内操作数少于该值时不评估燃烧率
         }
         
         # 监控状态
@@ -117,9 +133,13 @@ class MonitoringDashboard:
         components = {}
         recommendations = []
         
-        # 1. 性能指标检查
+        # 1. 性能指标检查（1m / 5m / 15m 滑动窗口）
         session_stats = self.metrics.get_session_stats()
-        perf_component = self._check_performance_health(session_stats)
+        windows = {
+            _window_label(seconds): self.metrics.get_window_stats(seconds)
+            for seconds in HEALTH_WINDOWS
+        }
+        perf_component = self._check_performance_health(windows)
         components["performance"] = perf_component
         
         if perf_component["status"] != "healthy":
@@ -141,7 +161,7 @@ class MonitoringDashboard:
             recommendations.extend(llm_component.get("recommendations", []))
         
         # 4. 资源使用检查
-        resource_component = self._check_resource_usage(session_stats)
+        resource_component = self._check_resource_usage(session_stats, windows["15m"])
         components["resources"] = resource_component
         
         if resource_component["status"] != "healthy":
@@ -158,32 +178,76 @@ class MonitoringDashboard:
             recommendations=recommendations
         )
     
-    def _check_performance_health(self, stats: SessionStats) -> Dict[str, Any]:
-        """检查性能健康状态"""
+    def _burn_rate_alerts(self, windows: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        按多窗口燃烧率评估 SLO（燃烧率 = 窗口内坏事件比例 / 错误预算）
+        
+        Returns:
+            [{"slo", "severity", "windows", "burn_rate"}]，同一 SLO 只保留最严重的一条
+        """
+        budgets = {
+            "availability": ("error_rate", 1 - self.performance_threshold["slo_success_target"]),
+            "latency": ("slow_rate", 1 - self.performance_threshold["slo_latency_target"]),
+        }
+        min_ops = self.performance_threshold["min_window_operations"]
+        alerts = []
+        for slo, (rate_key, budget) in budgets.items():
+            for severity, short, long, threshold in BURN_RATE_RULES:
+                short_w, long_w = windows[short], windows[long]
+                if short_w["count"] < min_ops:
+                    continue
+                short_burn = short_w[rate_key] / budget
+                long_burn = long_w[rate_key] / budget
+                if short_burn > threshold and long_burn > threshold:
+                    alerts.append({
+                        "slo": slo,
+                        "severity": severity,
+                        "windows": f"{short}/{long}",
+                        "burn_rate": min(short_burn, long_burn),
+                    })
+                    break
+        return alerts
+    
+    def _check_performance_health(self, windows: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """检查性能健康状态（基于滑动窗口，最近的故障不会被整个会话的历史稀释）"""
         status = "healthy"
         issues = []
         recommendations = []
-        
-        # 检查平均响应时间
-        if stats.average_duration_ms > self.performance_threshold["avg_response_time_ms"]:
-            status = "degraded"
-            issues.append(f"平均响应时间过长: {stats.average_duration_ms:.1f}ms")
+        recent = windows["5m"]
+        
+        # SLO 燃烧率告警
+        alerts = self._burn_rate_alerts(windows)
+        for alert in alerts:
+            if alert["severity"] == "critical" or status == "healthy":
+                status = alert["severity"]
+            name = "成功率" if alert["slo"] == "availability" else "延迟"
+            issues.append(
+                f"{name} SLO 错误预算消耗过快: 燃烧率 {alert['burn_rate']:.1f}x（{alert['windows']} 窗口）"
+            )
+        if any(a["slo"] == "availability" for a in alerts):
+            recommendations.append("检查网络连接和服务可用性")
+        if any(a["slo"] == "latency" for a in alerts):
             recommendations.append("考虑优化 LLM 调用或增加缓存")
         
-        # 检查成功率
-        if stats.success_rate < self.performance_threshold["success_rate"]:
-            status = "critical" if stats.success_rate < 0.8 else "degraded"
-            issues.append(f"成功率过低: {stats.success_rate:.1%}")
-            recommendations.append("检查网络连接和服务可用性")
+        # 最近 5 分钟的平均响应时间
+        if recent["count"] and recent["avg_duration_ms"] > self.performance_threshold["avg_response_time_ms"]:
+            if status == "healthy":
+                status = "degraded"
+            issues.append(f"最近5分钟平均响应时间过长: {recent['avg_duration_ms']:.1f}ms")
+            if "考虑优化 LLM 调用或增加缓存" not in recommendations:
+                recommendations.append("考虑优化 LLM 调用或增加缓存")
         
         return {
             "status": status,
             "metrics": {
-                "avg_response_time_ms": stats.average_duration_ms,
-                "success_rate": stats.success_rate,
-                "total_operations": stats.total_operations,
-                "session_duration_minutes": stats.session_duration_minutes
+                "avg_response_time_ms": recent["avg_duration_ms"],
+                "success_rate": recent["success_rate"],
+                "total_operations": recent["count"],
+                **{f"success_rate_{label}": w["success_rate"] for label, w in windows.items()},
+                **{f"operations_{label}": w["count"] for label, w in windows.items()},
             },
+            "windows": windows,
+            "slo_alerts": alerts,
             "issues": issues,
             "recommendations": recommendations
         }
@@ -252,8 +316,8 @@ class MonitoringDashboard:
             "recommendations": recommendations
         }
     
-    def _check_resource_usage(self, stats: SessionStats) -> Dict[str, Any]:
-        """检查资源使用状态"""
+    def _check_resource_usage(self, stats: SessionStats, recent: Dict[str, Any]) -> Dict[str, Any]:
+        """检查资源使用状态（Token 速率按最近 15 分钟窗口折算）"""
         status = "healthy"
         issues = []
         recommendations = []
@@ -261,7 +325,8 @@ class MonitoringDashboard:
         # 检查 Token 使用
         total_tokens = stats.total_tokens["total_tokens"]
         session_hours = max(stats.session_duration_minutes / 60, 0.1)  # 至少0.1小时
-        tokens_per_hour = total_tokens / session_hours
+        window_hours = min(recent["window_seconds"] / 3600, session_hours)
+        tokens_per_hour = recent["tokens"] / window_hours
         
         if tokens_per_hour > self.performance_threshold["token_usage_per_hour"]:
             status = "degraded"
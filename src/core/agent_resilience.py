@@ -7,13 +7,16 @@ import time
 import json
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable, Union
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Callable, Union
 from dataclasses import dataclass, field
 from enum import Enum
 from functools import wraps
 import asyncio
 import random
 
+from src.core.agent_config import RETRY_BUDGET_MIN_RETRIES, RETRY_BUDGET_RATIO, RETRY_BUDGET_WINDOW
+
 
 class ErrorType(Enum):
     """错误类型枚举"""
@@ -57,15 +60,174 @@ class RetryPolicy:
     exponential_base: float = 2.0  # 指数退避基数
     jitter: bool = True  # 是否添加随机抖动
 
+    def next_delay(self, previous: float = 0.0) -> float:
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            previous: 上一次的等待时间（首次重试传 0）
+        """
+        if self.jitter:
+            return decorrelated_jitter(previous, self.base_delay, self.max_delay)
+        if previous <= 0:
+            return min(self.base_delay, self.max_delay)
+        return min(previous * self.exponential_base, self.max_delay)
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """
+    Decorrelated jitter 退避：在 [base, 上次等待 × 3] 内随机取值，不超过 cap
+
+    相比固定指数退避，各调用方的重试时间点被打散，不会在故障恢复瞬间同时涌入。
+    """
+    return min(cap, random.uniform(base, max(previous, base) * 3))
+
+
+class RetryBudget:
+    """
+    进程级共享重试预算（线程安全）
+
+    按秒分桶统计滑动窗口内的请求数与重试数，重试数超过 请求数 × ratio
+    （另有 min_retries 次保底）后拒绝重试，故障期间重试不会成倍放大负载。
+    LLM 调用、MCP 调用、git 网络操作与 ResilienceManager 共用同一个预算。
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, window: int = RETRY_BUDGET_WINDOW,
+                 min_retries: int = RETRY_BUDGET_MIN_RETRIES):
+        self.ratio = ratio
+        self.window = max(1, int(window))
+        self.min_retries = min_retries
+        self._lock = threading.Lock()
+        # [秒, 请求数, 重试数]，最新在后
+        self._buckets: Deque[List[int]] = deque()
+        # 按操作统计：操作名 -> {"requests", "granted", "denied"}
+        self._by_operation: Dict[str, Dict[str, int]] = {}
+
+    def _bucket_locked(self, now: float) -> List[int]:
+        second = int(now)
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def _operation_locked(self, operation: str) -> Dict[str, int]:
+        stats = self._by_operation.get(operation)
+        if stats is None:
+            stats = self._by_operation[operation] = {"requests": 0, "granted": 0, "denied": 0}
+        return stats
+
+    def _allowance_locked(self) -> float:
+        requests = sum(b[1] for b in self._buckets)
+        return max(self.min_retries, requests * self.ratio)
+
+    def record_request(self, operation: str = "default", now: Optional[float] = None):
+        """记录一次首次请求（不含重试）"""
+        with self._lock:
+            self._bucket_locked(time.time() if now is None else now)[1] += 1
+            self._operation_locked(operation)["requests"] += 1
+
+    def try_acquire(self, operation: str = "default", now: Optional[float] = None) -> bool:
+        """
+        申请一次重试
+
+        Returns:
+            预算内返回 True（并计入重试数），预算耗尽返回 False
+        """
+        with self._lock:
+            bucket = self._bucket_locked(time.time() if now is None else now)
+            stats = self._operation_locked(operation)
+            retries = sum(b[2] for b in self._buckets)
+            if retries >= self._allowance_locked():
+                stats["denied"] += 1
+                return False
+            bucket[2] += 1
+            stats["granted"] += 1
+            return True
+
+    def get_stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """窗口内的请求/重试数与剩余额度，以及按操作的累计统计"""
+        with self._lock:
+            self._bucket_locked(time.time() if now is None else now)
+            requests = sum(b[1] for b in self._buckets)
+            retries = sum(b[2] for b in self._buckets)
+            allowance = self._allowance_locked()
+            return {
+                "window_seconds": self.window,
+                "ratio": self.ratio,
+                "requests": requests,
+                "retries": retries,
+                "available": max(0, int(allowance) - retries),
+                "by_operation": {name: dict(stats) for name, stats in self._by_operation.items()},
+            }
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._buckets.clear()
+            self._by_operation.clear()
+
+
+# 全局重试预算实例
+retry_budget = RetryBudget()
+
+
+def get_retry_budget() -> RetryBudget:
+    """获取全局重试预算"""
+    return retry_budget
+
 
 @dataclass
 class CircuitBreakerState:
-    """熔断器状态"""
+    """熔断器状态（每个操作一个，状态转换在自身的锁内原子完成）"""
     failure_count: int = 0
     last_failure_time: Optional[datetime] = None
     state: str = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
     failure_threshold: int = 5
     recovery_timeout: int = 60  # 秒
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_failure(self) -> bool:
+        """
+        记录一次失败
+
+        Returns:
+            本次失败是否使熔断器由非 OPEN 转为 OPEN
+        """
+        with self._lock:
+            self.failure_count += 1
+            self.last_failure_time = datetime.now()
+            if self.failure_count >= self.failure_threshold and self.state != "OPEN":
+                self.state = "OPEN"
+                return True
+            return False
+
+    def record_success(self):
+        """记录一次成功，重置计数器并关闭熔断器"""
+        with self._lock:
+            self.failure_count = 0
+            self.state = "CLOSED"
+
+    def is_open(self) -> bool:
+        """熔断器是否打开（超过恢复时间时原子地转为 HALF_OPEN 并放行）"""
+        with self._lock:
+            if self.state != "OPEN":
+                return False
+            if self.last_failure_time:
+                time_since_failure = (datetime.now() - self.last_failure_time).total_seconds()
+                if time_since_failure > self.recovery_timeout:
+                    self.state = "HALF_OPEN"
+                    return False
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failure_count": self.failure_count,
+                "last_failure": self.last_failure_time.isoformat() if self.last_failure_time else None
+            }
 
 
 @dataclass
@@ -81,11 +243,13 @@ class FallbackResult:
 class ResilienceManager:
     """系统韧性管理器"""
     
-    def __init__(self):
+    def __init__(self, retry_budget: Optional[RetryBudget] = None):
+        self.retry_budget = retry_budget or get_retry_budget()
         self.error_handlers: Dict[ErrorType, List[Callable]] = {}
         self.circuit_breakers: Dict[str, CircuitBreakerState] = {}
         self.retry_policies: Dict[str, RetryPolicy] = {}
         self.fallback_strategies: Dict[str, List[FallbackStrategy]] = {}
+        # 只保护上面这些字典与统计的读写；熔断器状态由各自的锁保护，降级策略在锁外执行
         self._lock = threading.Lock()
         
         # 默认配置
@@ -136,39 +300,40 @@ class ResilienceManager:
         Returns:
             降级处理结果
         """
+        # 记录错误（短临界区）
+        self._record_error(error, context)
+        
+        # 检查熔断器
+        if self._is_circuit_open(context.operation_name):
+            return self._circuit_breaker_response(context)
+        
+        # 获取降级策略
         with self._lock:
-            # 记录错误
-            self._record_error(error, context)
-            
-            # 检查熔断器
-            if self._is_circuit_open(context.operation_name):
-                return self._circuit_breaker_response(context)
-            
-            # 获取降级策略
-            strategies = self.fallback_strategies.get(
+            strategies = list(self.fallback_strategies.get(
                 context.operation_name, 
                 [FallbackStrategy.GRACEFUL_DEGRADATION]
-            )
-            
-            # 依次尝试降级策略
-            for strategy in strategies:
-                try:
-                    result = self._execute_strategy(strategy, error, context)
-                    if result.success:
-                        # 记录成功恢复
-                        self._record_recovery(context.operation_name, strategy)
-                        return result
-                except Exception as e:
-                    print(f"⚠️ 降级策略 {strategy.value} 执行失败: {e}")
-                    continue
-            
-            # 所有策略都失败，返回最终降级
-            return self._final_fallback(error, context)
+            ))
+        
+        # 依次尝试降级策略（在锁外执行，退避等待不会阻塞其他操作的错误处理）
+        for strategy in strategies:
+            try:
+                result = self._execute_strategy(strategy, error, context)
+                if result.success:
+                    # 记录成功恢复
+                    self._record_recovery(context.operation_name, strategy)
+                    return result
+            except Exception as e:
+                print(f"⚠️ 降级策略 {strategy.value} 执行失败: {e}")
+                continue
+        
+        # 所有策略都失败，返回最终降级
+        return self._final_fallback(error, context)
     
     def _record_error(self, error: Exception, context: ErrorContext):
         """记录错误信息"""
         error_key = f"{context.operation_name}:{context.error_type.value}"
-        self.error_stats[error_key] = self.error_stats.get(error_key, 0) + 1
+        with self._lock:
+            self.error_stats[error_key] = self.error_stats.get(error_key, 0) + 1
         
         # 更新熔断器状态
         self._update_circuit_breaker(context.operation_name, failed=True)
@@ -178,49 +343,38 @@ class ResilienceManager:
     def _record_recovery(self, operation_name: str, strategy: FallbackStrategy):
         """记录成功恢复"""
         recovery_key = f"{operation_name}:{strategy.value}"
-        self.recovery_stats[recovery_key] = self.recovery_stats.get(recovery_key, 0) + 1
+        with self._lock:
+            self.recovery_stats[recovery_key] = self.recovery_stats.get(recovery_key, 0) + 1
         
         # 重置熔断器
         self._update_circuit_breaker(operation_name, failed=False)
         
         print(f"✅ 恢复成功: {operation_name} 使用策略 {strategy.value}")
     
+    def _get_circuit_breaker(self, operation_name: str) -> CircuitBreakerState:
+        """获取（必要时创建）操作对应的熔断器"""
+        with self._lock:
+            breaker = self.circuit_breakers.get(operation_name)
+            if breaker is None:
+                breaker = self.circuit_breakers[operation_name] = CircuitBreakerState()
+            return breaker
+    
     def _is_circuit_open(self, operation_name: str) -> bool:
         """检查熔断器是否打开"""
-        if operation_name not in self.circuit_breakers:
-            return False
-        
-        breaker = self.circuit_breakers[operation_name]
-        
-        if breaker.state == "OPEN":
-            # 检查是否可以尝试恢复
-            if breaker.last_failure_time:
-                time_since_failure = (datetime.now() - breaker.last_failure_time).total_seconds()
-                if time_since_failure > breaker.recovery_timeout:
-                    breaker.state = "HALF_OPEN"
-                    return False
-            return True
-        
-        return False
+        with self._lock:
+            breaker = self.circuit_breakers.get(operation_name)
+        return breaker is not None and breaker.is_open()
     
     def _update_circuit_breaker(self, operation_name: str, failed: bool):
         """更新熔断器状态"""
-        if operation_name not in self.circuit_breakers:
-            self.circuit_breakers[operation_name] = CircuitBreakerState()
-        
-        breaker = self.circuit_breakers[operation_name]
+        breaker = self._get_circuit_breaker(operation_name)
         
         if failed:
-            breaker.failure_count += 1
-            breaker.last_failure_time = datetime.now()
-            
-            if breaker.failure_count >= breaker.failure_threshold:
-                breaker.state = "OPEN"
+            if breaker.record_failure():
                 print(f"🔴 熔断器打开: {operation_name} (失败次数: {breaker.failure_count})")
         else:
             # 成功调用，重置计数器
-            breaker.failure_count = 0
-            breaker.state = "CLOSED"
+            breaker.record_success()
     
     def _circuit_breaker_response(self, context: ErrorContext) -> FallbackResult:
         """熔断器响应"""
@@ -257,14 +411,18 @@ class ResilienceManager:
                 error_message=f"重试次数已达上限 ({policy.max_attempts})"
             )
         
-        # 计算延迟时间
-        delay = min(
-            policy.base_delay * (policy.exponential_base ** context.retry_count),
-            policy.max_delay
-        )
+        # 共享重试预算耗尽时不再重试，直接交给后续降级策略
+        if not self.retry_budget.try_acquire(context.operation_name):
+            return FallbackResult(
+                success=False,
+                response="",
+                strategy_used=FallbackStrategy.RETRY_WITH_BACKOFF,
+                error_message="重试预算已耗尽"
+            )
         
-        if policy.jitter:
-            delay *= (0.5 + random.random() * 0.5)  # 添加 50% 的随机抖动
+        # 计算延迟时间（decorrelated jitter，基于上一次的等待时间）
+        previous = (context.additional_data or {}).get("retry_delay", 0.0)
+        delay = policy.next_delay(previous)
         
         print(f"🔄 重试 {context.operation_name} (第 {context.retry_count + 1} 次，延迟 {delay:.1f}s)")
         time.sleep(delay)
@@ -274,7 +432,8 @@ class ResilienceManager:
             success=False,  # 需要上层重新执行
             response="",
             strategy_used=FallbackStrategy.RETRY_WITH_BACKOFF,
-            additional_data={"should_retry": True, "retry_count": context.retry_count + 1}
+            additional_data={"should_retry": True, "retry_count": context.retry_count + 1,
+                             "retry_delay": delay}
         )
     
     def _switch_model(self, error: Exception, context: ErrorContext) -> FallbackResult:
@@ -351,23 +510,21 @@ class ResilienceManager:
         with self._lock:
             total_errors = sum(self.error_stats.values())
             total_recoveries = sum(self.recovery_stats.values())
-            
-            circuit_status = {}
-            for name, breaker in self.circuit_breakers.items():
-                circuit_status[name] = {
-                    "state": breaker.state,
-                    "failure_count": breaker.failure_count,
-                    "last_failure": breaker.last_failure_time.isoformat() if breaker.last_failure_time else None
-                }
-            
-            return {
-                "total_errors": total_errors,
-                "total_recoveries": total_recoveries,
-                "recovery_rate": total_recoveries / max(total_errors, 1),
-                "circuit_breakers": circuit_status,
-                "error_stats": self.error_stats.copy(),
-                "recovery_stats": self.recovery_stats.copy()
-            }
+            breakers = list(self.circuit_breakers.items())
+            error_stats = self.error_stats.copy()
+            recovery_stats = self.recovery_stats.copy()
+        
+        circuit_status = {name: breaker.snapshot() for name, breaker in breakers}
+        
+        return {
+            "total_errors": total_errors,
+            "total_recoveries": total_recoveries,
+            "recovery_rate": total_recoveries / max(total_errors, 1),
+            "circuit_breakers": circuit_status,
+            "error_stats": error_stats,
+            "recovery_stats": recovery_stats,
+            "retry_budget": self.retry_budget.get_stats()
+        }
     
     def reset_stats(self):
         """重置统计信息"""
@@ -399,6 +556,7 @@ def resilient_operation(operation_name: str, error_type: ErrorType = ErrorType.U
                 operation_name=operation_name
             )
             
+            get_retry_budget().record_request(operation_name)
             try:
                 return func(*args, **kwargs)
             except Exception as e:
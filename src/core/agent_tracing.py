@@ -0,0 +1,279 @@
+"""
+分层追踪模块
+记录每轮对话的层级耗时：turn → 图节点 → LLM 调用 / 工具调用 / 子进程，
+每个 span 带父 span ID 与请求ID（DNM_REQ_ID），可导出为 Chrome trace-event JSON，
+用 chrome://tracing 或 Perfetto 打开查看时间线/火焰图。
+
+- 只在一轮对话（tracer.turn）内记录，轮外的 span 为空操作
+- 父子关系通过 contextvars 传递；线程池中的 span 没有上下文时挂到本轮的根 span 下
+- MetricsCollector.measure_operation 自动创建 span，图节点由 traced_node 包装
+
+使用: from src.core.agent_tracing import get_tracer, traced_node
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+
+# 保留最近多少轮对话的追踪
+TRACE_HISTORY = 20
+
+# 单轮最多记录的 span 数（超出后丢弃并计数）
+MAX_SPANS_PER_TURN = 5000
+
+
+@dataclass
+class Span:
+    """一个追踪区间"""
+    span_id: str
+    parent_id: Optional[str]
+    req_id: str
+    name: str
+    category: str
+    start_ns: int
+    end_ns: int = 0
+    thread_id: int = 0
+    thread_name: str = ""
+    status: str = "ok"
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+
+@dataclass
+class TurnTrace:
+    """一轮对话的全部 span"""
+    req_id: str
+    root: Span
+    spans: List[Span] = field(default_factory=list)
+    dropped: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("dnm_current_span", default=None)
+
+# 当前执行的图节点名（用于把 LLM 调用等归属到节点）
+_current_node: ContextVar[str] = ContextVar("dnm_current_node", default="-")
+
+
+def _request_id() -> str:
+    return os.environ.get("DNM_REQ_ID", "-")
+
+
+class Tracer:
+    """追踪器（线程安全）"""
+
+    def __init__(self, history: int = TRACE_HISTORY):
+        self._lock = threading.Lock()
+        # 进行中的轮次：请求ID -> TurnTrace
+        self._active: Dict[str, TurnTrace] = {}
+        # 已结束的轮次（最新在后）
+        self._finished: Deque[TurnTrace] = deque(maxlen=history)
+
+    def _new_span(self, name: str, category: str, parent: Optional[Span], req_id: str,
+                  attrs: Dict[str, Any]) -> Span:
+        thread = threading.current_thread()
+        return Span(
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            req_id=req_id,
+            name=name,
+            category=category,
+            start_ns=time.perf_counter_ns(),
+            thread_id=thread.ident or 0,
+            thread_name=thread.name,
+            attrs=dict(attrs),
+        )
+
+    @contextmanager
+    def turn(self, req_id: str, name: str = "turn", **attrs) -> Iterator[Span]:
+        """
+        记录一轮对话（根 span）
+
+        Args:
+            req_id: 请求ID（与 DNM_REQ_ID 一致）
+            name: 根 span 名称
+            **attrs: 附加属性（如用户输入）
+        """
+        root = self._new_span(name, "turn", None, req_id, attrs)
+        trace = TurnTrace(req_id=req_id, root=root)
+        with self._lock:
+            self._active[req_id] = trace
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.status = "error"
+            root.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end_ns = time.perf_counter_ns()
+            with self._lock:
+                self._active.pop(req_id, None)
+                self._finished.append(trace)
+
+    @contextmanager
+    def span(self, name: str, category: str, **attrs) -> Iterator[Optional[Span]]:
+        """
+        记录一个子 span（不在对话轮次内时为空操作，yield None）
+
+        Args:
+            name: 名称（节点名、模型名、工具名、命令）
+            category: 类别（node / llm_call / tool_call / git_call / command_exec ...）
+        """
+        parent = _current_span.get()
+        req_id = parent.req_id if parent is not None else _request_id()
+        with self._lock:
+            trace = self._active.get(req_id)
+        if trace is None:
+            yield None
+            return
+        if parent is None:
+            # 线程池中没有继承上下文：挂到本轮根 span 下
+            parent = trace.root
+
+        span = self._new_span(name, category, parent, req_id, attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.perf_counter_ns()
+            with self._lock:
+                if len(trace.spans) < MAX_SPANS_PER_TURN:
+                    trace.spans.append(span)
+                else:
+                    trace.dropped += 1
+
+    def current_span(self) -> Optional[Span]:
+        """当前上下文中的 span"""
+        return _current_span.get()
+
+    def get_turn(self, req_id: Optional[str] = None) -> Optional[TurnTrace]:
+        """获取已结束的轮次（默认最近一轮）"""
+        with self._lock:
+            if req_id is None:
+                return self._finished[-1] if self._finished else None
+            for trace in reversed(self._finished):
+                if trace.req_id == req_id:
+                    return trace
+        return None
+
+    def list_turns(self) -> List[TurnTrace]:
+        """最近结束的轮次（最新在后）"""
+        with self._lock:
+            return list(self._finished)
+
+    def export_chrome_trace(self, directory: str, req_id: Optional[str] = None) -> Optional[str]:
+        """
+        把一轮对话导出为 Chrome trace-event JSON 文件
+
+        Returns:
+            文件路径（没有可导出的轮次时返回 None）
+        """
+        trace = self.get_turn(req_id)
+        if trace is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(trace.started_at))
+        path = os.path.join(directory, f"trace-{stamp}-{trace.req_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(to_chrome_trace(trace), f, ensure_ascii=False, default=str)
+        return path
+
+
+def to_chrome_trace(trace: TurnTrace) -> Dict[str, Any]:
+    """
+    转换为 Chrome trace-event 格式（"X" 完整事件，时间单位为微秒，以根 span 开始为 0）
+    """
+    pid = os.getpid()
+    origin = trace.root.start_ns
+    events: List[Dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"dnm {trace.req_id}"}},
+    ]
+    threads: Dict[int, str] = {}
+    for span in [trace.root] + trace.spans:
+        threads.setdefault(span.thread_id, span.thread_name)
+        end = span.end_ns or time.perf_counter_ns()
+        events.append({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start_ns - origin) / 1000,
+            "dur": (end - span.start_ns) / 1000,
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": {
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "req_id": span.req_id,
+                "status": span.status,
+                **span.attrs,
+            },
+        })
+    for tid, name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"req_id": trace.req_id, "dropped_spans": trace.dropped},
+    }
+
+
+def traced_node(name: str, func: Callable) -> Callable:
+    """包装 LangGraph 节点函数，每次执行记录一个 node span"""
+    @functools.wraps(func)
+    def wrapper(state, *args, **kwargs):
+        token = _current_node.set(name)
+        try:
+            with tracer.span(name, "node"):
+                return func(state, *args, **kwargs)
+        finally:
+            _current_node.reset(token)
+    return wrapper
+
+
+def current_node() -> str:
+    """当前执行的图节点名（不在节点内或在线程池中时为 "-"）"""
+    return _current_node.get()
+
+
+def traced(name: str, category: str) -> Callable[[Callable], Callable]:
+    """函数装饰器：每次调用记录一个 span"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 全局追踪器实例
+tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器"""
+    return tracer
@@ -22,6 +22,7 @@ class Intent(Enum):
     FULL_GIT_WORKFLOW = "full_git_workflow"
     GIT_PULL = "git_pull"
     GIT_PUSH = "git_push"
+    MULTI_REPO_GIT = "multi_repo_git"
 
     # MCP 工具调用
     MCP_TOOL_CALL = "mcp_tool_call"
@@ -74,6 +75,8 @@ class FileContext:
     """文件上下文 - 文件引用相关"""
     referenced_files: List[str] = field(default_factory=list)
     file_contents: Dict[str, str] = field(default_factory=dict)
+    # 按 token 预算组装、可直接嵌入提示词的文件上下文
+    assembled_context: str = ""
 
     # 文件创建相关
     needs_file_creation: bool = False
@@ -216,6 +219,7 @@ class AgentState:
                 "file_content": self.file_context.file_content,
                 "referenced_files": self.file_context.referenced_files,
                 "file_contents": self.file_context.file_contents,
+                "assembled_file_context": self.file_context.assembled_context,
             })
         else:
             result.update({
@@ -224,6 +228,7 @@ class AgentState:
                 "file_content": "",
                 "referenced_files": [],
                 "file_contents": {},
+                "assembled_file_context": "",
             })
 
         # MCP 上下文
@@ -374,6 +379,7 @@ class AgentState:
             file_context = FileContext(
                 referenced_files=data.get("referenced_files", []),
                 file_contents=data.get("file_contents", {}),
+                assembled_context=data.get("assembled_file_context", ""),
                 needs_file_creation=data.get("needs_file_creation", False),
                 file_path=data.get("file_path", ""),
                 file_content=data.get("file_content", ""),
@@ -506,6 +512,7 @@ class AgentStateDict(TypedDict):
     file_content: str
     referenced_files: list
     file_contents: dict
+    assembled_file_context: str
 
     # MCP 上下文
     mcp_tool: str
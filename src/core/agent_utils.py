@@ -10,6 +10,7 @@ import shlex
 from typing import Dict
 import src.core.agent_config as config
 from src.core.agent_memory import memory
+from src.core.agent_metrics import get_metrics_collector
 from src.core.logger import get_logger, log_json_event
 
 _log = get_logger("exec")
@@ -87,30 +88,34 @@ def execute_terminal_command(command: str) -> Dict:
 
     started = time.monotonic()
     try:
-        if use_shell:
-            _log.debug("shell 模式执行: %s", command)
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding=encoding,
-                errors='replace',
-                timeout=config.COMMAND_TIMEOUT,
-                cwd=work_dir
-            )
-        else:
-            _log.debug("无 shell 执行: %s", command)
-            result = subprocess.run(
-                shlex.split(command),
-                shell=False,
-                capture_output=True,
-                text=True,
-                encoding=encoding,
-                errors='replace',
-                timeout=config.COMMAND_TIMEOUT,
-                cwd=work_dir
-            )
+        # 计入 command_exec 指标（按程序名聚合），同时在追踪时间线中显示子进程耗时
+        program = os.path.basename(command.split()[0]) if command.split() else "-"
+        with get_metrics_collector().measure_operation("command_exec", program, shell=use_shell) as ctx:
+            if use_shell:
+                _log.debug("shell 模式执行: %s", command)
+                result = subprocess.run(
+                    command,
+                    shell=True,
+                    capture_output=True,
+                    text=True,
+                    encoding=encoding,
+                    errors='replace',
+                    timeout=config.COMMAND_TIMEOUT,
+                    cwd=work_dir
+                )
+            else:
+                _log.debug("无 shell 执行: %s", command)
+                result = subprocess.run(
+                    shlex.split(command),
+                    shell=False,
+                    capture_output=True,
+                    text=True,
+                    encoding=encoding,
+                    errors='replace',
+                    timeout=config.COMMAND_TIMEOUT,
+                    cwd=work_dir
+                )
+            ctx["additional_data"]["returncode"] = result.returncode
         
         output = result.stdout if result.stdout else "(命令执行成功，无输出)"
         
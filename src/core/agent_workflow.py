@@ -4,6 +4,7 @@
 
 from langgraph.graph import StateGraph, END
 from src.core.agent_config import AgentState
+from src.core.agent_tracing import traced_node
 from src.core.nodes import (
     file_reference_processor,
     command_generator,
@@ -41,7 +42,7 @@ def route_by_intent(state: AgentState) -> str:
     """
     intent = state["intent"]
 
-    if intent in ["add_todo", "query_todo", "git_commit", "code_review", "git_pull", "git_push", "mcp_tool_call", "auto_commit", "start_project", "build_project", "diagnose_project", "stop_project", "daily_report"]:
+    if intent in ["add_todo", "query_todo", "git_commit", "code_review", "git_pull", "git_push", "multi_repo_git", "mcp_tool_call", "auto_commit", "start_project", "build_project", "diagnose_project", "stop_project", "daily_report"]:
         # 工具调用节点已完成处理，直接结束
         return "end"
     elif intent == "full_git_workflow":
@@ -118,6 +119,11 @@ def route_after_commit(state: AgentState) -> str:
 # 构建工作流
 # ============================================
 
+def _add_traced_node(workflow: StateGraph, name: str, node) -> None:
+    """添加节点，并自动包装追踪 span（turn → 节点 → LLM/工具/子进程）"""
+    workflow.add_node(name, traced_node(name, node))
+
+
 def build_agent() -> StateGraph:
     """
     构建AI智能体工作流 - 充分利用 LangChain 工具调用特性
@@ -131,25 +137,25 @@ def build_agent() -> StateGraph:
     workflow = StateGraph(AgentState)
 
     # 添加所有节点
-    workflow.add_node("process_file_references", file_reference_processor)
-    workflow.add_node("tool_calling", simple_tool_calling_node)  # 新：智能工具调用
-    workflow.add_node("generate_command", command_generator)
-    workflow.add_node("execute_command", command_executor)
-    workflow.add_node("plan_steps", multi_step_planner)
-    workflow.add_node("create_file", file_creator)
-    workflow.add_node("execute_multi_commands", multi_command_executor)
-    workflow.add_node("plan_mcp_tool", mcp_tool_planner)
-    workflow.add_node("execute_mcp_tool", mcp_tool_executor)
-    workflow.add_node("format_response", response_formatter)
-    workflow.add_node("answer_question", question_answerer)
-    workflow.add_node("process_data_conversion", data_conversion_processor)
-    workflow.add_node("process_env_diagnostic", environment_diagnostic_processor)
+    _add_traced_node(workflow, "process_file_references", file_reference_processor)
+    _add_traced_node(workflow, "tool_calling", simple_tool_calling_node)  # 新：智能工具调用
+    _add_traced_node(workflow, "generate_command", command_generator)
+    _add_traced_node(workflow, "execute_command", command_executor)
+    _add_traced_node(workflow, "plan_steps", multi_step_planner)
+    _add_traced_node(workflow, "create_file", file_creator)
+    _add_traced_node(workflow, "execute_multi_commands", multi_command_executor)
+    _add_traced_node(workflow, "plan_mcp_tool", mcp_tool_planner)
+    _add_traced_node(workflow, "execute_mcp_tool", mcp_tool_executor)
+    _add_traced_node(workflow, "format_response", response_formatter)
+    _add_traced_node(workflow, "answer_question", question_answerer)
+    _add_traced_node(workflow, "process_data_conversion", data_conversion_processor)
+    _add_traced_node(workflow, "process_env_diagnostic", environment_diagnostic_processor)
     # Git 工作流节点
-    workflow.add_node("git_pull", git_pull_node)
-    workflow.add_node("git_add", git_add_node)
-    workflow.add_node("generate_commit_message", git_commit_message_generator_node)
-    workflow.add_node("execute_commit", git_commit_executor_node)
-    workflow.add_node("git_push", git_push_node)
+    _add_traced_node(workflow, "git_pull", git_pull_node)
+    _add_traced_node(workflow, "git_add", git_add_node)
+    _add_traced_node(workflow, "generate_commit_message", git_commit_message_generator_node)
+    _add_traced_node(workflow, "execute_commit", git_commit_executor_node)
+    _add_traced_node(workflow, "git_push", git_push_node)
 
     # 设置入口
     workflow.set_entry_point("process_file_references")
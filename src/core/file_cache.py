@@ -0,0 +1,116 @@
+"""
+文件读取缓存模块
+进程级共享的文件文本缓存，按 (路径, inode, mtime_ns, size) 判定有效性
+
+同一会话中 @ 引用、fs_read、知识库构建等反复读取同一文件时，
+命中缓存只需一次 stat，无需重新读取和解码。
+
+使用: from src.core.file_cache import file_read_cache
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from src.core.agent_config import FILE_CACHE_MB
+from src.core.agent_metrics import get_metrics_collector
+
+
+class FileReadCache:
+    """带 LRU 内存上限的文件文本缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int = FILE_CACHE_MB * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存文本的总大小上限（按文件字节数计）；单个文件超过上限的 1/4 时不缓存
+        """
+        self.max_bytes = max_bytes
+        # (真实路径, 编码, 错误处理) -> ((inode, mtime_ns, size), 文本)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Tuple[int, int, int], str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def read_text(self, file_path: str, encoding: str = "utf-8", errors: str = "strict") -> str:
+        """
+        读取文件文本（优先使用缓存）
+
+        Args:
+            file_path: 文件路径
+            encoding: 文本编码
+            errors: 解码错误处理方式（同 open()）
+
+        Returns:
+            文件文本
+
+        Raises:
+            OSError: 文件不存在或无法读取
+            UnicodeDecodeError: errors="strict" 且文件无法按编码解码
+        """
+        real_path = os.path.realpath(file_path)
+        st = os.stat(real_path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        key = (real_path, encoding, errors)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        with open(real_path, "r", encoding=encoding, errors=errors) as f:
+            text = f.read()
+
+        if st.st_size <= self.max_bytes // 4:
+            with self._lock:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[0][2]
+                self._entries[key] = (stamp, text)
+                self._bytes += st.st_size
+                while self._bytes > self.max_bytes and self._entries:
+                    _, (old_stamp, _) = self._entries.popitem(last=False)
+                    self._bytes -= old_stamp[2]
+                    self.evictions += 1
+
+        return text
+
+    def invalidate(self, file_path: str) -> None:
+        """使指定文件的所有缓存项失效（写入文件后调用）"""
+        real_path = os.path.realpath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == real_path]:
+                self._bytes -= self._entries.pop(key)[0][2]
+
+    def clear(self) -> None:
+        """清空缓存（不重置计数器）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# 全局实例
+file_read_cache = FileReadCache()
+get_metrics_collector().register_cache("file_read", file_read_cache.get_stats)
@@ -0,0 +1,299 @@
+"""
+文件上下文组装模块
+按模型的 token 预算为 @ 引用的文件组装提示词上下文
+
+流程: 并行读取 -> 按行分块 -> BM25 相关性排序 -> 在预算内选取最佳片段 + 文件大纲
+
+使用: from src.core.file_context import file_context_assembler
+"""
+
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.core.agent_config import CONTEXT_TOKEN_BUDGETS, DEFAULT_CONTEXT_TOKEN_BUDGET
+
+
+# CJK 字符（中日韩统一表意文字 + 全角标点）
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+# 大纲提取规则（按扩展名）
+_OUTLINE_PATTERNS = {
+    ".py": re.compile(r"^\s*((?:async\s+)?def\s+\w+|class\s+\w+)"),
+    ".md": re.compile(r"^(#{1,4}\s+.+)"),
+    ".js": re.compile(r"^\s*((?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\s*\*?\s*\w+|class\s+\w+)|(?:export\s+)?const\s+\w+\s*=\s*(?:async\s*)?\()"),
+    ".go": re.compile(r"^(func\s+(?:\([^)]*\)\s*)?\w+|type\s+\w+\s+(?:struct|interface))"),
+    ".java": re.compile(r"^\s*((?:public|private|protected)\s+[\w<>\[\], ]*(?:class|interface|enum)\s+\w+|(?:public|private|protected)\s+[\w<>\[\], ]+\s+\w+\s*\()"),
+    ".rs": re.compile(r"^\s*((?:pub\s+)?(?:fn|struct|enum|trait|impl)\b[^{;]*)"),
+}
+_OUTLINE_PATTERNS[".ts"] = _OUTLINE_PATTERNS[".js"]
+_OUTLINE_PATTERNS[".tsx"] = _OUTLINE_PATTERNS[".js"]
+_OUTLINE_PATTERNS[".jsx"] = _OUTLINE_PATTERNS[".js"]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数（无需 tokenizer）
+
+    CJK 字符约 1 token/字，其余字符约 4 字符/token。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25 分词：英文标识符（含驼峰/下划线拆分）+ CJK 二元组
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lower = word.lower()
+        terms.append(lower)
+        parts = [p.lower() for p in _CAMEL_RE.findall(word.replace("_", " "))]
+        if len(parts) > 1:
+            terms.extend(parts)
+    for segment in re.findall(r"[\u3400-\u4dbf\u4e00-\u9fff]+", text):
+        if len(segment) == 1:
+            terms.append(segment)
+        else:
+            terms.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return terms
+
+
+def get_context_token_budget(model: Optional[str] = None) -> int:
+    """获取指定模型的文件上下文 token 预算"""
+    if model and model in CONTEXT_TOKEN_BUDGETS:
+        return int(CONTEXT_TOKEN_BUDGETS[model])
+    return int(CONTEXT_TOKEN_BUDGETS.get("default", DEFAULT_CONTEXT_TOKEN_BUDGET))
+
+
+@dataclass
+class FileChunk:
+    """文件片段（行号从 1 开始，闭区间）"""
+    path: str
+    start_line: int
+    end_line: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+@dataclass
+class AssembledFile:
+    """单个文件的组装结果"""
+    path: str
+    content: str = ""
+    total_lines: int = 0
+    total_tokens: int = 0
+    outline: List[str] = field(default_factory=list)
+    chunks: List[FileChunk] = field(default_factory=list)
+    selected: List[FileChunk] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def complete(self) -> bool:
+        """是否完整包含了全部内容（空文件视为完整）"""
+        return not self.error and len(self.selected) == len(self.chunks)
+
+
+class FileContextAssembler:
+    """按 token 预算组装文件上下文"""
+
+    def __init__(self, chunk_lines: int = 40, max_workers: int = 8,
+                 max_outline_items: int = 40, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化组装器
+
+        Args:
+            chunk_lines: 每个片段的行数
+            max_workers: 并行读取的最大线程数
+            max_outline_items: 每个文件大纲的最大条目数
+            k1: BM25 参数 k1
+            b: BM25 参数 b
+        """
+        self.chunk_lines = chunk_lines
+        self.max_workers = max_workers
+        self.max_outline_items = max_outline_items
+        self.k1 = k1
+        self.b = b
+
+    def _read_all(self, paths: List[str], reader: Callable[[str], Dict]) -> Dict[str, AssembledFile]:
+        """并行读取所有文件"""
+        def read_one(path: str) -> AssembledFile:
+            try:
+                result = reader(path)
+            except Exception as e:
+                return AssembledFile(path=path, error=str(e))
+            if not result.get("success"):
+                return AssembledFile(path=path, error=result.get("error", "读取失败"))
+            return AssembledFile(path=path, content=result.get("content", ""))
+
+        if len(paths) <= 1:
+            return {p: read_one(p) for p in paths}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            return dict(zip(paths, executor.map(read_one, paths)))
+
+    def _chunk(self, item: AssembledFile) -> None:
+        """按固定行数切分文件并提取大纲"""
+        lines = item.content.splitlines(keepends=True)
+        item.total_lines = len(lines)
+        item.total_tokens = estimate_tokens(item.content)
+
+        pattern = _OUTLINE_PATTERNS.get(Path(item.path).suffix.lower())
+        if pattern:
+            for no, line in enumerate(lines, 1):
+                m = pattern.match(line)
+                if m:
+                    item.outline.append(f"L{no} {m.group(1).strip()}")
+                    if len(item.outline) >= self.max_outline_items:
+                        break
+
+        for start in range(0, len(lines), self.chunk_lines):
+            text = "".join(lines[start:start + self.chunk_lines])
+            item.chunks.append(FileChunk(
+                path=item.path,
+                start_line=start + 1,
+                end_line=min(start + self.chunk_lines, len(lines)),
+                text=text,
+                tokens=estimate_tokens(text),
+            ))
+
+    def _score(self, chunks: List[FileChunk], query: str) -> None:
+        """使用 BM25 为所有片段打分（无查询词时按文件位置递减）"""
+        query_terms = set(tokenize(query))
+        if not chunks:
+            return
+        if not query_terms:
+            for chunk in chunks:
+                chunk.score = 1.0 / chunk.start_line
+            return
+
+        docs = [Counter(tokenize(c.text)) for c in chunks]
+        lengths = [sum(d.values()) for d in docs]
+        avg_len = (sum(lengths) / len(lengths)) or 1.0
+        n = len(docs)
+        df = {t: sum(1 for d in docs if t in d) for t in query_terms}
+
+        for chunk, doc, length in zip(chunks, docs, lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = doc.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (self.k1 + 1) / (
+                    tf + self.k1 * (1 - self.b + self.b * length / avg_len)
+                )
+            # 位置作为同分时的弱排序依据（文件开头通常包含导入和概览）
+            chunk.score = score + 1e-3 / chunk.start_line
+
+    def assemble(self, paths: List[str], question: str, token_budget: Optional[int] = None,
+                 reader: Optional[Callable[[str], Dict]] = None) -> Dict:
+        """
+        组装文件上下文
+
+        Args:
+            paths: 引用的文件路径列表
+            question: 用户问题（用于相关性排序）
+            token_budget: token 预算（None 表示使用默认模型预算）
+            reader: 读取函数，返回 read_file 风格的结果字典（默认 fs_tools.read_file）
+
+        Returns:
+            {
+                "context": str,              # 可直接嵌入提示词的文本
+                "contents": Dict[str, str],  # 成功读取的完整内容
+                "files": Dict[str, Dict],    # 每个文件的组装统计
+                "used_tokens": int,
+                "token_budget": int
+            }
+        """
+        if reader is None:
+            from src.mcp.mcp_filesystem import fs_tools
+            reader = fs_tools.read_file
+        budget = token_budget if token_budget is not None else get_context_token_budget()
+
+        items = self._read_all(paths, reader)
+        readable = [item for item in items.values() if not item.error]
+        for item in readable:
+            self._chunk(item)
+
+        used = 0
+        if sum(item.total_tokens for item in readable) <= budget:
+            # 预算充足：全部完整包含
+            for item in readable:
+                item.selected = list(item.chunks)
+            used = sum(item.total_tokens for item in readable)
+        else:
+            # 先为每个文件预留大纲（合计不超过预算的 1/5），再按相关性全局贪心选择片段
+            outline_share = budget // 5 // max(len(readable), 1)
+            for item in readable:
+                while item.outline and estimate_tokens("\n".join(item.outline)) > outline_share:
+                    item.outline.pop()
+                used += estimate_tokens("\n".join(item.outline))
+            all_chunks = [c for item in readable for c in item.chunks]
+            self._score(all_chunks, question)
+            by_path = {item.path: item for item in readable}
+            for chunk in sorted(all_chunks, key=lambda c: c.score, reverse=True):
+                if used + chunk.tokens > budget:
+                    continue
+                by_path[chunk.path].selected.append(chunk)
+                used += chunk.tokens
+
+        sections = [self._render(item) for item in items.values()]
+        return {
+            "context": "\n\n".join(s for s in sections if s),
+            "contents": {item.path: item.content for item in readable},
+            "files": {
+                item.path: {
+                    "lines": item.total_lines,
+                    "tokens": item.total_tokens,
+                    "selected_chunks": len(item.selected),
+                    "total_chunks": len(item.chunks),
+                    "complete": item.complete,
+                    "error": item.error,
+                }
+                for item in items.values()
+            },
+            "used_tokens": used,
+            "token_budget": budget,
+        }
+
+    def _render(self, item: AssembledFile) -> str:
+        """渲染单个文件的上下文片段"""
+        if item.error:
+            return f"📄 {item.path}: ❌ {item.error}"
+
+        header = f"📄 {item.path} ({item.total_lines} 行, 约 {item.total_tokens} tokens)"
+        if not item.chunks:
+            return f"{header}\n(空文件)"
+        if item.complete:
+            return f"{header}\n```\n{item.content}\n```"
+
+        parts = [f"{header} — 内容较大，仅包含与问题最相关的片段"]
+        if item.outline:
+            parts.append("大纲:\n" + "\n".join(f"  {line}" for line in item.outline))
+
+        # 按行号排序并合并相邻片段
+        spans = []
+        for chunk in sorted(item.selected, key=lambda c: c.start_line):
+            if spans and spans[-1][1] + 1 == chunk.start_line:
+                spans[-1] = (spans[-1][0], chunk.end_line, spans[-1][2] + chunk.text)
+            else:
+                spans.append((chunk.start_line, chunk.end_line, chunk.text))
+        for start, end, text in spans:
+            parts.append(f"L{start}-{end}:\n```\n{text.rstrip()}\n```")
+        if not spans:
+            parts.append("(预算不足，未包含正文)")
+        return "\n".join(parts)
+
+
+# 全局实例
+file_context_assembler = FileContextAssembler()
@@ -1,12 +1,23 @@
 """
 统一日志模块
 提供获取全局 logger 的方法，并支持通过环境变量控制日志级别。
+
+控制台与 JSON 文件日志都经由 QueueHandler → 有界队列 → QueueListener 后台线程写出，
+调用方线程只做入队（JSON 序列化也延迟到后台线程），日志不会阻塞命令与工具执行：
+- 后台线程每次取出一批记录，文件一次写入、一次 flush
+- 队列满时丢弃并计数（get_logging_stats 查看）
+- 高频事件可按事件名采样（DNM_LOG_SAMPLE="tool_call=0.1,command_exec=0.5"），警告与错误不采样
+- DNM_LOG_SYNC=1 时退回同步写入（调试用）
 """
 
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
-from typing import Optional, Dict, Any
+import queue
+import random
+import threading
+from typing import Optional, Dict, Any, List
 import json
 
 
@@ -15,6 +26,15 @@ _DEFAULT_LEVEL = os.environ.get("DNM_LOG_LEVEL", "INFO").upper()
 _JSON_LOGGER_NAME = "dnm.json"
 _JSON_LOGGER_ENABLED = False
 
+# 是否同步写日志（默认异步）
+_SYNC_LOGGING = os.environ.get("DNM_LOG_SYNC", "0") == "1"
+
+# 日志队列上限（超出后丢弃新记录）
+LOG_QUEUE_MAXSIZE = int(os.environ.get("DNM_LOG_QUEUE_SIZE", "10000"))
+
+# 后台线程单批最多处理的记录数
+LOG_BATCH_SIZE = 256
+
 
 def _level_from_env(level_str: str) -> int:
     mapping = {
@@ -28,6 +48,10 @@ def _level_from_env(level_str: str) -> int:
     return mapping.get(level_str, logging.INFO)
 
 
+# log_json_event 的 level 参数 -> logging 级别
+_LEVELS = {"debug": logging.DEBUG, "warning": logging.WARNING, "error": logging.ERROR}
+
+
 class _RequestIdFilter(logging.Filter):
     """为日志记录注入请求ID（来自环境变量 DNM_REQ_ID）。"""
 
@@ -36,6 +60,210 @@ class _RequestIdFilter(logging.Filter):
         return True
 
 
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """'tool_call=0.1,command_exec=0.5' -> {"tool_call": 0.1, "command_exec": 0.5}"""
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            rates[name.strip()] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+# 高频事件采样率：事件名 -> 保留比例（0~1）
+_SAMPLE_RATES: Dict[str, float] = _parse_sample_rates(os.environ.get("DNM_LOG_SAMPLE", ""))
+
+
+class _LogStats:
+    """异步日志计数（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.sampled_out = 0
+        self.batches = 0
+        self.records = 0
+
+    def add(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+
+_stats = _LogStats()
+
+# 已启动的后台监听器（进程退出时依次停止并写完剩余记录）
+_listeners: List["_BatchingQueueListener"] = []
+
+
+class _LazyJson:
+    """延迟到后台线程再序列化的 JSON 消息"""
+
+    __slots__ = ("payload", "_text")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self._text: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.payload, ensure_ascii=False, separators=(",", ":"), default=str)
+        return self._text
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """有界队列的 QueueHandler：队列满时丢弃记录并计数，调用方永不阻塞"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats.add("dropped")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在调用方线程格式化：消息（含 _LazyJson）由后台线程格式化；
+        # 异常堆栈在此处转成文本，避免 traceback 对象跨线程持有
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class _BatchRotatingFileHandler(RotatingFileHandler):
+    """支持整批写入的 RotatingFileHandler（一批只写一次、flush 一次）"""
+
+    def emit_batch(self, records: List[logging.LogRecord]) -> None:
+        try:
+            text = "".join(self.format(r) + self.terminator for r in records)
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0:
+                self.stream.seek(0, 2)
+                if self.stream.tell() and self.stream.tell() + len(text.encode("utf-8")) >= self.maxBytes:
+                    self.doRollover()
+            self.stream.write(text)
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class _BatchingQueueListener(QueueListener):
+    """QueueListener：每次从队列取出一批记录再交给 handler"""
+
+    def __init__(self, q: "queue.Queue", *handlers: logging.Handler):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self._sentinel_pending = False
+
+    def dequeue(self, block: bool):
+        if self._sentinel_pending:
+            self._sentinel_pending = False
+            return self._sentinel
+        first = self.queue.get(block)
+        if first is self._sentinel:
+            return first
+        batch = [first]
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is self._sentinel:
+                # 留到下一次 dequeue 返回（task_done 由 _monitor 负责）
+                self._sentinel_pending = True
+                break
+            batch.append(record)
+        return batch
+
+    def prepare(self, record):
+        return record
+
+    def handle(self, batch) -> None:
+        try:
+            self._handle_batch(batch)
+        finally:
+            # 基类只对 dequeue 返回的对象调用一次 task_done，其余记录在写出后补上
+            for _ in range(len(batch) - 1):
+                self.queue.task_done()
+
+    def _handle_batch(self, batch: List[logging.LogRecord]) -> None:
+        _stats.add("batches")
+        _stats.add("records", len(batch))
+        for handler in self.handlers:
+            records = [r for r in batch if r.levelno >= handler.level]
+            if not records:
+                continue
+            if hasattr(handler, "emit_batch"):
+                handler.acquire()
+                try:
+                    handler.emit_batch([r for r in records if handler.filter(r)])
+                finally:
+                    handler.release()
+            else:
+                for record in records:
+                    handler.handle(record)
+
+    def enqueue_sentinel(self) -> None:
+        # 队列可能已满：阻塞等待后台线程腾出空间
+        self.queue.put(self._sentinel)
+
+
+def _async_handler(target: logging.Handler) -> logging.Handler:
+    """把 target 包装为异步：返回挂到 logger 上的 QueueHandler，并启动后台监听线程"""
+    if _SYNC_LOGGING:
+        return target
+    q: "queue.Queue" = queue.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+    listener = _BatchingQueueListener(q, target)
+    listener.start()
+    _listeners.append(listener)
+    return _DroppingQueueHandler(q)
+
+
+def flush_logs() -> None:
+    """等待所有已入队的日志写出"""
+    for listener in list(_listeners):
+        if listener._thread is not None:
+            listener.queue.join()
+
+
+@atexit.register
+def _stop_listeners() -> None:
+    """进程退出时停止后台线程（先写完队列中的记录）"""
+    while _listeners:
+        listener = _listeners.pop()
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+
+def get_logging_stats() -> Dict[str, int]:
+    """异步日志统计：队列长度、丢弃数、采样丢弃数、批次数与写出记录数"""
+    return {
+        "queued": sum(listener.queue.qsize() for listener in _listeners),
+        "dropped": _stats.dropped,
+        "sampled_out": _stats.sampled_out,
+        "batches": _stats.batches,
+        "records": _stats.records,
+    }
+
+
+def set_event_sampling(event: str, rate: Optional[float]) -> None:
+    """
+    设置高频事件的采样率
+
+    Args:
+        event: 事件名（log_json_event 的 event）
+        rate: 保留比例 0~1；None 表示取消采样
+    """
+    if rate is None:
+        _SAMPLE_RATES.pop(event, None)
+    else:
+        _SAMPLE_RATES[event] = min(max(float(rate), 0.0), 1.0)
+
+
 def get_logger(name: Optional[str] = None) -> logging.Logger:
     """获取项目统一 logger。
 
@@ -48,12 +276,14 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
     if not logging.getLogger(_LOGGER_NAME).handlers:
         # 仅初始化一次根 logger（dnm）
         root = logging.getLogger(_LOGGER_NAME)
-        handler = logging.StreamHandler()
+        console = logging.StreamHandler()
         formatter = logging.Formatter(
             fmt="%(asctime)s %(levelname)s %(name)s req=%(request_id)s - %(message)s",
             datefmt="%H:%M:%S",
         )
-        handler.setFormatter(formatter)
+        console.setFormatter(formatter)
+        handler = _async_handler(console)
+        # 请求ID 必须在调用方线程注入（后台线程读不到本轮的 DNM_REQ_ID）
         handler.addFilter(_RequestIdFilter())
         root.addHandler(handler)
         root.setLevel(_level_from_env(_DEFAULT_LEVEL))
@@ -72,34 +302,30 @@ def get_request_id() -> str:
 
 
 def log_json_event(logger: logging.Logger, event: str, data: Dict[str, Any], level: str = "info") -> None:
-    """以 JSON 结构写入一条事件日志。
+    """以 JSON 结构写入一条事件日志（只入队，不在调用方线程序列化和写出）。
 
     message 结构:
       {"event": "<name>", "req": "<request_id>", "data": {...}}
+    被采样的事件额外带 "sample_rate"。
     """
-    payload = {"event": event, "req": get_request_id(), "data": data}
-    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
     level = (level or "info").lower()
-    if level == "debug":
-        logger.debug(text)
-    elif level == "warning":
-        logger.warning(text)
-    elif level == "error":
-        logger.error(text)
-    else:
-        logger.info(text)
+    # 高频事件采样（警告与错误始终保留）
+    rate = _SAMPLE_RATES.get(event)
+    if rate is not None and level in ("debug", "info"):
+        if random.random() >= rate:
+            _stats.add("sampled_out")
+            return
+    payload = {"event": event, "req": get_request_id(), "data": dict(data)}
+    if rate is not None:
+        payload["sample_rate"] = rate
+    # 序列化延迟到写出时（后台线程）
+    message = _LazyJson(payload)
+    log_level = _LEVELS.get(level, logging.INFO)
+    logger.log(log_level, message)
 
-    # 同步写入 JSON 文件 logger（若已启用）
+    # 同时写入 JSON 文件 logger（若已启用）
     if _JSON_LOGGER_ENABLED:
-        jl = logging.getLogger(_JSON_LOGGER_NAME)
-        if level == "debug":
-            jl.debug(text)
-        elif level == "warning":
-            jl.warning(text)
-        elif level == "error":
-            jl.error(text)
-        else:
-            jl.info(text)
+        logging.getLogger(_JSON_LOGGER_NAME).log(log_level, message)
 
 
 def enable_json_file_logging(path: Optional[str] = None, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5) -> Optional[str]:
@@ -135,12 +361,12 @@ def enable_json_file_logging(path: Optional[str] = None, max_bytes: int = 5 * 10
         _JSON_LOGGER_ENABLED = True
         return path
 
-    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler = _BatchRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
     # 仅写入原始 JSON 文本
     handler.setFormatter(logging.Formatter(fmt="%(message)s"))
     # 只记录 info 及以上（可按需调整）
     jl.setLevel(_level_from_env(os.environ.get("DNM_JSON_LOG_LEVEL", "INFO").upper()))
-    jl.addHandler(handler)
+    jl.addHandler(_async_handler(handler))
     jl.propagate = False  # 不向上冒泡，避免被控制台 handler 再次处理
     _JSON_LOGGER_ENABLED = True
     return path
@@ -0,0 +1,271 @@
+"""
+Prometheus / OpenMetrics 指标导出模块
+把 MetricsCollector、ResilienceManager 与已注册缓存的统计以文本格式暴露给抓取端：
+
+- HTTP 端点: 本地监听 /metrics，按 Accept 头返回 OpenMetrics 或 Prometheus 文本格式
+- textfile: 定期原子写入 .prom 文件，供 node_exporter 的 textfile collector 读取
+
+指标:
+    dnm_operations_total{type,name,result}      操作次数（LLM / 工具 / 命令 / Git 调用）
+    dnm_operation_duration_seconds{type,name}   操作耗时直方图
+    dnm_llm_tokens_total{kind}                  Token 用量
+    dnm_circuit_breaker_state{operation,state}  熔断器状态（当前状态为 1）
+    dnm_circuit_breaker_failures{operation}     熔断器连续失败次数
+    dnm_cache_hits_total / dnm_cache_misses_total / dnm_cache_hit_ratio{cache}
+    dnm_errors_total{error}                     错误次数
+
+只依赖标准库；默认关闭，通过配置 metrics.prometheus_port / metrics.prometheus_textfile
+或命令行 --metrics-port 开启。
+
+使用: from src.core.metrics_exporter import render_metrics, start_metrics_exporter
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from src.core.agent_metrics import MetricsCollector, get_metrics_collector
+from src.core.agent_resilience import ResilienceManager, get_resilience_manager
+
+
+# 直方图上界（秒），覆盖本地命令的毫秒级到 LLM 调用的分钟级
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 熔断器可能的状态
+_BREAKER_STATES = ("CLOSED", "OPEN", "HALF_OPEN")
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    """标签值转义（反斜杠、双引号、换行）"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Family:
+    """一个指标族（同名、同类型的样本集合）"""
+
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples: List[Tuple[str, Dict[str, object], float]] = []
+
+    def add(self, suffix: str, labels: Dict[str, object], value: float) -> None:
+        self.samples.append((suffix, labels, value))
+
+    def render(self, openmetrics: bool) -> List[str]:
+        # Prometheus 文本格式中计数器的族名带 _total 后缀，OpenMetrics 中不带
+        family = self.name + "_total" if self.kind == "counter" and not openmetrics else self.name
+        lines = [f"# HELP {family} {self.help_text}", f"# TYPE {family} {self.kind}"]
+        for suffix, labels, value in self.samples:
+            lines.append(f"{self.name}{suffix}{_labels(labels)} {_number(value)}")
+        return lines
+
+
+def collect_families(collector: Optional[MetricsCollector] = None,
+                     resilience: Optional[ResilienceManager] = None) -> List[_Family]:
+    """从收集器、韧性管理器与缓存统计生成指标族"""
+    collector = collector or get_metrics_collector()
+    resilience = resilience or get_resilience_manager()
+
+    operations = _Family("dnm_operations", "counter", "Measured operations by type, name and result.")
+    durations = _Family("dnm_operation_duration_seconds", "histogram", "Operation latency in seconds.")
+    bounds_ms = [b * 1000 for b in DURATION_BUCKETS]
+    for (op_type, op_name), aggregate in sorted(collector.get_aggregates().items()):
+        base = {"type": op_type, "name": op_name}
+        operations.add("_total", {**base, "result": "success"}, aggregate.success_count)
+        operations.add("_total", {**base, "result": "failure"}, aggregate.count - aggregate.success_count)
+        for bound, count in zip(DURATION_BUCKETS, aggregate.histogram.cumulative_counts(bounds_ms)):
+            durations.add("_bucket", {**base, "le": _number(bound)}, count)
+        durations.add("_bucket", {**base, "le": "+Inf"}, aggregate.count)
+        durations.add("_count", base, aggregate.count)
+        durations.add("_sum", base, aggregate.total_ms / 1000)
+
+    tokens = _Family("dnm_llm_tokens", "counter", "LLM tokens consumed in this session.")
+    usage = collector.get_token_usage_summary()
+    for kind in ("prompt", "completion"):
+        tokens.add("_total", {"kind": kind}, usage.get(f"{kind}_tokens", 0))
+
+    health = resilience.get_health_status()
+    breaker_state = _Family("dnm_circuit_breaker_state", "gauge", "Circuit breaker state (1 for the current state).")
+    breaker_failures = _Family("dnm_circuit_breaker_failures", "gauge", "Consecutive failures counted by the breaker.")
+    for operation, breaker in sorted(health["circuit_breakers"].items()):
+        for state in _BREAKER_STATES:
+            breaker_state.add("", {"operation": operation, "state": state}, int(breaker["state"] == state))
+        breaker_failures.add("", {"operation": operation}, breaker["failure_count"])
+    errors = _Family("dnm_errors", "counter", "Errors handled by the resilience manager.")
+    for error, count in sorted(health["error_stats"].items()):
+        errors.add("_total", {"error": error}, count)
+
+    hits = _Family("dnm_cache_hits", "counter", "Cache hits.")
+    misses = _Family("dnm_cache_misses", "counter", "Cache misses.")
+    ratio = _Family("dnm_cache_hit_ratio", "gauge", "Cache hit ratio.")
+    for name, stats in sorted(collector.get_cache_stats().items()):
+        if "error" in stats:
+            continue
+        hits.add("_total", {"cache": name}, stats.get("hits", 0))
+        misses.add("_total", {"cache": name}, stats.get("misses", 0))
+        ratio.add("", {"cache": name}, stats.get("hit_rate", 0.0))
+
+    start = _Family("dnm_session_start_time_seconds", "gauge", "Unix time the session started.")
+    start.add("", {}, collector.get_session_stats().start_time.timestamp())
+
+    return [operations, durations, tokens, breaker_state, breaker_failures, errors, hits, misses, ratio, start]
+
+
+def render_metrics(openmetrics: bool = True, collector: Optional[MetricsCollector] = None,
+                   resilience: Optional[ResilienceManager] = None) -> str:
+    """
+    渲染全部指标
+
+    Args:
+        openmetrics: True 为 OpenMetrics 格式（以 # EOF 结尾），False 为 Prometheus 文本格式 0.0.4
+
+    Returns:
+        指标文本
+    """
+    lines: List[str] = []
+    for family in collect_families(collector, resilience):
+        lines.extend(family.render(openmetrics))
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str) -> None:
+    """原子写入 textfile（Prometheus 文本格式，node_exporter textfile collector 使用）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".dnm_metrics.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(render_metrics(openmetrics=False))
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 请求处理"""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = render_metrics(openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不输出到终端
+        pass
+
+
+class MetricsExporter:
+    """HTTP 端点与 textfile 导出（均在后台线程中运行）"""
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1",
+                 textfile: str = "", textfile_interval: float = 15.0):
+        """
+        Args:
+            port: HTTP 端口（0 表示不启动 HTTP 端点）
+            host: 监听地址（默认只监听本机）
+            textfile: textfile 路径（空表示不写入）
+            textfile_interval: textfile 写入间隔（秒）
+        """
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.textfile_interval = textfile_interval
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def address(self) -> str:
+        """HTTP 端点地址（未启动时为空字符串）"""
+        if self._server is None:
+            return ""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> None:
+        """启动 HTTP 端点与 textfile 写入线程"""
+        if self.port:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self._server.daemon_threads = True
+            thread = threading.Thread(target=self._server.serve_forever, name="dnm-metrics-http", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.textfile:
+            thread = threading.Thread(target=self._textfile_loop, name="dnm-metrics-textfile", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _textfile_loop(self) -> None:
+        while not self._stop.wait(self.textfile_interval):
+            self._write_textfile()
+
+    def _write_textfile(self) -> None:
+        try:
+            write_textfile(self.textfile)
+        except OSError as e:
+            print(f"⚠️ 写入指标文件失败: {e}")
+
+    def stop(self) -> None:
+        """停止导出（textfile 在退出前写入最后一次）"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.textfile:
+            self._write_textfile()
+
+
+# 全局导出器实例（未开启时为 None）
+metrics_exporter: Optional[MetricsExporter] = None
+
+
+def start_metrics_exporter(port: int = 0, host: str = "127.0.0.1", textfile: str = "",
+                           textfile_interval: float = 15.0) -> Optional[MetricsExporter]:
+    """
+    按配置启动全局导出器（端口与 textfile 都未配置时不启动），进程退出时自动停止
+
+    Returns:
+        MetricsExporter；未启动时返回 None
+    """
+    global metrics_exporter
+    if not port and not textfile:
+        return None
+    if metrics_exporter is None:
+        metrics_exporter = MetricsExporter(port, host, textfile, textfile_interval)
+        metrics_exporter.start()
+        atexit.register(metrics_exporter.stop)
+    return metrics_exporter
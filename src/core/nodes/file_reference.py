@@ -3,7 +3,8 @@
 解析 @ 语法并读取文件内容
 """
 
-from src.core.agent_config import AgentState
+from src.core.agent_config import AgentState, LLM_CONFIG
+from src.core.file_context import file_context_assembler, get_context_token_budget
 from src.mcp.mcp_manager import mcp_manager
 from src.ui.file_reference_parser import parse_file_references, file_parser
 
@@ -17,6 +18,7 @@ def file_reference_processor(state: AgentState) -> dict:
 
     file_contents = {}
     referenced_files = []
+    assembled_context = ""
 
     if file_references:
         print(f"[文件引用] 发现 {len(file_references)} 个文件引用")
@@ -25,46 +27,53 @@ def file_reference_processor(state: AgentState) -> dict:
         summary = file_parser.format_reference_summary(file_references)
         print(summary)
 
-        # 读取文件内容
-        for ref in file_references:
-            if ref.exists and not ref.is_directory:
-                try:
-                    # 使用 MCP 文件系统工具读取文件
-                    result = mcp_manager.call_tool(
-                        "filesystem", "read_file", {"path": ref.file_path}
-                    )
+        # 并行读取所有文件，并按 token 预算组装提示词上下文
+        file_refs = [ref for ref in file_references if ref.exists and not ref.is_directory]
+        if file_refs:
+            assembled = file_context_assembler.assemble(
+                [ref.file_path for ref in file_refs],
+                question=processed_input,
+                token_budget=get_context_token_budget(LLM_CONFIG.get("model")),
+                reader=lambda path: mcp_manager.call_tool("fs_read", file_path=path),
+            )
+            file_contents.update(assembled["contents"])
+            assembled_context = assembled["context"]
 
-                    if result.get("success"):
-                        content = result.get("content", "")
-                        file_contents[ref.file_path] = content
-                        referenced_files.append(
-                            {
-                                "path": ref.file_path,
-                                "original_ref": ref.original_text,
-                                "confidence": ref.match_confidence,
-                                "size": len(content),
-                            }
-                        )
-                        print(
-                            f"[文件引用] ✅ 已读取: {ref.file_path} ({len(content)} 字符)"
-                        )
-                    else:
-                        print(f"[文件引用] ❌ 读取失败: {ref.file_path}")
+            for ref in file_refs:
+                info = assembled["files"][ref.file_path]
+                if info["error"]:
+                    print(f"[文件引用] ❌ 读取失败: {ref.file_path} ({info['error']})")
+                    continue
+                content = assembled["contents"][ref.file_path]
+                referenced_files.append(
+                    {
+                        "path": ref.file_path,
+                        "original_ref": ref.original_text,
+                        "confidence": ref.match_confidence,
+                        "size": len(content),
+                        "complete": info["complete"],
+                    }
+                )
+                detail = "" if info["complete"] else (
+                    f", 选取 {info['selected_chunks']}/{info['total_chunks']} 个片段"
+                )
+                print(f"[文件引用] ✅ 已读取: {ref.file_path} ({len(content)} 字符{detail})")
 
-                except Exception as e:
-                    print(f"[文件引用] ❌ 读取错误 {ref.file_path}: {str(e)}")
+            print(
+                f"[文件引用] 🧮 上下文约 {assembled['used_tokens']}/{assembled['token_budget']} tokens"
+            )
 
-            elif ref.exists and ref.is_directory:
-                # 处理目录引用
+        for ref in file_references:
+            if ref.exists and ref.is_directory:
+                # 处理目录引用：使用有界的目录摘要代替完整条目列表
                 try:
-                    result = mcp_manager.call_tool(
-                        "filesystem", "list_directory", {"path": ref.file_path}
-                    )
+                    result = mcp_manager.call_tool("fs_summary", dir_path=ref.file_path)
 
                     if result.get("success"):
-                        dir_content = result.get("entries", [])
-                        file_contents[ref.file_path] = (
-                            f"目录内容: {', '.join(dir_content)}"
+                        summary = result.get("summary", "")
+                        file_contents[ref.file_path] = summary
+                        assembled_context = "\n\n".join(
+                            part for part in (assembled_context, summary) if part
                         )
                         referenced_files.append(
                             {
@@ -72,17 +81,20 @@ def file_reference_processor(state: AgentState) -> dict:
                                 "original_ref": ref.original_text,
                                 "confidence": ref.match_confidence,
                                 "type": "directory",
-                                "entries": len(dir_content),
+                                "entries": result.get("total_files", 0),
                             }
                         )
                         print(
-                            f"[文件引用] 📁 目录: {ref.file_path} ({len(dir_content)} 项)"
+                            f"[文件引用] 📁 目录: {ref.file_path} "
+                            f"({result.get('total_files', 0)} 个文件, {result.get('total_dirs', 0)} 个子目录)"
                         )
+                    else:
+                        print(f"[文件引用] ❌ 目录读取失败: {ref.file_path} ({result.get('error', '')})")
 
                 except Exception as e:
                     print(f"[文件引用] ❌ 目录读取错误 {ref.file_path}: {str(e)}")
 
-            else:
+            elif not ref.exists:
                 print(f"[文件引用] ⚠️  文件不存在: {ref.file_path}")
                 # 提供建议
                 suggestions = file_parser.get_file_suggestions(
@@ -98,4 +110,5 @@ def file_reference_processor(state: AgentState) -> dict:
         "user_input": processed_input,
         "referenced_files": referenced_files,
         "file_contents": file_contents,
+        "assembled_file_context": assembled_context,
     }
@@ -4,16 +4,87 @@ Git 工作流节点
 """
 
 import re
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
 from src.core.agent_config import AgentState
-from src.tools.git_tools import git_tools
+from src.tools.git_tools import GitTools, git_tools
+from src.tools.git_pipeline import preview_staged_changes, preview_is_current, prepare_push
 from src.tools.auto_commit_tools import git_add_all, git_commit_with_message
-from src.tools.git_commit_tools import generate_commit_message_tool_func
-from src.core.logger import get_logger, log_json_event
+from src.tools.git_commit_tools import generate_commit_message_tool_func, generate_commit_message_from_analysis
+from src.core.logger import get_logger, get_request_id, log_json_event
 
 _log = get_logger("nodes")
 
 
+def _extract_commit_message(result_text: str) -> str:
+    """从 commit 消息工具的输出中提取消息"""
+    if "❌" in result_text:
+        return ""
+    match = re.search(r'git commit -m "([^"]+)"', result_text)
+    return match.group(1) if match else ""
+
+
+class _GitWorkflowPipeline:
+    """
+    完整 Git 工作流的流水线：pull 的网络传输期间并行完成
+
+    - 基于预演暂存的快照提前生成 commit 消息（LLM 调用与 fetch 重叠）
+    - 提前确定推送分支
+
+    pull 失败时调用 cancel()：尚未开始的 LLM 调用不再发起，避免浪费 token 和输出混杂。
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="git-pipeline")
+        self.message_future: Future = executor.submit(self._prepare_message)
+        self.branch_future: Future = executor.submit(prepare_push, ".")
+        executor.shutdown(wait=False)
+
+    def cancel(self) -> None:
+        """取消流水线（已在进行的 LLM 调用无法中断，其结果被丢弃）"""
+        self.cancelled.set()
+        self.message_future.cancel()
+
+    def _prepare_message(self):
+        """预演 git add 并生成 commit 消息，返回 (预演结果, 消息)"""
+        if self.cancelled.is_set():
+            return None, ""
+        preview = preview_staged_changes(".")
+        if preview is None or self.cancelled.is_set():
+            return preview, ""
+        analysis = GitTools.analyze_snapshot(preview.snapshot)
+        if not analysis["success"] or self.cancelled.is_set():
+            return preview, ""
+        return preview, _extract_commit_message(generate_commit_message_from_analysis(analysis))
+
+
+# (请求ID, 流水线)：仅在同一轮对话内有效
+_pipeline: Optional[Tuple[str, _GitWorkflowPipeline]] = None
+_pipeline_lock = threading.Lock()
+
+
+def _current_pipeline() -> Optional[_GitWorkflowPipeline]:
+    """本轮对话的流水线（没有时返回 None）"""
+    with _pipeline_lock:
+        if _pipeline is not None and _pipeline[0] == get_request_id():
+            return _pipeline[1]
+    return None
+
+
+def _cancel_pipeline() -> None:
+    """取消并移除本轮对话的流水线（pull 失败、工作流终止时调用）"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None or _pipeline[0] != get_request_id():
+            return
+        pipeline = _pipeline[1]
+        _pipeline = None
+    pipeline.cancel()
+
+
 def git_commit_generator(state: AgentState) -> dict:
     """生成Git commit消息"""
     print(f"[Git Commit] 调用Git commit工具...")
@@ -45,20 +116,40 @@ def git_add_node(state: AgentState) -> dict:
         return {"git_add_success": False, "response": f"❌ Git add 执行失败: {str(e)}", "error": str(e)}
 
 
+def _pipelined_commit_message() -> str:
+    """取流水线中预生成的 commit 消息（暂存内容与预演一致时才可用）"""
+    pipeline = _current_pipeline()
+    if pipeline is None:
+        return ""
+    try:
+        preview, message = pipeline.message_future.result()
+    except Exception as e:
+        print(f"[Commit 生成] ⚠️ 预生成失败，重新生成: {e}")
+        return ""
+    if preview is None or not message:
+        return ""
+    if not preview_is_current(preview, git_tools.get_snapshot().staged_files):
+        print(f"[Commit 生成] 拉取改动了已暂存的文件，重新生成 commit 消息")
+        return ""
+    return message
+
+
 def git_commit_message_generator_node(state: AgentState) -> dict:
     """Git 工作流节点 2: 生成 commit 消息"""
     print(f"\n💡 [Git 工作流 2/3] 生成 commit 消息...")
     try:
+        commit_message = _pipelined_commit_message()
+        if commit_message:
+            print(f"[Commit 生成] ✅ 使用拉取期间预生成的消息")
+            log_json_event(_log, "git_pipeline.message_reused", {})
+            return {"git_commit_message_generated": True, "git_commit_message": commit_message, "git_file_stats": "变更", "response": f"✅ 已生成 commit 消息:\n  {commit_message}"}
+
         result_text = generate_commit_message_tool_func("")
         if "❌" in result_text:
             print(f"[Commit 生成] ❌ 生成失败")
             return {"git_commit_message_generated": False, "response": f"❌ Git 提交流程终止\n\n步骤 1: ✅ 已暂存变更\n步骤 2: ❌ {result_text}", "error": result_text}
         
-        commit_message = ""
-        if 'git commit -m "' in result_text:
-            match = re.search(r'git commit -m "([^"]+)"', result_text)
-            if match:
-                commit_message = match.group(1)
+        commit_message = _extract_commit_message(result_text)
         
         if not commit_message:
             return {"git_commit_message_generated": False, "response": "❌ 无法提取 commit 消息", "error": "parse_error"}
@@ -94,8 +185,13 @@ def git_commit_executor_node(state: AgentState) -> dict:
 
 def git_pull_node(state: AgentState) -> dict:
     """Git 工作流节点: 执行 git pull"""
+    global _pipeline
     print(f"\n⬇️  [Git Pull] 拉取最新代码...")
     try:
+        if state.get("intent") == "full_git_workflow":
+            # 拉取期间并行预生成 commit 消息、确定推送分支
+            with _pipeline_lock:
+                _pipeline = (get_request_id(), _GitWorkflowPipeline())
         result = git_tools.git_pull()
         if result["success"]:
             has_updates = result.get("has_updates", False)
@@ -103,9 +199,11 @@ def git_pull_node(state: AgentState) -> dict:
             return {"git_pull_success": True, "git_pull_has_updates": has_updates, "response": result["message"]}
         else:
             error_msg = result.get("error", "git pull 失败")
+            _cancel_pipeline()
             print(f"[Git Pull] ❌ {error_msg}")
             return {"git_pull_success": False, "response": f"❌ Git pull 失败: {error_msg}", "error": error_msg}
     except Exception as e:
+        _cancel_pipeline()
         print(f"[Git Pull] ❌ 异常: {e}")
         return {"git_pull_success": False, "response": f"❌ Git pull 执行失败: {str(e)}", "error": str(e)}
 
@@ -114,11 +212,14 @@ def git_push_node(state: AgentState) -> dict:
     """Git 工作流节点: 执行 git push"""
     print(f"\n⬆️  [Git Push] 推送代码到远程...")
     try:
-        branch_info = git_tools.get_current_branch()
-        if not branch_info["success"]:
-            return {"git_push_success": False, "response": "❌ 无法获取当前分支", "error": branch_info.get("error")}
+        pipeline = _current_pipeline()
+        branch = pipeline.branch_future.result() if pipeline is not None else ""
+        if not branch:
+            branch_info = git_tools.get_current_branch()
+            if not branch_info["success"]:
+                return {"git_push_success": False, "response": "❌ 无法获取当前分支", "error": branch_info.get("error")}
+            branch = branch_info["branch"]
         
-        branch = branch_info["branch"]
         result = git_tools.git_push(branch)
         if result["success"]:
             print(f"[Git Push] ✅ {result['message']}")
@@ -19,12 +19,17 @@ def question_answerer(state: AgentState) -> dict:
     context = memory.get_context_string()
     recent_commands = memory.get_recent_commands()
 
+    # 引用文件的上下文（已按 token 预算截取）
+    file_context = ""
+    if state.get("assembled_file_context"):
+        file_context = f"\n📁 用户引用的文件:\n{state['assembled_file_context']}\n"
+
     prompt = f"""你是一个友好的AI终端助手。回答用户问题，并利用对话历史提供更好的帮助。
 
 {context}
 
 {recent_commands}
-
+{file_context}
 当前问题: {user_input}
 
 请简洁但全面地回答用户的问题。如果用户提到\"刚才\"、\"之前\"等词，请参考对话历史。
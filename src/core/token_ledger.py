@@ -0,0 +1,310 @@
+"""
+Token 与费用账本模块
+每次 LLM 调用追加一行 JSON（只追加、按大小轮转），记录输入/输出 token、延迟与估算费用，
+并标注请求ID、图节点、context_type 与提示缓存命中情况；跨会话持久保存，供 `dnm stats` 统计
+
+- 费用按 llm_configs.<primary|secondary>.pricing 中的每百万 token 单价估算（未配置时为 0）
+- 流式调用未返回 usage 时按字符数估算 token，并标记 estimated
+
+使用: from src.core.token_ledger import get_token_ledger
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.core.agent_config import (
+    LLM_PRICING,
+    TOKEN_LEDGER_BACKUP_COUNT,
+    TOKEN_LEDGER_CURRENCY,
+    TOKEN_LEDGER_FILE,
+    TOKEN_LEDGER_MAX_BYTES,
+)
+from src.core.agent_tracing import current_node
+
+
+# 提示词预览长度（字符）
+PROMPT_PREVIEW_CHARS = 80
+
+# 报告中列出的高费用提示词条数
+TOP_PROMPTS = 5
+
+
+@dataclass
+class LedgerEntry:
+    """一次 LLM 调用"""
+    ts: float
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: float = 0.0
+    cost: float = 0.0
+    success: bool = True
+    req_id: str = "-"
+    node: str = "-"
+    context_type: str = "default"
+    cache_hit: bool = False
+    stream: bool = False
+    fallback: bool = False
+    estimated: bool = False
+    prompt_hash: str = ""
+    prompt_preview: str = ""
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0,
+                  pricing: Optional[Dict[str, Dict[str, float]]] = None) -> float:
+    """
+    按每百万 token 单价估算费用
+
+    命中提示缓存的输入 token 按 cached_prompt 单价计（未配置时按 prompt 单价）。
+    """
+    prices = (LLM_PRICING if pricing is None else pricing).get(model) or {}
+    prompt_price = float(prices.get("prompt", 0.0))
+    cached_price = float(prices.get("cached_prompt", prompt_price))
+    completion_price = float(prices.get("completion", 0.0))
+    cached = min(cached_tokens, prompt_tokens)
+    return ((prompt_tokens - cached) * prompt_price + cached * cached_price
+            + completion_tokens * completion_price) / 1_000_000
+
+
+def _prompt_text(messages: List[Any]) -> str:
+    """取最后一条消息的文本（提示词主体）"""
+    for message in reversed(messages or []):
+        content = getattr(message, "content", message)
+        if isinstance(content, str) and content.strip():
+            return content
+    return ""
+
+
+class TokenLedger:
+    """只追加的 JSONL 账本（按大小轮转：ledger.jsonl -> ledger.jsonl.1 -> ...）"""
+
+    def __init__(self, path: str = TOKEN_LEDGER_FILE, max_bytes: int = TOKEN_LEDGER_MAX_BYTES,
+                 backup_count: int = TOKEN_LEDGER_BACKUP_COUNT,
+                 pricing: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Args:
+            path: 账本文件路径
+            max_bytes: 单个文件上限，超出后轮转
+            backup_count: 保留的轮转文件数
+            pricing: 模型单价（默认取配置）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.pricing = LLM_PRICING if pricing is None else pricing
+        self._lock = threading.Lock()
+
+    def record_call(self, model: str, messages: List[Any], token_usage: Optional[Dict[str, int]],
+                    latency_ms: float, success: bool = True, context_type: str = "default",
+                    stream: bool = False, fallback: bool = False,
+                    completion_text: str = "") -> LedgerEntry:
+        """
+        记录一次 LLM 调用（请求ID与节点取自当前上下文）
+
+        Args:
+            model: 实际使用的模型
+            messages: 发送的消息（用于提示词哈希、预览与缺少 usage 时的估算）
+            token_usage: {"prompt_tokens", "completion_tokens", "cached_tokens"}，可为 None
+            latency_ms: 调用耗时
+            completion_text: 回复文本（缺少 usage 时用于估算）
+
+        Returns:
+            写入的 LedgerEntry
+        """
+        prompt = _prompt_text(messages)
+        usage = token_usage or {}
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        cached_tokens = int(usage.get("cached_tokens") or 0)
+        estimated = False
+        if success and not prompt_tokens and not completion_tokens:
+            from src.core.file_context import estimate_tokens
+            prompt_tokens = sum(estimate_tokens(_prompt_text([m])) for m in messages or [])
+            completion_tokens = estimate_tokens(completion_text)
+            estimated = True
+
+        entry = LedgerEntry(
+            ts=time.time(),
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            latency_ms=round(latency_ms, 1),
+            cost=estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, self.pricing),
+            success=success,
+            req_id=os.environ.get("DNM_REQ_ID", "-"),
+            node=current_node(),
+            context_type=context_type,
+            cache_hit=cached_tokens > 0,
+            stream=stream,
+            fallback=fallback,
+            estimated=estimated,
+            prompt_hash=hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12] if prompt else "",
+            prompt_preview=" ".join(prompt.split())[:PROMPT_PREVIEW_CHARS],
+        )
+        self.append(entry)
+        return entry
+
+    def append(self, entry: LedgerEntry) -> None:
+        """追加一条记录（写入失败只提示，不影响调用方）"""
+        line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._rollover_if_needed(len(line.encode("utf-8")))
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"[Token账本] ⚠️ 写入失败: {e}")
+
+    def _rollover_if_needed(self, incoming: int) -> None:
+        """超出大小上限时轮转（调用方持有锁）"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def iter_entries(self, since: Optional[float] = None) -> Iterator[LedgerEntry]:
+        """按时间顺序遍历记录（含轮转文件；损坏的行跳过）"""
+        names = {f.name for f in fields(LedgerEntry)}
+        paths = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)] + [self.path]
+        for path in paths:
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except OSError:
+                continue
+            with f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                        entry = LedgerEntry(**{k: v for k, v in data.items() if k in names})
+                    except (ValueError, TypeError):
+                        continue
+                    if since is None or entry.ts >= since:
+                        yield entry
+
+    def summarize(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """
+        汇总指定时间以来的消耗
+
+        Returns:
+            {"calls", "failed", "prompt_tokens", "completion_tokens", "cached_tokens", "cost",
+             "avg_latency_ms", "cache_hit_rate", "estimated_calls",
+             "by_model"/"by_node"/"by_context": {名称: {"calls", "tokens", "cost"}},
+             "by_day": {日期: {"calls", "tokens", "cost"}}, "top_prompts": [...]}
+        """
+        summary: Dict[str, Any] = {
+            "calls": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "cost": 0.0, "avg_latency_ms": 0.0, "cache_hit_rate": 0.0, "estimated_calls": 0,
+            "by_model": {}, "by_node": {}, "by_context": {}, "by_day": {}, "top_prompts": [],
+        }
+        latency = 0.0
+        cache_hits = 0
+        prompts: Dict[str, Dict[str, Any]] = {}
+        for entry in self.iter_entries(since):
+            summary["calls"] += 1
+            summary["failed"] += 0 if entry.success else 1
+            summary["prompt_tokens"] += entry.prompt_tokens
+            summary["completion_tokens"] += entry.completion_tokens
+            summary["cached_tokens"] += entry.cached_tokens
+            summary["cost"] += entry.cost
+            summary["estimated_calls"] += int(entry.estimated)
+            latency += entry.latency_ms
+            cache_hits += int(entry.cache_hit)
+            day = datetime.fromtimestamp(entry.ts).strftime("%Y-%m-%d")
+            for group, key in (("by_model", entry.model), ("by_node", entry.node),
+                               ("by_context", entry.context_type), ("by_day", day)):
+                bucket = summary[group].setdefault(key, {"calls": 0, "tokens": 0, "cost": 0.0})
+                bucket["calls"] += 1
+                bucket["tokens"] += entry.total_tokens
+                bucket["cost"] += entry.cost
+            if entry.prompt_hash:
+                item = prompts.setdefault(entry.prompt_hash, {
+                    "prompt_hash": entry.prompt_hash, "preview": entry.prompt_preview,
+                    "node": entry.node, "calls": 0, "tokens": 0, "cost": 0.0,
+                })
+                item["calls"] += 1
+                item["tokens"] += entry.total_tokens
+                item["cost"] += entry.cost
+        if summary["calls"]:
+            summary["avg_latency_ms"] = latency / summary["calls"]
+            summary["cache_hit_rate"] = cache_hits / summary["calls"]
+        # 费用相同（未配置单价）时按 token 数排序
+        summary["top_prompts"] = sorted(
+            prompts.values(), key=lambda p: (p["cost"], p["tokens"]), reverse=True
+        )[:TOP_PROMPTS]
+        return summary
+
+    def format_report(self, days: int = 1) -> str:
+        """
+        生成消耗报告
+
+        Args:
+            days: 统计最近几天（1 为今天，7 为最近一周）
+        """
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        s = self.summarize(start.timestamp())
+        title = "今日" if days == 1 else f"最近 {days} 天"
+        cur = TOKEN_LEDGER_CURRENCY
+        lines = [f"\n🪙 Token 消耗统计（{title}，自 {start.strftime('%Y-%m-%d')}）", "=" * 60]
+        if not s["calls"]:
+            lines.append("📭 暂无 LLM 调用记录")
+            return "\n".join(lines) + "\n"
+
+        lines += [
+            f"调用次数: {s['calls']}（失败 {s['failed']}）",
+            f"输入 Token: {s['prompt_tokens']:,}（缓存命中 {s['cached_tokens']:,}）",
+            f"输出 Token: {s['completion_tokens']:,}",
+            f"估算费用: {cur}{s['cost']:.4f}",
+            f"平均延迟: {s['avg_latency_ms']:.0f}ms    提示缓存命中率: {s['cache_hit_rate']:.1%}",
+        ]
+        if s["estimated_calls"]:
+            lines.append(f"⚠️ 其中 {s['estimated_calls']} 次调用未返回 usage，token 为估算值")
+
+        def section(title: str, group: Dict[str, Dict[str, Any]]) -> None:
+            lines.append(f"\n{title}")
+            for name, item in sorted(group.items(), key=lambda kv: (kv[1]["cost"], kv[1]["tokens"]), reverse=True):
+                lines.append(f"  • {name:<28} {item['calls']:>5} 次  {item['tokens']:>10,} tokens  {cur}{item['cost']:.4f}")
+
+        if days > 1:
+            lines.append("\n📅 按天:")
+            for day, item in sorted(s["by_day"].items()):
+                lines.append(f"  • {day}  {item['calls']:>5} 次  {item['tokens']:>10,} tokens  {cur}{item['cost']:.4f}")
+        section("🤖 按模型:", s["by_model"])
+        section("🧩 按节点:", s["by_node"])
+        section("🏷️ 按上下文类型:", s["by_context"])
+        lines.append(f"\n💸 费用最高的提示词（前 {TOP_PROMPTS}）:")
+        for item in s["top_prompts"]:
+            lines.append(f"  • [{item['node']}] {item['calls']} 次 {item['tokens']:,} tokens "
+                         f"{cur}{item['cost']:.4f}  {item['preview']}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局账本实例
+token_ledger = TokenLedger()
+
+
+def get_token_ledger() -> TokenLedger:
+    """获取全局 Token 账本"""
+    return token_ledger
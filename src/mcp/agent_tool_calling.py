@@ -15,6 +15,7 @@ from src.tools.todo_tools import todo_tools, add_todo_tool, query_todo_tool
 from src.tools.git_commit_tools import generate_commit_tool
 from src.tools.code_review_tools import code_review_tool
 from src.tools.auto_commit_tools import auto_commit_tool, git_pull_tool, git_push_tool
+from src.tools.multi_repo_tools import multi_repo_git_tool
 from src.tools.project_manager import project_manager_tools, start_project_tool, build_project_tool, diagnose_project_tool, stop_project_tool
 from src.tools.daily_report_tools import daily_report_tools, generate_daily_report_tool
 from src.tools.knowledge_project import knowledge_project_tools, knowledge_project_tool
@@ -48,13 +49,14 @@ def create_tool_agent():
 5. auto_commit - 自动Git提交（add + commit）
 6. git_pull - 拉取远程代码
 7. git_push - 推送代码到远程
+8. multi_repo_git - 多仓库批量操作（status/pull/push/commit_message）
 
 🚀 项目管理:
-8. start_project - 智能启动项目（自动检测类型、安装依赖）
-9. build_project - 智能打包项目
+9. start_project - 智能启动项目（自动检测类型、安装依赖）
+10. build_project - 智能打包项目
 
 📊 日报助手:
-10. generate_daily_report - 生成日报（汇总当天Git提交、命令、交互记录）
+11. generate_daily_report - 生成日报（汇总当天Git提交、命令、交互记录）
 
 请根据用户的输入，判断用户意图并调用合适的工具。
 
@@ -62,6 +64,7 @@ def create_tool_agent():
 - 待办事项: "今天18点给XX打电话" → add_todo, "今天有什么要做的" → query_todo
 - 项目管理: "启动项目"/"运行项目" → start_project, "打包项目"/"构建项目" → build_project
 - Git操作: "提交代码" → auto_commit, "生成commit消息" → generate_commit
+- 多仓库: "拉取所有仓库"/"所有仓库的状态" → multi_repo_git
 - 日报生成: "生成日报"/"今日总结"/"工作报告" → generate_daily_report
 - 一定要将相对日期转换为具体的 YYYY-MM-DD 格式
 - 工具调用的输入必须是合法的 JSON 字符串
@@ -196,6 +199,11 @@ def _get_all_available_tools() -> list:
             "description": "代码审查。分析代码变更并提供审查意见。",
             "params": []
         },
+        {
+            "name": "multi_repo_git",
+            "description": "多仓库Git操作。在目录下的所有Git仓库上并发执行 status/pull/push/commit_message 并汇总结果。",
+            "params": ["action", "root", "max_workers"]
+        },
         {
             "name": "start_project",
             "description": "智能启动项目。自动检测项目类型（Node.js/Python），分析启动命令，后台执行并监控输出，自动处理依赖缺失问题。",
@@ -297,6 +305,7 @@ def _infer_intent_from_tool(tool_name: str) -> str:
         "git_pull": "git_pull",
         "git_push": "git_push",
         "code_review": "code_review",
+        "multi_repo_git": "multi_repo_git",
         "data_conversion": "data_conversion",
         "environment_diagnostic": "environment_diagnostic",
         "terminal_command": "terminal_command",
@@ -337,6 +346,7 @@ def _call_langchain_tool(tool_name: str, tool_args: dict) -> str:
         "git_pull": git_pull_tool,
         "git_push": git_push_tool,
         "code_review": code_review_tool,
+        "multi_repo_git": multi_repo_git_tool,
         "start_project": start_project_tool,
         "build_project": build_project_tool,
         "diagnose_project": diagnose_project_tool,
@@ -601,7 +611,7 @@ def simple_tool_calling_node(state: dict, enable_streaming: bool = True) -> dict
         # 分类处理工具调用
         # 1. LangChain 工具（已封装的内置工具）
         if tool_name in ["add_todo", "query_todo", "generate_commit", "auto_commit",
-                         "git_pull", "git_push", "code_review", "start_project", "build_project", 
+                         "git_pull", "git_push", "code_review", "multi_repo_git", "start_project", "build_project", 
                          "diagnose_project", "stop_project", "generate_daily_report", "knowledge_project"]:
             result_text = _call_langchain_tool(tool_name, tool_args)
             return {
@@ -6,14 +6,29 @@ MCP文件系统工具模块
 """
 
 import os
+import codecs
+import fnmatch
+import heapq
+import threading
+from array import array
+from collections import Counter, OrderedDict
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.file_cache import file_read_cache
 
 
 class FileSystemTools:
     """文件系统访问工具（MCP-like实现）"""
     
+    # 行偏移索引缓存的最大文件数
+    LINE_INDEX_CACHE_SIZE = 64
+    # 构建索引/流式读取时的块大小
+    READ_CHUNK_SIZE = 64 * 1024
+    # 目录摘要中不展开的目录
+    SUMMARY_SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", ".idea", ".mypy_cache", ".pytest_cache"}
+    
     def __init__(self, allowed_dirs: List[str], max_file_size: int = 10*1024*1024, 
                  allowed_extensions: List[str] = None):
         """
@@ -29,6 +44,10 @@ class FileSystemTools:
         self.allowed_extensions = allowed_extensions or [
             ".txt", ".py", ".json", ".csv", ".md", ".log", ".sh", ".yml", ".yaml"
         ]
+        
+        # 行偏移索引缓存: 路径 -> ((mtime_ns, size), 行起始字节偏移)
+        self._line_index_cache: "OrderedDict[str, Tuple[Tuple[int, int], array]]" = OrderedDict()
+        self._line_index_lock = threading.Lock()
     
     def _is_path_allowed(self, file_path: str) -> bool:
         """检查路径是否在允许的目录内"""
@@ -61,13 +80,167 @@ class FileSystemTools:
         ext = Path(file_path).suffix.lower()
         return ext in self.allowed_extensions or ext == ""
     
-    def read_file(self, file_path: str, max_lines: Optional[int] = None) -> Dict:
+    def _get_line_index(self, file_path: str, st: os.stat_result) -> array:
+        """
+        获取文件的行偏移索引（按 (路径, mtime, size) 缓存）
+        
+        索引第 i 项为第 i 行（0 起）的起始字节偏移，末尾追加文件大小作为哨兵，
+        因此总行数为 len(index) - 1，第 i 行的字节范围为 [index[i], index[i+1])。
+        
+        Args:
+            file_path: 文件路径
+            st: 文件的 stat 结果
+        
+        Returns:
+            行起始偏移数组
+        """
+        key = os.path.abspath(file_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        
+        with self._line_index_lock:
+            cached = self._line_index_cache.get(key)
+            if cached and cached[0] == stamp:
+                self._line_index_cache.move_to_end(key)
+                return cached[1]
+        
+        index = array("Q", [0])
+        position = 0
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(self.READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                found = chunk.find(b"\n")
+                while found != -1:
+                    index.append(position + found + 1)
+                    found = chunk.find(b"\n", found + 1)
+                position += len(chunk)
+        if index[-1] != position:
+            index.append(position)
+        
+        with self._line_index_lock:
+            self._line_index_cache[key] = (stamp, index)
+            self._line_index_cache.move_to_end(key)
+            while len(self._line_index_cache) > self.LINE_INDEX_CACHE_SIZE:
+                self._line_index_cache.popitem(last=False)
+        
+        return index
+    
+    def _scan_leading_lines(self, file_path: str, limit: int) -> Tuple[int, int, bool]:
+        """
+        扫描文件开头的 limit 行
+        
+        Returns:
+            (第 limit 行结束处的字节偏移, 实际行数, 是否已读到文件末尾)
+        """
+        position = 0
+        lines = 0
+        if limit == 0:
+            return 0, 0, False
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(self.READ_CHUNK_SIZE)
+                if not chunk:
+                    # 文件末尾：最后一行没有换行符时也算一行
+                    if position and lines < limit:
+                        f.seek(position - 1)
+                        if f.read(1) != b"\n":
+                            lines += 1
+                    return position, lines, True
+                found = chunk.find(b"\n")
+                while found != -1:
+                    lines += 1
+                    if lines == limit:
+                        return position + found + 1, lines, False
+                    found = chunk.find(b"\n", found + 1)
+                position += len(chunk)
+    
+    def _resolve_byte_range(self, file_path: str, st: os.stat_result,
+                            offset: Optional[int] = None, limit: Optional[int] = None,
+                            tail: Optional[int] = None, byte_offset: Optional[int] = None,
+                            byte_limit: Optional[int] = None) -> Dict:
+        """
+        将行/字节范围参数换算为字节区间
+        
+        Returns:
+            {"start": int, "end": int, "total_lines": int|None,
+             "line_start": int|None, "line_end": int|None}
+        """
+        if byte_offset is not None or byte_limit is not None:
+            start = min(max(byte_offset or 0, 0), st.st_size)
+            end = st.st_size if byte_limit is None else min(start + max(byte_limit, 0), st.st_size)
+            return {"start": start, "end": end, "total_lines": None,
+                    "line_start": None, "line_end": None}
+        
+        if tail is None and not offset and limit is not None:
+            # 只读开头 N 行：顺序扫描到第 N 个换行即停止，不为整个文件建索引
+            end, lines, eof = self._scan_leading_lines(file_path, max(limit, 0))
+            return {"start": 0, "end": end, "total_lines": lines if eof else None,
+                    "line_start": 0, "line_end": lines}
+        
+        index = self._get_line_index(file_path, st)
+        total_lines = len(index) - 1
+        if tail is not None:
+            line_start = max(total_lines - max(tail, 0), 0)
+            line_end = total_lines
+        else:
+            line_start = min(max(offset or 0, 0), total_lines)
+            line_end = total_lines if limit is None else min(line_start + max(limit, 0), total_lines)
+        return {"start": index[line_start], "end": index[line_end], "total_lines": total_lines,
+                "line_start": line_start, "line_end": line_end}
+    
+    @staticmethod
+    def _decode_chunks(chunks: Iterator[bytes], align_start: bool = False) -> Iterator[str]:
+        """
+        增量解码 UTF-8 字节块（块边界处被截断的多字节字符会被正确拼接）
+        
+        Args:
+            chunks: 字节块迭代器
+            align_start: 是否丢弃开头不完整的多字节字符（任意字节偏移读取时使用）
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        first = True
+        for chunk in chunks:
+            if first and align_start:
+                skip = 0
+                while skip < min(len(chunk), 3) and (chunk[skip] & 0xC0) == 0x80:
+                    skip += 1
+                chunk = chunk[skip:]
+            first = False
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    
+    def _iter_byte_range(self, file_path: str, start: int, end: int) -> Iterator[bytes]:
+        """按块读取文件的 [start, end) 字节区间"""
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(self.READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    def read_file(self, file_path: str, max_lines: Optional[int] = None,
+                  offset: Optional[int] = None, limit: Optional[int] = None,
+                  tail: Optional[int] = None, byte_offset: Optional[int] = None,
+                  byte_limit: Optional[int] = None) -> Dict:
         """
-        读取文件内容
+        读取文件内容（支持行范围/字节范围读取）
+        
+        范围读取只读取所需的字节，不受 max_file_size 对整文件的限制，
+        但单次返回的内容仍不超过 max_file_size。
         
         Args:
             file_path: 文件路径
-            max_lines: 最大读取行数（None表示全部读取）
+            max_lines: 最大读取行数（None表示全部读取，等价于 offset=0, limit=max_lines）
+            offset: 起始行号（0 起）
+            limit: 读取行数
+            tail: 读取末尾 N 行（优先于 offset/limit）
+            byte_offset: 起始字节偏移（指定字节范围时忽略行参数）
+            byte_limit: 读取字节数
         
         Returns:
             {
@@ -75,6 +248,8 @@ class FileSystemTools:
                 "content": str,
                 "size": int,
                 "lines": int,
+                "total_lines": int (range reads；只读开头 N 行且未读到末尾时不返回),
+                "truncated": bool (range reads),
                 "error": str (if failed)
             }
         """
@@ -91,35 +266,50 @@ class FileSystemTools:
                     "error": f"📂 文件不存在: {file_path}"
                 }
             
-            if not self._check_file_size(file_path):
+            if max_lines and limit is None and offset is None and tail is None:
+                limit = max_lines
+            ranged = any(v is not None for v in (offset, limit, tail, byte_offset, byte_limit))
+            
+            if not ranged:
+                if not self._check_file_size(file_path):
+                    return {
+                        "success": False,
+                        "error": f"📦 文件太大（超过{self.max_file_size // 1024 // 1024}MB）"
+                    }
+                
+                content = file_read_cache.read_text(file_path)
+                
                 return {
-                    "success": False,
-                    "error": f"📦 文件太大（超过{self.max_file_size // 1024 // 1024}MB）"
+                    "success": True,
+                    "content": content,
+                    "size": len(content),
+                    "lines": content.count('\n') + 1,
+                    "path": file_path
                 }
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if max_lines:
-                    lines = []
-                    for i, line in enumerate(f):
-                        if i >= max_lines:
-                            break
-                        lines.append(line)
-                    content = ''.join(lines)
-                    truncated = True
-                else:
-                    content = f.read()
-                    truncated = False
+            st = os.stat(file_path)
+            span = self._resolve_byte_range(file_path, st, offset, limit, tail, byte_offset, byte_limit)
+            start = span["start"]
+            end = min(span["end"], start + self.max_file_size)
+            content = "".join(self._decode_chunks(
+                self._iter_byte_range(file_path, start, end),
+                align_start=byte_offset is not None
+            ))
             
             result = {
                 "success": True,
                 "content": content,
                 "size": len(content),
-                "lines": content.count('\n') + 1,
-                "path": file_path
+                "lines": content.count('\n') + (0 if not content or content.endswith('\n') else 1),
+                "path": file_path,
+                "byte_range": [start, end],
+                "truncated": start > 0 or end < st.st_size
             }
-            
-            if truncated:
-                result["truncated"] = True
+            if span["total_lines"] is not None:
+                result["total_lines"] = span["total_lines"]
+            if span["line_start"] is not None:
+                result["line_range"] = [span["line_start"], span["line_end"]]
+            if max_lines:
                 result["max_lines"] = max_lines
             
             return result
@@ -135,6 +325,41 @@ class FileSystemTools:
                 "error": f"❌ 读取失败: {str(e)}"
             }
     
+    def stream_file(self, file_path: str, offset: Optional[int] = None,
+                    limit: Optional[int] = None, tail: Optional[int] = None) -> Iterator[str]:
+        """
+        流式读取文件内容（生成器），供只需把内容逐块送入提示词构建的调用方使用
+        
+        不受 max_file_size 限制，内存占用为单个块大小。
+        
+        Args:
+            file_path: 文件路径
+            offset: 起始行号（0 起）
+            limit: 读取行数
+            tail: 读取末尾 N 行
+        
+        Yields:
+            解码后的文本块
+        
+        Raises:
+            PermissionError: 路径不在允许的目录内
+            FileNotFoundError: 文件不存在
+            UnicodeDecodeError: 文件不是有效的 UTF-8 文本
+        """
+        if not self._is_path_allowed(file_path):
+            raise PermissionError(f"⛔ 拒绝访问: 路径不在允许的目录内: {file_path}")
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"📂 文件不存在: {file_path}")
+        
+        st = os.stat(file_path)
+        if offset is None and limit is None and tail is None:
+            start, end = 0, st.st_size
+        else:
+            span = self._resolve_byte_range(file_path, st, offset, limit, tail)
+            start, end = span["start"], span["end"]
+        
+        yield from self._decode_chunks(self._iter_byte_range(file_path, start, end))
+    
     def write_file(self, file_path: str, content: str, mode: str = "w") -> Dict:
         """
         写入文件
@@ -173,6 +398,7 @@ class FileSystemTools:
             
             with open(file_path, mode, encoding='utf-8') as f:
                 f.write(content)
+            file_read_cache.invalidate(file_path)
             
             return {
                 "success": True,
@@ -188,14 +414,114 @@ class FileSystemTools:
                 "error": f"❌ 写入失败: {str(e)}"
             }
     
-    def list_directory(self, dir_path: str, pattern: str = "*", recursive: bool = False) -> Dict:
+    # list_directory 支持的排序键（作用于 (name, path, size, mtime, ext) 元组）
+    _SORT_KEYS = {
+        "name": lambda e: e[0],
+        "size": lambda e: e[2],
+        "modified": lambda e: e[3],
+        "extension": lambda e: (e[4], e[0]),
+    }
+    
+    @staticmethod
+    def _glob_match(parts: Tuple[str, ...], pats: Tuple[str, ...]) -> bool:
+        """按 Path.glob 语义逐段匹配相对路径（"**" 匹配零个或多个目录）"""
+        if not pats:
+            return not parts
+        if pats[0] == "**":
+            return any(FileSystemTools._glob_match(parts[i:], pats[1:]) for i in range(len(parts) + 1))
+        return bool(parts) and fnmatch.fnmatch(parts[0], pats[0]) and \
+            FileSystemTools._glob_match(parts[1:], pats[1:])
+    
+    @staticmethod
+    def _glob_prefix(parts: Tuple[str, ...], pats: Tuple[str, ...]) -> bool:
+        """目录的相对路径是否可能是匹配结果的前缀（决定是否进入该目录）"""
+        for i, part in enumerate(parts):
+            if i >= len(pats):
+                return False
+            if pats[i] == "**":
+                return True
+            if not fnmatch.fnmatch(part, pats[i]):
+                return False
+        return True
+    
+    def _scan_entries(self, root: str, pattern: str, recursive: bool) -> Iterator[Tuple[bool, tuple]]:
+        """
+        基于 os.scandir 遍历目录，每个文件只 stat 一次
+        
+        匹配语义与 Path.glob / Path.rglob 一致：pattern 按 "/" 分段逐段匹配，
+        "**" 匹配零个或多个目录，recursive 等价于在 pattern 前加 "**/"；
+        只进入可能产生匹配的子目录。
+        根目录已通过权限检查，其下的普通条目无需再逐个 resolve；
+        只有符号链接需要单独检查目标是否仍在允许范围内，且不跟随目录链接。
+        
+        Yields:
+            (is_dir, (name, path, size, mtime, extension))
+        """
+        pats = tuple(p for p in pattern.replace("\\", "/").split("/") if p not in ("", "."))
+        if recursive:
+            pats = ("**",) + pats
+        if not pats:
+            return
+        stack: List[Tuple[str, Tuple[str, ...]]] = [(root, ())]
+        while stack:
+            current, base = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            is_link = entry.is_symlink()
+                            if is_link and not self._is_path_allowed(entry.path):
+                                continue
+                            is_dir = entry.is_dir()
+                            parts = base + (entry.name,)
+                            if is_dir and not is_link and self._glob_prefix(parts, pats):
+                                stack.append((entry.path, parts))
+                            
+                            if not self._glob_match(parts, pats):
+                                continue
+                            
+                            if is_dir:
+                                yield True, (entry.name, entry.path, 0, 0.0, "")
+                            elif entry.is_file():
+                                st = entry.stat()
+                                yield False, (entry.name, entry.path, st.st_size, st.st_mtime,
+                                              os.path.splitext(entry.name)[1])
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+    
+    def _select_page(self, entries: Iterator[tuple], key, reverse: bool,
+                     offset: int, limit: Optional[int]) -> List[tuple]:
+        """
+        排序并截取分页；指定 limit 时用堆只保留 offset+limit 个元素，内存有界
+        
+        Returns:
+            分页后的条目
+        """
+        if limit is None:
+            ordered = sorted(entries, key=key, reverse=reverse)
+        else:
+            pick = heapq.nlargest if reverse else heapq.nsmallest
+            ordered = pick(offset + limit, entries, key=key)
+        
+        end = None if limit is None else offset + limit
+        return ordered[offset:end]
+    
+    def list_directory(self, dir_path: str, pattern: str = "*", recursive: bool = False,
+                       offset: int = 0, limit: Optional[int] = None,
+                       sort_by: str = "name", reverse: bool = False) -> Dict:
         """
         列出目录内容
         
         Args:
             dir_path: 目录路径
-            pattern: 文件匹配模式 (*, *.py等)
+            pattern: 文件匹配模式 (*, *.py, sub/*.py, **/*.py 等，语义同 Path.glob)
             recursive: 是否递归列出子目录
+            offset: 分页起始位置（目录在前、文件在后的同一序列上分页）
+            limit: 每页数量（None表示全部）
+            sort_by: 排序键 (name, size, modified, extension)；目录始终按名称排序
+            reverse: 是否倒序
         
         Returns:
             {
@@ -205,6 +531,8 @@ class FileSystemTools:
                 "directories": List[Dict],
                 "total_files": int,
                 "total_dirs": int,
+                "total": int,
+                "has_more": bool,
                 "error": str (if failed)
             }
         """
@@ -227,43 +555,53 @@ class FileSystemTools:
                     "error": f"⚠️  不是目录: {dir_path}"
                 }
             
-            path = Path(dir_path)
-            files = []
-            dirs = []
+            offset = max(offset or 0, 0)
+            file_key = self._SORT_KEYS.get(sort_by, self._SORT_KEYS["name"])
+            name_key = self._SORT_KEYS["name"]
+            totals = [0, 0]  # [文件数, 目录数]
             
-            # 选择glob或rglob
-            glob_method = path.rglob if recursive else path.glob
+            def entry_stream():
+                for is_dir, entry in self._scan_entries(dir_path, pattern, recursive):
+                    totals[is_dir] += 1
+                    yield is_dir, entry
             
-            for item in glob_method(pattern):
-                if not self._is_path_allowed(str(item)):
-                    continue
-                    
-                if item.is_file():
-                    files.append({
-                        "name": item.name,
-                        "path": str(item),
-                        "size": item.stat().st_size,
-                        "size_human": self._human_readable_size(item.stat().st_size),
-                        "modified": datetime.fromtimestamp(item.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-                        "extension": item.suffix
-                    })
-                elif item.is_dir():
-                    dirs.append({
-                        "name": item.name,
-                        "path": str(item)
-                    })
+            def key(item):
+                # 目录排在前面（倒序时同样在前），目录没有大小/时间信息，按名称排序
+                is_dir, entry = item
+                group = is_dir if reverse else not is_dir
+                return group, (name_key(entry) if is_dir else file_key(entry))
+            
+            page = self._select_page(entry_stream(), key, reverse, offset, limit)
+            file_page = [entry for is_dir, entry in page if not is_dir]
+            dir_page = [entry for is_dir, entry in page if is_dir]
+            total_files, total_dirs = totals
+            total = total_files + total_dirs
             
-            # 排序
-            files.sort(key=lambda x: x['name'])
-            dirs.sort(key=lambda x: x['name'])
+            files = [
+                {
+                    "name": name,
+                    "path": path,
+                    "size": size,
+                    "size_human": self._human_readable_size(size),
+                    "modified": datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                    "extension": ext
+                }
+                for name, path, size, mtime, ext in file_page
+            ]
+            dirs = [{"name": name, "path": path} for name, path, _, _, _ in dir_page]
             
             return {
                 "success": True,
                 "path": dir_path,
                 "files": files,
                 "directories": dirs,
-                "total_files": len(files),
-                "total_dirs": len(dirs),
+                "total_files": total_files,
+                "total_dirs": total_dirs,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "has_more": limit is not None and offset + limit < total,
+                "sort_by": sort_by,
                 "pattern": pattern,
                 "recursive": recursive
             }
@@ -408,6 +746,157 @@ class FileSystemTools:
                 "error": f"❌ 获取信息失败: {str(e)}"
             }
     
+    def _scan_summary_node(self, path: str, name: str, depth: int, max_depth: int,
+                           budget: List[int]) -> Dict:
+        """
+        递归扫描目录并聚合统计（summarize_directory 的单次遍历）
+        
+        每个目录返回子树的文件数、总大小和扩展名分布；只有需要展示的层级
+        （depth < max_depth）才保留文件名和子目录节点，更深层只累加统计。
+        budget[0] 为剩余可扫描条目数，耗尽后停止扫描。
+        """
+        node = {
+            "name": name, "files": [], "dirs": [], "skipped": [],
+            "file_count": 0, "dir_count": 0, "size": 0, "types": Counter(),
+            "truncated": False,
+        }
+        keep = depth < max_depth
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if budget[0] <= 0:
+                        node["truncated"] = True
+                        break
+                    budget[0] -= 1
+                    try:
+                        if entry.is_symlink():
+                            continue
+                        if entry.is_dir():
+                            if entry.name in self.SUMMARY_SKIP_DIRS:
+                                if keep:
+                                    node["skipped"].append(entry.name)
+                                continue
+                            child = self._scan_summary_node(entry.path, entry.name, depth + 1,
+                                                            max_depth, budget)
+                            node["file_count"] += child["file_count"]
+                            node["dir_count"] += child["dir_count"] + 1
+                            node["size"] += child["size"]
+                            node["types"].update(child["types"])
+                            node["truncated"] = node["truncated"] or child["truncated"]
+                            if keep:
+                                node["dirs"].append(child)
+                        elif entry.is_file():
+                            size = entry.stat().st_size
+                            node["file_count"] += 1
+                            node["size"] += size
+                            node["types"][os.path.splitext(entry.name)[1].lower() or "(无扩展名)"] += 1
+                            if keep:
+                                node["files"].append((entry.name, size))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return node
+    
+    def _render_summary_node(self, node: Dict, prefix: str, lines: List[str],
+                             max_children: int, top_types: int) -> None:
+        """以树形渲染目录摘要节点的子项"""
+        dirs = sorted(node["dirs"], key=lambda d: (-d["file_count"], d["name"]))
+        files = sorted(node["files"], key=lambda f: (-f[1], f[0]))
+        items = [("dir", d) for d in dirs[:max_children]] + [("file", f) for f in files[:max_children]]
+        hidden_dirs = max(len(dirs) - max_children, 0)
+        hidden_files = max(len(files) - max_children, 0)
+        notes = []
+        if hidden_dirs:
+            notes.append(f"… 还有 {hidden_dirs} 个子目录")
+        if hidden_files:
+            notes.append(f"… 还有 {hidden_files} 个文件")
+        if node["skipped"]:
+            notes.append(f"已跳过: {', '.join(sorted(node['skipped']))}")
+        
+        total = len(items) + len(notes)
+        for i, (kind, item) in enumerate(items):
+            last = i == total - 1
+            branch = "└── " if last else "├── "
+            if kind == "dir":
+                lines.append(f"{prefix}{branch}{self._format_summary_dir(item, top_types)}")
+                self._render_summary_node(item, prefix + ("    " if last else "│   "), lines,
+                                          max_children, top_types)
+            else:
+                lines.append(f"{prefix}{branch}{item[0]} ({self._human_readable_size(item[1])})")
+        for i, note in enumerate(notes):
+            branch = "└── " if len(items) + i == total - 1 else "├── "
+            lines.append(f"{prefix}{branch}{note}")
+    
+    def _format_summary_dir(self, node: Dict, top_types: int) -> str:
+        """格式化目录摘要行: 名称/ (文件数, 大小; 主要类型)"""
+        types = ", ".join(f"{ext} {count}" for ext, count in node["types"].most_common(top_types))
+        text = f"{node['name']}/ ({node['file_count']} 文件, {self._human_readable_size(node['size'])}"
+        return text + (f"; {types})" if types else ")")
+    
+    def summarize_directory(self, dir_path: str, max_depth: int = 2, max_children: int = 8,
+                            top_types: int = 3, max_entries: int = 50000) -> Dict:
+        """
+        生成目录摘要：有界、限深的树形视图，附带每个目录的文件数、总大小和主要文件类型
+        
+        单次遍历完成统计；展示层级之下的内容只计入统计，不展开。
+        
+        Args:
+            dir_path: 目录路径
+            max_depth: 展开的目录层数
+            max_children: 每个目录最多展示的子目录数和文件数
+            top_types: 每个目录展示的主要扩展名数量
+            max_entries: 最多扫描的条目数（超出时摘要标记为不完整）
+        
+        Returns:
+            {
+                "success": bool,
+                "path": str,
+                "summary": str,
+                "total_files": int,
+                "total_dirs": int,
+                "total_size": int,
+                "truncated": bool,
+                "error": str (if failed)
+            }
+        """
+        try:
+            if not self._is_path_allowed(dir_path):
+                return {
+                    "success": False,
+                    "error": f"⛔ 拒绝访问: 路径不在允许的目录内"
+                }
+            
+            if not os.path.isdir(dir_path):
+                return {
+                    "success": False,
+                    "error": f"📂 目录不存在: {dir_path}"
+                }
+            
+            name = os.path.basename(os.path.normpath(dir_path)) or dir_path
+            root = self._scan_summary_node(dir_path, name, 0, max_depth, [max_entries])
+            
+            lines = [f"📁 {self._format_summary_dir(root, top_types)}"]
+            self._render_summary_node(root, "", lines, max_children, top_types)
+            if root["truncated"]:
+                lines.append(f"⚠️ 条目过多，仅统计了前 {max_entries} 项")
+            
+            return {
+                "success": True,
+                "path": dir_path,
+                "summary": "\n".join(lines),
+                "total_files": root["file_count"],
+                "total_dirs": root["dir_count"],
+                "total_size": root["size"],
+                "truncated": root["truncated"]
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"❌ 目录摘要失败: {str(e)}"
+            }
+    
     def _human_readable_size(self, size: int) -> str:
         """转换文件大小为人类可读格式"""
         for unit in ['B', 'KB', 'MB', 'GB']:
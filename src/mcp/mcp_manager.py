@@ -17,6 +17,7 @@ from src.core.logger import get_logger
 
 _log = get_logger("mcp")
 from src.core.agent_metrics import get_metrics_collector
+from src.core.agent_resilience import RetryPolicy, get_retry_budget
 from src.core.logger import log_json_event, get_logger
 
 
@@ -26,11 +27,18 @@ class MCPManager:
     # 缓存有效期（小时）
     CACHE_TTL_HOURS = 24
 
+    # MCP 调用在进程启动失败时的重试策略（每次重试还需通过进程级重试预算）
+    CALL_RETRY_POLICY = RetryPolicy(max_attempts=1, base_delay=0.5, max_delay=5.0)
+
     def __init__(self, config_path: Optional[str] = "mcp_config.json"):
         self.servers = {}
         self.tool_registry = {}  # 统一的工具注册表（核心数据结构）
         self.config = {}
         self._discovery_lock = threading.Lock()
+
+        # 各 MCP 服务器的调用状态（供 /perf 展示）
+        self._server_stats: Dict[str, Dict[str, Any]] = {}
+        self._server_stats_lock = threading.Lock()
         
         # 集成性能监控
         self.metrics = get_metrics_collector()
@@ -224,7 +232,12 @@ class MCPManager:
                 "type": "object",
                 "properties": {
                     "file_path": {"type": "string", "description": "文件路径"},
-                    "max_lines": {"type": "integer", "description": "最大读取行数"}
+                    "max_lines": {"type": "integer", "description": "最大读取行数"},
+                    "offset": {"type": "integer", "description": "起始行号（0起）"},
+                    "limit": {"type": "integer", "description": "读取行数"},
+                    "tail": {"type": "integer", "description": "读取末尾N行"},
+                    "byte_offset": {"type": "integer", "description": "起始字节偏移"},
+                    "byte_limit": {"type": "integer", "description": "读取字节数"}
                 },
                 "required": ["file_path"]
             }
@@ -254,7 +267,26 @@ class MCPManager:
                 "properties": {
                     "dir_path": {"type": "string", "description": "目录路径"},
                     "pattern": {"type": "string", "description": "文件匹配模式"},
-                    "recursive": {"type": "boolean", "description": "是否递归"}
+                    "recursive": {"type": "boolean", "description": "是否递归"},
+                    "offset": {"type": "integer", "description": "分页起始位置"},
+                    "limit": {"type": "integer", "description": "每页数量"},
+                    "sort_by": {"type": "string", "description": "排序键(name/size/modified/extension)"},
+                    "reverse": {"type": "boolean", "description": "是否倒序"}
+                },
+                "required": ["dir_path"]
+            }
+        }
+
+        self.tool_registry["fs_summary"] = {
+            "type": "builtin",
+            "func": fs_tools.summarize_directory,
+            "description": "生成目录摘要（限深树形视图，含文件数、大小和主要文件类型）",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "dir_path": {"type": "string", "description": "目录路径"},
+                    "max_depth": {"type": "integer", "description": "展开的目录层数"},
+                    "max_children": {"type": "integer", "description": "每个目录最多展示的条目数"}
                 },
                 "required": ["dir_path"]
             }
@@ -355,6 +387,20 @@ class MCPManager:
             "parameters": {"type": "object", "properties": {}, "required": []}
         }
 
+        self.tool_registry["multi_repo_git"] = {
+            "type": "langchain",
+            "description": "在目录下的多个Git仓库上并发执行操作。适用场景：'查看所有仓库状态'、'拉取所有仓库'、'推送所有仓库'",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "description": "操作：status、pull、push、commit_message"},
+                    "root": {"type": "string", "description": "搜索仓库的根目录（默认当前目录）"},
+                    "max_workers": {"type": "integer", "description": "最大并发数（默认4）"}
+                },
+                "required": ["action"]
+            }
+        }
+
     def _load_tools_from_cache(self) -> bool:
         """
         从缓存加载MCP工具列表（立即返回，无阻塞）
@@ -609,21 +655,7 @@ class MCPManager:
 
             print(f"[MCP调用] 服务器: {server_name}, 工具: {tool_name}")
 
-            # 使用 Popen 进行交互式通信
-            process = subprocess.Popen(
-                command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-            )
-
-            # 发送请求并获取响应
-            stdout, stderr = process.communicate(
-                input=json.dumps(request) + "\n", timeout=30
-            )
+            stdout, stderr, returncode = self._run_mcp_process(command, request, server_name)
 
             # 创建一个类似 subprocess.run 结果的对象
             class Result:
@@ -632,7 +664,7 @@ class MCPManager:
                     self.stdout = stdout
                     self.stderr = stderr
 
-            result = Result(process.returncode, stdout, stderr)
+            result = Result(returncode, stdout, stderr)
 
             if result.returncode == 0:
                 try:
@@ -704,6 +736,50 @@ class MCPManager:
         except Exception as e:
             return {"success": False, "error": f"❌ 调用失败: {str(e)}"}
 
+    def _run_mcp_process(self, command: List[str], request: Dict, server_name: str):
+        """
+        启动 MCP 服务器进程发送请求，返回 (stdout, stderr, returncode)
+
+        仅在进程启动失败（命令不存在除外）时按 CALL_RETRY_POLICY 重试，
+        每次重试需通过进程级重试预算；预算耗尽或重试用尽时抛出最后一次的异常。
+        超时不重试：请求可能已送达服务器并产生副作用，终止进程后直接抛出。
+        """
+        budget = get_retry_budget()
+        budget.record_request("mcp_call")
+        delay = 0.0
+        attempt = 0
+        while True:
+            try:
+                # 使用 Popen 进行交互式通信
+                process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                )
+                break
+            except FileNotFoundError:
+                raise
+            except OSError as e:
+                if attempt >= self.CALL_RETRY_POLICY.max_attempts or not budget.try_acquire("mcp_call"):
+                    raise
+                attempt += 1
+                delay = self.CALL_RETRY_POLICY.next_delay(delay)
+                print(f"[MCP调用] 🔄 {server_name} 启动失败（{type(e).__name__}），{delay:.1f}s 后重试")
+                time.sleep(delay)
+
+        try:
+            # 发送请求并获取响应
+            stdout, stderr = process.communicate(input=json.dumps(request) + "\n", timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return stdout, stderr, process.returncode
+
     def call_tool(self, tool_name: str, **kwargs) -> Dict:
         """
         统一的工具调用接口 - 零分支自动分发（集成性能监控）
@@ -761,11 +837,13 @@ class MCPManager:
                         "server": tool["server"]
                     }
                     
+                    started = time.perf_counter()
                     result = self.call_mcp_server(
                         server_name=tool["server"],
                         tool_name=tool["method"],
                         params=kwargs
                     )
+                    self._record_server_call(tool["server"], result, (time.perf_counter() - started) * 1000)
                     try:
                         log_json_event(get_logger("mcp"), "tool_call", {
                             "tool": tool_name,
@@ -791,6 +869,46 @@ class MCPManager:
                     pass
                 return {"success": False, "error": f"工具执行失败: {str(e)}"}
 
+    def _record_server_call(self, server_name: str, result: Any, duration_ms: float):
+        """记录一次 MCP 服务器调用结果"""
+        success = bool(result.get("success", False)) if isinstance(result, dict) else True
+        with self._server_stats_lock:
+            stats = self._server_stats.setdefault(server_name, {"calls": 0, "failures": 0})
+            stats["calls"] += 1
+            stats["last_status"] = "ok" if success else "error"
+            stats["last_latency_ms"] = round(duration_ms, 1)
+            stats["last_call"] = datetime.now().isoformat(timespec="seconds")
+            if not success:
+                stats["failures"] += 1
+                stats["last_error"] = str(result.get("error", ""))[:200]
+
+    def get_server_states(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各 MCP 服务器的状态
+
+        Returns:
+            {服务器名: {"tools", "discovering", "calls", "failures", "last_status",
+                        "last_latency_ms", "last_call", "last_error"}}，未调用过的 last_status 为 "idle"
+        """
+        tools: Dict[str, int] = {}
+        for tool in list(self.tool_registry.values()):
+            if tool.get("type") == "mcp":
+                tools[tool.get("server")] = tools.get(tool.get("server"), 0) + 1
+
+        discovering = self._discovery_lock.locked()
+        with self._server_stats_lock:
+            stats = {name: dict(values) for name, values in self._server_stats.items()}
+
+        states = {}
+        for name in self.servers:
+            state = {"calls": 0, "failures": 0, "last_status": "idle",
+                     "last_latency_ms": None, "last_call": None, "last_error": None}
+            state.update(stats.get(name, {}))
+            state["tools"] = tools.get(name, 0)
+            state["discovering"] = discovering
+            states[name] = state
+        return states
+
     def list_available_tools(self) -> List[Dict]:
         """动态生成工具列表 - 零硬编码"""
         return [
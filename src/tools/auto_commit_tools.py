@@ -9,6 +9,8 @@ import subprocess
 from typing import Dict, Optional
 from langchain_core.tools import Tool
 from src.tools.git_tools import git_tools
+from src.tools.git_snapshot import group_changes
+from src.tools.diff_compactor import COMMIT_DIFF_TOKEN_BUDGET, compact_diff
 from src.tools.git_commit_tools import generate_commit_message_tool_func
 from src.core.agent_utils import execute_terminal_command
 
@@ -55,6 +57,7 @@ def git_add_all() -> Dict:
             timeout=10,
         )
         
+        git_tools.invalidate_snapshot()
         if result.returncode == 0:
             # 获取暂存后的状态
             staged_diff = git_tools.get_git_diff(staged=True)
@@ -122,6 +125,7 @@ def git_commit_with_message(message: str) -> Dict:
             timeout=10,
         )
         
+        git_tools.invalidate_snapshot()
         if result.returncode == 0:
             # 提取 commit hash
             commit_hash = ""
@@ -202,13 +206,10 @@ def auto_commit_tool_func(user_request: str = "") -> str:
     # 第二步：生成 commit 消息
     print(f"\n💡 步骤 2/3: 生成 commit 消息")
     
-    # 获取当前分支信息
-    branch_info = git_tools.get_current_branch()
-    current_branch = branch_info.get("branch", "unknown") if branch_info.get("success") else "unknown"
-    print(f"[Git Commit] 当前分支: {current_branch}")
-    
-    # 分析变更并生成消息
+    # 分析变更并生成消息（分支信息来自同一份仓库快照）
     analysis = git_tools.analyze_changes()
+    current_branch = analysis.get("branch") or "unknown"
+    print(f"[Git Commit] 当前分支: {current_branch}")
     
     if not analysis["success"]:
         return f"""❌ Git 提交流程失败
@@ -229,23 +230,11 @@ def auto_commit_tool_func(user_request: str = "") -> str:
 
 请检查后重试。"""
     
-    # 获取文件状态
-    status_lines = analysis['status'].split('\n')
-    
-    # 分类统计文件变更
-    deleted_files = []
-    modified_files = []
-    added_files = []
-    
-    for line in status_lines:
-        if not line.strip():
-            continue
-        if line.startswith(' D') or line.startswith('D '):
-            deleted_files.append(line[3:])
-        elif line.startswith(' M') or line.startswith('M '):
-            modified_files.append(line[3:])
-        elif line.startswith('??') or line.startswith('A '):
-            added_files.append(line[3:])
+    # 按结构化变更记录分类（来自 porcelain v2 状态 + numstat）
+    groups = group_changes(analysis['changes'])
+    deleted_files = [c.label for c in groups['deleted']]
+    modified_files = [c.label for c in groups['modified']]
+    added_files = [c.label for c in groups['added']]
     
     file_stats = []
     if deleted_files:
@@ -264,10 +253,8 @@ def auto_commit_tool_func(user_request: str = "") -> str:
     from src.core.agent_llm import llm_code
     from langchain_core.messages import HumanMessage
     
-    # 扩大 diff 长度限制，让 LLM 能看到更多细节
-    max_diff_length = 8000
-    if len(diff_content) > max_diff_length:
-        diff_content = diff_content[:max_diff_length] + "\n\n... (diff太长，已截断)"
+    # 在 token 预算内压缩 diff：折叠上下文，锁文件/生成代码/大文件只保留统计
+    diff_content = compact_diff(diff_content, COMMIT_DIFF_TOKEN_BUDGET, analysis['changes'])
     
     # 生成 commit 消息 - 使用详细版prompt（与git_commit_tools.py保持一致）
     prompt = f"""你是一个专业的Git commit消息生成器。你的任务是仔细阅读代码变更的diff，生成非常详细、精确的commit消息。
@@ -1,14 +1,48 @@
 """
 Code Review 工具 - LangChain Tool 封装
 基于 git diff 进行代码审查，发现潜在问题并按严重性分级
+
+采用 map-reduce 方式：diff 按文件/hunk 切分为带 token 预算的片段，
+各片段并发审查（返回结构化问题列表），最后合并为按严重性排序的报告。
+每个 hunk 的结果持久化到增量缓存，未变化的 hunk 不会重复审查。
 """
 
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
 from langchain_core.tools import Tool
 from src.tools.git_tools import git_tools
+from src.tools.diff_chunks import DiffChunk, FileDiff, chunk_files, parse_diff
+from src.tools.review_cache import hunk_cache_key, review_cache
 from src.core.agent_llm import llm_code
 from src.core.agent_config import LLM_CONFIG2
 from langchain_core.messages import HumanMessage
-from typing import Dict, List
+
+
+# 每个审查片段的 diff token 上限
+REVIEW_CHUNK_TOKENS = 3000
+# 并发审查的最大片段数
+REVIEW_MAX_WORKERS = 4
+# 单次审查的最大片段数（超出部分在报告中列为未审查）
+REVIEW_MAX_CHUNKS = 40
+# 审查 prompt 版本（修改 prompt 或结果格式时递增，使旧缓存失效）
+REVIEW_PROMPT_VERSION = "1"
+
+# 严重性：(键, 图标, 名称)，按严重程度排序
+SEVERITY_LEVELS = [
+    ("critical", "🔴", "严重问题 (Critical)"),
+    ("medium", "🟡", "中级问题 (Medium)"),
+    ("minor", "🟢", "普通问题 (Minor)"),
+]
+_SEVERITY_ALIASES = {
+    "critical": "critical", "严重": "critical", "high": "critical",
+    "medium": "medium", "中级": "medium", "major": "medium",
+    "minor": "minor", "普通": "minor", "low": "minor",
+}
+
+_SEPARATOR = "━" * 40
 
 
 def analyze_code_changes() -> Dict:
@@ -18,53 +52,272 @@ def analyze_code_changes() -> Dict:
     Returns:
         {
             "success": bool,
-            "diff_content": str,
+            "staged_diff": str,
+            "unstaged_diff": str,
             "files_changed": list,
+            "skipped_files": list,   # 二进制/第三方代码，不送审
             "summary": str,
             "error": str
         }
     """
-    # 获取 unstaged 和 staged 的 diff
-    unstaged_diff = git_tools.get_git_diff(staged=False)
-    staged_diff = git_tools.get_git_diff(staged=True)
-    
-    # 合并 diff 内容
-    diff_parts = []
-    all_files = []
-    
-    if staged_diff.get("has_diff"):
-        diff_parts.append(f"=== 已暂存的变更 (Staged Changes) ===\n{staged_diff['diff']}")
-        all_files.extend(staged_diff.get("files_changed", []))
-    
-    if unstaged_diff.get("has_diff"):
-        diff_parts.append(f"=== 未暂存的变更 (Unstaged Changes) ===\n{unstaged_diff['diff']}")
-        all_files.extend(unstaged_diff.get("files_changed", []))
-    
-    if not diff_parts:
+    snapshot = git_tools.get_snapshot()
+    if not snapshot.is_repo:
+        return {"success": False, "error": f"❌ {snapshot.error}"}
+
+    if not snapshot.staged_diff and not snapshot.unstaged_diff:
         return {
             "success": False,
             "error": "⚠️ 没有代码变更，无需进行 code review"
         }
-    
-    # 去重文件列表
-    all_files = list(set(all_files))
-    
-    diff_content = "\n\n".join(diff_parts)
-    
+
+    staged_files = snapshot.staged_files if snapshot.staged_diff else []
+    unstaged_files = snapshot.unstaged_files if snapshot.unstaged_diff else []
+    all_files = list(dict.fromkeys(staged_files + unstaged_files))
+    skipped = [c for c in snapshot.changes if c.binary or c.vendored]
+
     summary = f"共 {len(all_files)} 个文件有变更"
-    if staged_diff.get("has_diff"):
-        summary += f"（已暂存：{len(staged_diff.get('files_changed', []))} 个）"
-    if unstaged_diff.get("has_diff"):
-        summary += f"（未暂存：{len(unstaged_diff.get('files_changed', []))} 个）"
-    
+    if staged_files:
+        summary += f"（已暂存：{len(staged_files)} 个）"
+    if unstaged_files:
+        summary += f"（未暂存：{len(unstaged_files)} 个）"
+
     return {
         "success": True,
-        "diff_content": diff_content,
+        "staged_diff": snapshot.staged_diff,
+        "unstaged_diff": snapshot.unstaged_diff,
         "files_changed": all_files,
+        "skipped_files": [c.path for c in skipped],
         "summary": summary
     }
 
 
+def build_review_chunks(analysis: Dict, token_budget: int = REVIEW_CHUNK_TOKENS,
+                        use_cache: bool = True) -> Tuple[List[DiffChunk], List[Dict], int]:
+    """
+    将已暂存与未暂存的 diff 切分为审查片段，已缓存的 hunk 直接复用结果
+
+    Returns:
+        (待审查片段, 命中缓存的审查结果, 命中缓存的 hunk 数)
+    """
+    skip = set(analysis.get("skipped_files", []))
+    model = LLM_CONFIG2["model"]
+    chunks: List[DiffChunk] = []
+    cached_results: List[Dict] = []
+    for source in ("staged", "unstaged"):
+        files: List[FileDiff] = []
+        for file_diff in parse_diff(analysis.get(f"{source}_diff", "")):
+            if file_diff.path in skip:
+                continue
+            if not file_diff.hunks:
+                files.append(file_diff)
+                continue
+            pending = []
+            for hunk in file_diff.split_hunks(token_budget):
+                cached = review_cache.get(hunk_cache_key(hunk, model, REVIEW_PROMPT_VERSION)) if use_cache else None
+                if cached is None:
+                    pending.append(hunk)
+                else:
+                    cached_results.append(cached)
+            if pending:
+                files.append(FileDiff(file_diff.path, file_diff.header_lines, pending))
+        chunks += chunk_files(files, token_budget, source)
+    return chunks, cached_results, len(cached_results)
+
+
+def _cache_chunk_result(chunk: DiffChunk, result: Dict) -> None:
+    """
+    将片段审查结果拆分到各 hunk 并写入缓存
+
+    问题按 文件 + 行号 归属到对应 hunk（无法定位时归属该文件的第一个 hunk）；
+    良好实践归属片段的第一个 hunk；没有问题的 hunk 缓存为空结果。
+    """
+    if not chunk.hunks:
+        return
+    per_hunk = [{"issues": [], "highlights": [], "raw": ""} for _ in chunk.hunks]
+    for issue in result.get("issues", []):
+        file = str(issue.get("file", ""))
+        candidates = [i for i, h in enumerate(chunk.hunks)
+                      if file and (h.path == file or h.path.endswith("/" + file) or file.endswith(h.path))]
+        target = candidates[0] if candidates else 0
+        m = re.search(r"\d+", str(issue.get("location", "")))
+        if m:
+            line = int(m.group(0))
+            for i in candidates:
+                start, end = chunk.hunks[i].new_range
+                if start <= line <= end:
+                    target = i
+                    break
+        per_hunk[target]["issues"].append(issue)
+    per_hunk[0]["highlights"] = list(result.get("highlights", []))
+
+    model = LLM_CONFIG2["model"]
+    for hunk, hunk_result in zip(chunk.hunks, per_hunk):
+        review_cache.put(hunk_cache_key(hunk, model, REVIEW_PROMPT_VERSION), hunk_result)
+
+
+def _build_chunk_prompt(chunk: DiffChunk, index: int, total: int) -> str:
+    """构建单个片段的审查 prompt（要求返回 JSON）"""
+    source = "已暂存 (Staged)" if chunk.source == "staged" else "未暂存 (Unstaged)"
+    return f"""你是一个专业的代码审查专家。下面是一次代码变更中的第 {index}/{total} 个片段（{source}），
+涉及文件: {", ".join(chunk.files)}
+
+📄 **代码变更内容**:
+```diff
+{chunk.text}
+```
+
+🎯 **审查维度**:
+1. 安全性：注入、敏感信息暴露、权限控制、输入验证
+2. 性能：低效算法、重复计算、N+1 查询、内存泄漏
+3. 代码质量：逻辑错误、异常处理、边界条件、重复代码
+4. 最佳实践：命名、注释文档、类型注解、结构组织
+5. 代码风格：格式、导入顺序、行长度
+
+📊 **严重性**:
+- critical: 安全漏洞、会导致崩溃/数据丢失的 bug、破坏性变更、严重性能问题
+- medium: 潜在 bug、性能优化、缺少错误处理、违反最佳实践
+- minor: 风格、命名、注释改进
+
+⚠️ **要求**:
+1. 只审查上面 diff 中的变更，不要臆测未出现的代码
+2. location 填写函数名或新文件行号（可从 @@ 行推算）
+3. 建议必须具体、可操作
+4. 没有问题时 issues 返回空列表
+
+只返回如下 JSON，不要输出其他内容:
+{{"issues": [{{"severity": "critical|medium|minor", "file": "文件路径", "location": "函数名或行号", "type": "问题类型", "description": "问题描述", "impact": "影响", "suggestion": "修复建议"}}], "highlights": ["值得保持的良好实践"]}}"""
+
+
+def parse_review_response(content: str) -> Dict:
+    """
+    解析片段审查结果
+
+    Returns:
+        {"issues": list, "highlights": list, "raw": str}（无法解析为 JSON 时 raw 为原文）
+    """
+    text = content.strip()
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            issues = []
+            for issue in data.get("issues") or []:
+                if not isinstance(issue, dict):
+                    continue
+                severity = _SEVERITY_ALIASES.get(str(issue.get("severity", "")).strip().lower(), "minor")
+                issues.append({**issue, "severity": severity})
+            highlights = [str(h) for h in data.get("highlights") or [] if h]
+            return {"issues": issues, "highlights": highlights, "raw": ""}
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return {"issues": [], "highlights": [], "raw": text}
+
+
+def _review_chunk(chunk: DiffChunk, index: int, total: int) -> Dict:
+    """审查单个片段（结果按 hunk 写入增量缓存；无法解析的回复不缓存，下次重新审查）"""
+    prompt = _build_chunk_prompt(chunk, index, total)
+    result = llm_code.invoke([HumanMessage(content=prompt)])
+    review = parse_review_response(result.content)
+    if not review["raw"]:
+        _cache_chunk_result(chunk, review)
+    return review
+
+
+def merge_review_results(results: List[Dict]) -> Dict:
+    """
+    合并各片段的审查结果：去重并按严重性、文件排序
+
+    Returns:
+        {"issues": list, "highlights": list, "notes": list}
+    """
+    order = {key: i for i, (key, _, _) in enumerate(SEVERITY_LEVELS)}
+    seen = set()
+    issues, highlights, notes = [], [], []
+    for result in results:
+        for issue in result.get("issues", []):
+            key = (issue.get("file", ""), str(issue.get("location", "")),
+                   str(issue.get("description", ""))[:80])
+            if key in seen:
+                continue
+            seen.add(key)
+            issues.append(issue)
+        for highlight in result.get("highlights", []):
+            if highlight not in highlights:
+                highlights.append(highlight)
+        if result.get("raw"):
+            notes.append(result["raw"])
+    issues.sort(key=lambda i: (order.get(i["severity"], len(order)), i.get("file", "")))
+    return {"issues": issues, "highlights": highlights, "notes": notes}
+
+
+def render_review_report(merged: Dict, files_count: int, skipped_files: List[str],
+                         failed_chunks: List[DiffChunk], unreviewed_chunks: List[DiffChunk],
+                         cached_hunks: int = 0) -> str:
+    """渲染最终审查报告（沿用单次审查时的报告格式）"""
+    issues = merged["issues"]
+    counts = {key: sum(1 for i in issues if i["severity"] == key) for key, _, _ in SEVERITY_LEVELS}
+    if counts["critical"]:
+        conclusion = "存在严重问题"
+    elif counts["medium"]:
+        conclusion = "需要修改"
+    else:
+        conclusion = "通过"
+
+    lines = [
+        "📊 代码审查概览",
+        _SEPARATOR,
+        f"• 审查文件: {files_count} 个",
+        f"• 发现问题: {len(issues)} 个（🔴严重 {counts['critical']}个，"
+        f"🟡中级 {counts['medium']}个，🟢普通 {counts['minor']}个）",
+        f"• 审查结论: {conclusion}",
+    ]
+    if cached_hunks:
+        lines.append(f"• 复用缓存: {cached_hunks} 个未变化的 hunk")
+    if skipped_files:
+        lines.append(f"• 跳过文件: {len(skipped_files)} 个（二进制/第三方代码）")
+    if failed_chunks or unreviewed_chunks:
+        missed = sorted({f for c in failed_chunks + unreviewed_chunks for f in c.files})
+        lines.append(f"• ⚠️ 未完成审查: {len(failed_chunks) + len(unreviewed_chunks)} 个片段（{', '.join(missed)}）")
+
+    for key, icon, title in SEVERITY_LEVELS:
+        group = [i for i in issues if i["severity"] == key]
+        if not group:
+            continue
+        lines += ["", _SEPARATOR, "", f"{icon} {title.split(' ')[0]} ({len(group)}个)"]
+        for n, issue in enumerate(group, 1):
+            location = ":".join(str(p) for p in (issue.get("file"), issue.get("location")) if p)
+            lines += ["", f"{n}. [{location}] {issue.get('type', '')}".rstrip(), "",
+                      "   问题描述：", f"   {issue.get('description', '')}"]
+            if issue.get("impact"):
+                lines += ["", "   影响：", f"   {issue['impact']}"]
+            if issue.get("suggestion"):
+                lines += ["", "   建议：", f"   {issue['suggestion']}"]
+
+    if not issues:
+        lines += ["", _SEPARATOR, "", "✅ 代码质量良好，未发现明显问题"]
+
+    if merged["highlights"]:
+        lines += ["", _SEPARATOR, "", "✅ 表现良好的方面", ""]
+        lines += [f"• {h}" for h in merged["highlights"][:10]]
+
+    if merged["notes"]:
+        lines += ["", _SEPARATOR, "", "📝 其他审查意见", ""]
+        lines += merged["notes"]
+
+    if issues:
+        lines += ["", _SEPARATOR, "", "💡 总体建议", ""]
+        advice = []
+        if counts["critical"]:
+            advice.append(f"优先修复 {counts['critical']} 个严重问题后再提交")
+        if counts["medium"]:
+            advice.append(f"处理 {counts['medium']} 个中级问题（潜在 bug、错误处理、性能）")
+        if counts["minor"]:
+            advice.append(f"按需改进 {counts['minor']} 个普通问题（风格、命名、文档）")
+        lines += [f"{n}. {a}" for n, a in enumerate(advice, 1)]
+
+    return "\n".join(lines)
+
+
 def perform_code_review_func(input_str: str = "") -> str:
     """
     执行代码审查
@@ -78,13 +331,7 @@ def perform_code_review_func(input_str: str = "") -> str:
     try:
         print(f"[Code Review] 开始代码审查...")
         
-        # 检查是否是 Git 仓库
-        if not git_tools.check_git_repo():
-            error_msg = "❌ 当前目录不是 Git 仓库"
-            print(f"[Code Review] {error_msg}")
-            return error_msg
-        
-        # 分析代码变更
+        # 分析代码变更（仓库检查来自同一份快照）
         analysis = analyze_code_changes()
         
         if not analysis["success"]:
@@ -96,172 +343,45 @@ def perform_code_review_func(input_str: str = "") -> str:
         print(f"[Code Review] {analysis['summary']}")
         print(f"[Code Review] 变更文件: {len(analysis['files_changed'])} 个")
         
-        # 截取 diff（避免太长）
-        diff_content = analysis['diff_content']
-        max_diff_length = 10000  # 增加长度以便更详细分析
-        if len(diff_content) > max_diff_length:
-            diff_content = diff_content[:max_diff_length] + "\n\n... (diff太长，已截断)"
+        # Map: 按文件/hunk 切分，每个片段不超过 token 预算；未变化的 hunk 复用缓存结果
+        chunks, cached_results, cached_hunks = build_review_chunks(analysis)
+        if cached_hunks:
+            print(f"[Code Review] ♻️  {cached_hunks} 个 hunk 未变化，复用上次审查结果")
+        unreviewed = chunks[REVIEW_MAX_CHUNKS:]
+        chunks = chunks[:REVIEW_MAX_CHUNKS]
+        total = len(chunks)
         
-        # 构建 Code Review prompt
-        prompt = f"""你是一个专业的代码审查专家。你的任务是仔细审查代码变更，发现潜在问题，并按严重性分级。
-
-📄 **代码变更内容**:
-```diff
-{diff_content}
-```
-
-📁 **变更的文件列表** ({len(analysis['files_changed'])}个):
-{chr(10).join(['  - ' + f for f in analysis['files_changed']])}
-
-🎯 **审查任务**:
-
-请仔细分析上面的代码变更（diff），从以下维度进行审查：
-
-**1. 安全性 (Security)**
-- 是否存在安全漏洞（SQL注入、XSS、CSRF等）
-- 敏感信息是否暴露（密码、密钥、token等）
-- 权限控制是否正确
-- 输入验证是否充分
-
-**2. 性能 (Performance)**
-- 是否存在性能问题（死循环、O(n²)算法等）
-- 数据库查询是否优化（N+1问题、缺少索引）
-- 内存泄漏风险
-- 不必要的计算或重复操作
-
-**3. 代码质量 (Code Quality)**
-- 逻辑错误或潜在bug
-- 异常处理是否完善
-- 边界条件处理
-- 代码重复（DRY原则）
-- 函数复杂度过高
-
-**4. 最佳实践 (Best Practices)**
-- 命名规范（变量、函数、类名）
-- 代码注释和文档
-- 类型注解（Python）
-- 代码结构和组织
-- 测试覆盖
-
-**5. 代码风格 (Code Style)**
-- 格式和缩进
-- 导入语句顺序
-- 行长度
-- 空格和换行
-
-📊 **问题严重性分级**:
-
-🔴 **严重问题 (Critical)** - 必须立即修复
-- 安全漏洞
-- 关键bug（会导致崩溃、数据丢失）
-- 破坏性变更（breaking changes）
-- 严重的性能问题
-
-🟡 **中级问题 (Medium)** - 建议修复
-- 潜在bug（边界情况）
-- 性能优化建议
-- 代码质量问题
-- 违反最佳实践
-- 缺少错误处理
-
-🟢 **普通问题 (Minor)** - 可选修复
-- 代码风格问题
-- 命名建议
-- 代码优化建议
-- 注释和文档改进
-
-📋 **输出格式要求**:
-
-请按以下格式输出代码审查报告：
-
-```
-📊 代码审查概览
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-• 审查文件: {len(analysis['files_changed'])} 个
-• 发现问题: X 个（🔴严重 A个，🟡中级 B个，🟢普通 C个）
-• 审查结论: [通过/需要修改/存在严重问题]
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🔴 严重问题 (A个)
-
-1. [文件名:行号或函数名] 问题类型
-   
-   问题描述：
-   详细说明发现的问题
-   
-   影响：
-   说明这个问题可能造成的影响
-   
-   建议：
-   提供具体的修复建议和代码示例（如果适用）
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🟡 中级问题 (B个)
-
-1. [文件名:行号或函数名] 问题类型
-   
-   问题描述：
-   ...
-   
-   建议：
-   ...
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🟢 普通问题 (C个)
-
-1. [文件名:行号或函数名] 问题类型
-   
-   问题描述：
-   ...
-   
-   建议：
-   ...
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-✅ 表现良好的方面
-
-• 列出代码中做得好的地方
-• 值得保持的良好实践
-• ...
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-💡 总体建议
-
-1. 提供整体的改进建议
-2. 优先级排序
-3. ...
-```
-
-⚠️ **重要提醒**:
-1. **基于实际diff内容分析**，不要臆测没有看到的代码
-2. **提供具体位置**（文件名、函数名、行号）
-3. **给出可操作的建议**，不要只说"需要改进"
-4. **如果没有发现问题**，说明"代码质量良好，未发现明显问题"
-5. **关注变更部分**，不要审查未变更的代码
-
-现在请开始代码审查，只返回审查报告内容:"""
-
         print(f"[Code Review] 使用模型: {LLM_CONFIG2['model']}")
-        print(f"[Code Review] 正在生成审查报告...")
+        print(f"[Code Review] 共 {total} 个片段，并发审查（最多 {REVIEW_MAX_WORKERS} 个同时进行）...")
+        
+        results: List[Dict] = list(cached_results)
+        failed: List[DiffChunk] = []
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(REVIEW_MAX_WORKERS, total)) as executor:
+                futures = {
+                    executor.submit(_review_chunk, chunk, i, total): chunk
+                    for i, chunk in enumerate(chunks, 1)
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    chunk = futures[future]
+                    try:
+                        results.append(future.result())
+                        print(f"[Code Review] 进度 {done}/{total} ✅ {', '.join(chunk.files)}")
+                    except Exception as e:
+                        failed.append(chunk)
+                        print(f"[Code Review] 进度 {done}/{total} ❌ {', '.join(chunk.files)}: {e}")
+        
+        review_cache.save()
         
-        # 调用 LLM 生成代码审查报告
-        result = llm_code.invoke([HumanMessage(content=prompt)])
-        review_report = result.content.strip()
+        if chunks and len(failed) == total:
+            return "❌ 代码审查失败: 所有片段的审查均未成功"
         
-        # 清理可能的 markdown 格式
-        if review_report.startswith("```"):
-            lines = review_report.split('\n')
-            # 移除首尾的 ``` 标记
-            if lines[0].strip().startswith("```"):
-                lines = lines[1:]
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            review_report = '\n'.join(lines)
+        # Reduce: 合并、去重、按严重性排序
+        merged = merge_review_results(results)
+        review_report = render_review_report(
+            merged, len(analysis['files_changed']), analysis.get('skipped_files', []),
+            failed, unreviewed, cached_hunks,
+        )
         
         print(f"[Code Review] ✅ 审查完成")
         
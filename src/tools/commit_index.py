@@ -0,0 +1,266 @@
+"""
+提交历史索引模块
+为每个仓库持久化一份提交索引（哈希、作者、时间、标题、numstat），
+每次查询前只增量读取尚未索引的提交，日报/周报与 commit 风格采样直接查索引
+
+提交记录按哈希保存，与 HEAD 无关：切换分支、rebase、reset 后只读取未知提交，
+当前 HEAD 的历史由 `git rev-list` 从已索引的记录中选取，不会整体重建。
+
+使用: from src.tools.commit_index import get_commit_index
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.core.agent_config import COMMIT_INDEX_DIR
+from src.tools.git_snapshot import _run_git, parse_numstat_z
+
+
+# 索引文件格式版本（结构变化时递增，旧文件直接重建）
+_INDEX_FORMAT = 2
+
+# 单个 HEAD 的历史最多索引的提交数
+INDEX_MAX_COMMITS = 5000
+
+# 记住的已索引 HEAD 数（读取新提交时排除这些 HEAD 可达的提交）
+INDEX_MAX_TIPS = 16
+
+# git log 格式：记录分隔符 + 字段分隔符，标题中的 "|" 等字符不影响解析
+_LOG_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%at%x1f%s"
+
+
+@dataclass
+class CommitRecord:
+    """单个提交"""
+    hash: str
+    author: str
+    email: str
+    timestamp: int
+    subject: str
+    # [[新增行数, 删除行数, 路径], ...]，二进制文件的行数为 None
+    files: List[list] = field(default_factory=list)
+
+    @property
+    def short_hash(self) -> str:
+        return self.hash[:7]
+
+    @property
+    def oneline(self) -> str:
+        """与 `git log --oneline` 相同的单行格式"""
+        return f"{self.short_hash} {self.subject}"
+
+    @property
+    def lines_added(self) -> int:
+        return sum(f[0] or 0 for f in self.files)
+
+    @property
+    def lines_removed(self) -> int:
+        return sum(f[1] or 0 for f in self.files)
+
+
+def parse_log_records(raw: str) -> List[CommitRecord]:
+    """
+    解析 `git log --format=<_LOG_FORMAT> --numstat -z` 输出
+
+    每条记录为 "\\x1e" + 以 "\\x1f" 分隔的字段 + "\\0"，随后是 numstat -z 段。
+    """
+    records = []
+    for chunk in raw.split("\x1e"):
+        if not chunk:
+            continue
+        header, _, numstat = chunk.partition("\0")
+        fields = header.split("\x1f")
+        if len(fields) != 5:
+            continue
+        files = [[e.added, e.deleted, e.path] for e in parse_numstat_z(numstat.lstrip("\n"))]
+        records.append(CommitRecord(
+            hash=fields[0],
+            author=fields[1],
+            email=fields[2],
+            timestamp=int(fields[3] or 0),
+            subject=fields[4],
+            files=files,
+        ))
+    return records
+
+
+class CommitIndex:
+    """单个仓库的提交索引（线程安全；按哈希保存记录，切换 HEAD 时只读取未知提交）"""
+
+    def __init__(self, repo_root: str, index_dir: str = COMMIT_INDEX_DIR):
+        """
+        初始化索引
+
+        Args:
+            repo_root: 仓库根目录（git rev-parse --show-toplevel）
+            index_dir: 索引文件目录
+        """
+        self.repo_root = repo_root
+        digest = hashlib.sha1(os.path.abspath(repo_root).encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(index_dir, f"{digest}.json")
+        # 哈希 -> 提交记录（跨 HEAD 共享）
+        self._records: Optional[Dict[str, CommitRecord]] = None
+        # 当前 HEAD 的历史（最新在前）
+        self._commits: List[CommitRecord] = []
+        self._head = ""
+        # 已完整索引的 HEAD（最近的在前），其可达提交都已在 _records 中
+        self._tips: List[str] = []
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, CommitRecord]:
+        """延迟加载索引文件（调用方持有锁）"""
+        if self._records is None:
+            self._records = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("format") == _INDEX_FORMAT and data.get("repo") == self.repo_root:
+                    self._records = {c["hash"]: CommitRecord(**c) for c in data.get("commits", [])}
+                    self._head = data.get("head", "")
+                    self._tips = list(data.get("tips", []))
+                    self._commits = [self._records[h] for h in data.get("order", []) if h in self._records]
+            except (OSError, ValueError, TypeError, AttributeError, KeyError):
+                self._records = {}
+        return self._records
+
+    def _save(self) -> None:
+        """原子写回索引文件（调用方持有锁）"""
+        data = {
+            "format": _INDEX_FORMAT,
+            "repo": self.repo_root,
+            "head": self._head,
+            "tips": self._tips,
+            "order": [c.hash for c in self._commits],
+            "commits": [asdict(c) for c in (self._records or {}).values()],
+        }
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".commit_index.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[提交索引] ⚠️ 保存索引失败: {e}")
+
+    def _read_log(self, head: str, exclude: List[str]) -> List[CommitRecord]:
+        """读取 head 可达、但 exclude 中各提交不可达的提交（最新在前；已不存在的 exclude 被忽略）"""
+        result = _run_git(
+            ["log", f"--format={_LOG_FORMAT}", "--numstat", "-z", "--no-renames", "--ignore-missing",
+             f"-{INDEX_MAX_COMMITS}", head, "--not", *exclude],
+            self.repo_root,
+            timeout=60,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "git log 执行失败")
+        return parse_log_records(result.stdout)
+
+    def _rev_list(self, head: str) -> List[str]:
+        """head 的历史哈希（最新在前，与 git log 顺序一致）"""
+        result = _run_git(["rev-list", f"-{INDEX_MAX_COMMITS}", head], self.repo_root, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "git rev-list 执行失败")
+        return result.stdout.split()
+
+    def update(self) -> int:
+        """
+        增量更新索引到当前 HEAD
+
+        只读取已索引 HEAD 都不可达的提交（HEAD 前进时即新增提交；切换分支、rebase 时
+        只有对方分支或改写后的提交），再按 rev-list 从记录中选出当前 HEAD 的历史。
+
+        Returns:
+            新读取的提交数
+        """
+        with self._lock:
+            records = self._load()
+            head = _run_git(["rev-parse", "--verify", "-q", "HEAD"], self.repo_root)
+            if head.returncode != 0:
+                # 空仓库
+                changed = bool(records)
+                self._records, self._commits, self._head, self._tips = {}, [], "", []
+                if changed:
+                    self._save()
+                return 0
+
+            head_hash = head.stdout.strip()
+            if head_hash == self._head:
+                return 0
+
+            new_commits = [] if head_hash in self._tips else self._read_log(head_hash, self._tips)
+            for commit in new_commits:
+                records[commit.hash] = commit
+            self._commits = [records[h] for h in self._rev_list(head_hash) if h in records]
+            self._head = head_hash
+            self._tips = [head_hash] + [t for t in self._tips if t != head_hash][:INDEX_MAX_TIPS - 1]
+
+            # 记录过多时只保留当前 HEAD 的历史（其他 HEAD 的可达提交不再完整，不能再作为排除点）
+            if len(records) > INDEX_MAX_COMMITS * 2:
+                self._records = {c.hash: c for c in self._commits}
+                self._tips = [head_hash]
+            self._save()
+            return len(new_commits)
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              author: Optional[str] = None, limit: Optional[int] = None) -> List[CommitRecord]:
+        """
+        按时间范围和作者查询提交（最新在前；时间为作者时间）
+
+        Args:
+            since: 起始时间戳（含）
+            until: 结束时间戳（含）
+            author: 作者名或邮箱（不区分大小写的子串匹配）
+            limit: 最多返回条数
+
+        Returns:
+            CommitRecord 列表
+        """
+        self.update()
+        needle = author.lower() if author else ""
+        results = []
+        with self._lock:
+            for commit in self._commits:
+                if since is not None and commit.timestamp < since:
+                    continue
+                if until is not None and commit.timestamp > until:
+                    continue
+                if needle and needle not in commit.author.lower() and needle not in commit.email.lower():
+                    continue
+                results.append(commit)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def recent(self, count: int = 10, author: Optional[str] = None) -> List[CommitRecord]:
+        """最近的 count 个提交（可按作者过滤，用于 commit 风格采样）"""
+        return self.query(author=author, limit=count)
+
+
+# 仓库根目录 -> CommitIndex
+_indexes: Dict[str, CommitIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_commit_index(working_dir: str = ".") -> Tuple[Optional[CommitIndex], str]:
+    """
+    获取工作目录所在仓库的提交索引（同一仓库共享同一实例）
+
+    Returns:
+        (CommitIndex, 错误信息)；不是 Git 仓库时索引为 None
+    """
+    try:
+        result = _run_git(["rev-parse", "--show-toplevel"], working_dir)
+    except Exception as e:
+        return None, str(e)
+    if result.returncode != 0:
+        return None, "当前目录不是Git仓库"
+    root = result.stdout.strip()
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = CommitIndex(root)
+        return _indexes[root], ""
@@ -12,6 +12,7 @@ from langchain_core.tools import Tool
 
 from src.core.agent_memory import memory
 from src.core.agent_llm import llm_code
+from src.tools.commit_index import CommitRecord, get_commit_index
 from src.core.agent_config import (
     DEFAULT_DAILY_REPORT_TEMPLATE,
     DAILY_REPORT_DIR,
@@ -35,79 +36,49 @@ class DailyReportCollector:
         
     def collect_git_commits(self) -> List[Dict[str, Any]]:
         """
-        收集当天的 Git 提交记录
+        收集当天的 Git 提交记录（查询提交历史索引）
         
         Returns:
             Git 提交记录列表
         """
         commits = []
         try:
+            index, _ = get_commit_index(self.work_dir)
+            if index is None:
+                return commits
+
             # 获取当天的提交记录
-            cmd = [
-                "git", "log", 
-                "--since=midnight", 
-                "--until=23:59:59",
-                "--pretty=format:%H|%an|%ad|%s",
-                "--date=format:%H:%M:%S"
-            ]
-            
-            result = subprocess.run(
-                cmd, 
-                cwd=self.work_dir,
-                capture_output=True, 
-                text=True, 
-                timeout=10
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        parts = line.split('|', 3)
-                        if len(parts) == 4:
-                            commits.append({
-                                "hash": parts[0][:8],
-                                "author": parts[1],
-                                "time": parts[2],
-                                "message": parts[3],
-                                "full_hash": parts[0]
-                            })
+            midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            for commit in index.query(since=midnight.timestamp(),
+                                      until=(midnight + timedelta(days=1)).timestamp() - 1):
+                commits.append(self._commit_to_dict(commit, "%H:%M:%S"))
             
             # 如果没有当天提交，获取最近3天的提交作为参考
             if not commits:
-                cmd_recent = [
-                    "git", "log", 
-                    "--since=3.days.ago",
-                    "--pretty=format:%H|%an|%ad|%s",
-                    "--date=format:%Y-%m-%d %H:%M:%S",
-                    "-10"  # 最多10条
-                ]
-                
-                result_recent = subprocess.run(
-                    cmd_recent,
-                    cwd=self.work_dir,
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if result_recent.returncode == 0 and result_recent.stdout.strip():
-                    for line in result_recent.stdout.strip().split('\n'):
-                        if line.strip():
-                            parts = line.split('|', 3)
-                            if len(parts) == 4:
-                                commits.append({
-                                    "hash": parts[0][:8],
-                                    "author": parts[1],
-                                    "time": parts[2],
-                                    "message": parts[3],
-                                    "full_hash": parts[0],
-                                    "is_recent": True  # 标记为最近提交
-                                })
+                since = (datetime.now() - timedelta(days=3)).timestamp()
+                for commit in index.query(since=since, limit=10):  # 最多10条
+                    item = self._commit_to_dict(commit, "%Y-%m-%d %H:%M:%S")
+                    item["is_recent"] = True  # 标记为最近提交
+                    commits.append(item)
                                 
         except Exception as e:
             print(f"⚠️ 收集 Git 提交时出错: {e}")
             
         return commits
+
+    @staticmethod
+    def _commit_to_dict(commit: CommitRecord, time_format: str) -> Dict[str, Any]:
+        """索引中的提交 -> 日报提交记录"""
+        return {
+            "hash": commit.hash[:8],
+            "author": commit.author,
+            "time": datetime.fromtimestamp(commit.timestamp).strftime(time_format),
+            "message": commit.subject,
+            "full_hash": commit.hash,
+            "files_changed": len(commit.files),
+            "lines_added": commit.lines_added,
+            "lines_removed": commit.lines_removed,
+        }
     
     def collect_command_history(self) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,242 @@
+"""
+Diff 分块模块
+将 git diff 解析为 文件 -> hunk 结构，并按 token 预算打包为可独立发送给 LLM 的片段
+
+使用: from src.tools.diff_chunks import parse_diff, chunk_diff
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from src.core.file_context import estimate_tokens
+
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@(.*)$")
+
+
+@dataclass
+class DiffHunk:
+    """单个 hunk（header 为 "@@ -a,b +c,d @@ ..." 行）"""
+    path: str
+    header: str
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join([self.header] + self.lines)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    @property
+    def new_range(self) -> Tuple[int, int]:
+        """新文件中的行号范围（闭区间；无法解析 header 时为 (0, 0)）"""
+        m = _HUNK_HEADER_RE.match(self.header)
+        if not m:
+            return 0, 0
+        start = int(m.group(2))
+        count = sum(1 for line in self.lines if not line.startswith(("-", "\\")))
+        return start, start + max(count - 1, 0)
+
+
+@dataclass
+class FileDiff:
+    """单个文件的 diff（header_lines 为 diff --git / index / --- / +++ 等行）"""
+    path: str
+    header_lines: List[str] = field(default_factory=list)
+    hunks: List[DiffHunk] = field(default_factory=list)
+
+    @property
+    def header(self) -> str:
+        return "\n".join(self.header_lines)
+
+    @property
+    def header_tokens(self) -> int:
+        return estimate_tokens(self.header) + 1
+
+    def split_hunks(self, token_budget: int) -> List[DiffHunk]:
+        """将所有 hunk 拆分为（连同文件头）不超过预算的片段"""
+        budget = max(token_budget - self.header_tokens, 1)
+        return [piece for h in self.hunks for piece in split_hunk(h, budget)]
+
+
+@dataclass
+class DiffChunk:
+    """一个按预算打包的 diff 片段（可包含多个文件的若干 hunk）"""
+    files: List[str] = field(default_factory=list)
+    hunks: List[DiffHunk] = field(default_factory=list)
+    parts: List[str] = field(default_factory=list)
+    tokens: int = 0
+    source: str = ""
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.parts)
+
+
+def _path_from_header(header_lines: List[str]) -> str:
+    """从文件头中提取路径（优先 +++ b/，删除文件取 --- a/）"""
+    for line in header_lines:
+        if line.startswith("+++ ") and line[4:] != "/dev/null":
+            return line[6:] if line.startswith("+++ b/") else line[4:]
+    for line in header_lines:
+        if line.startswith("--- ") and line[4:] != "/dev/null":
+            return line[6:] if line.startswith("--- a/") else line[4:]
+    for line in header_lines:
+        if line.startswith("rename to "):
+            return line[len("rename to "):]
+    first = header_lines[0] if header_lines else ""
+    if " b/" in first:
+        return first.rsplit(" b/", 1)[1]
+    return first
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """
+    解析 git diff 文本
+
+    Args:
+        diff: `git diff` 输出
+
+    Returns:
+        FileDiff 列表（保持原顺序）
+    """
+    files: List[FileDiff] = []
+    current: Optional[FileDiff] = None
+    hunk: Optional[DiffHunk] = None
+    for line in diff.split("\n"):
+        if line.startswith("diff --git "):
+            if current is not None:
+                current.path = _path_from_header(current.header_lines)
+            current = FileDiff(path="", header_lines=[line])
+            files.append(current)
+            hunk = None
+        elif current is None:
+            continue
+        elif line.startswith("@@"):
+            hunk = DiffHunk(path="", header=line)
+            current.hunks.append(hunk)
+        elif hunk is None:
+            current.header_lines.append(line)
+        else:
+            hunk.lines.append(line)
+    if current is not None:
+        current.path = _path_from_header(current.header_lines)
+    for file_diff in files:
+        for h in file_diff.hunks:
+            h.path = file_diff.path
+    return files
+
+
+def split_hunk(hunk: DiffHunk, token_budget: int) -> List[DiffHunk]:
+    """
+    将超出预算的 hunk 按行拆分，每段重新计算起始行号
+
+    Args:
+        hunk: 原 hunk
+        token_budget: 每段的 token 上限
+
+    Returns:
+        拆分后的 hunk 列表（未超出预算时返回 [hunk]）
+    """
+    if hunk.tokens <= token_budget:
+        return [hunk]
+
+    m = _HUNK_HEADER_RE.match(hunk.header)
+    old_no, new_no = (int(m.group(1)), int(m.group(2))) if m else (0, 0)
+    context = m.group(3) if m else ""
+
+    pieces: List[DiffHunk] = []
+    piece_lines: List[str] = []
+    piece_tokens = 0
+    piece_start = (old_no, new_no)
+    for line in hunk.lines:
+        line_tokens = estimate_tokens(line) + 1
+        if piece_lines and piece_tokens + line_tokens > token_budget:
+            pieces.append(DiffHunk(hunk.path, f"@@ -{piece_start[0]} +{piece_start[1]} @@{context}", piece_lines))
+            piece_lines, piece_tokens, piece_start = [], 0, (old_no, new_no)
+        piece_lines.append(line)
+        piece_tokens += line_tokens
+        if line.startswith("-"):
+            old_no += 1
+        elif line.startswith("+"):
+            new_no += 1
+        elif not line.startswith("\\"):
+            old_no += 1
+            new_no += 1
+    if piece_lines:
+        pieces.append(DiffHunk(hunk.path, f"@@ -{piece_start[0]} +{piece_start[1]} @@{context}", piece_lines))
+    return pieces
+
+
+def chunk_files(files: List[FileDiff], token_budget: int, source: str = "") -> List[DiffChunk]:
+    """
+    按 token 预算将已解析的文件 diff 打包为片段
+
+    同一文件的 hunk 尽量放在同一片段；小文件合并到同一片段以减少调用次数；
+    每个片段都带上所含文件的文件头，可以独立审查。
+
+    Args:
+        files: FileDiff 列表
+        token_budget: 每个片段的 token 上限
+        source: 片段来源标记（如 "staged" / "unstaged"）
+
+    Returns:
+        DiffChunk 列表
+    """
+    chunks: List[DiffChunk] = []
+    current = DiffChunk(source=source)
+
+    def flush():
+        nonlocal current
+        if current.parts:
+            chunks.append(current)
+        current = DiffChunk(source=source)
+
+    for file_diff in files:
+        header_tokens = file_diff.header_tokens
+        units = file_diff.split_hunks(token_budget)
+        if not units:
+            # 仅有文件头（重命名、权限变更、二进制等）
+            if current.parts and current.tokens + header_tokens > token_budget:
+                flush()
+            current.files.append(file_diff.path)
+            current.parts.append(file_diff.header)
+            current.tokens += header_tokens
+            continue
+
+        for unit in units:
+            needs_header = not current.files or current.files[-1] != file_diff.path
+            cost = unit.tokens + 1 + (header_tokens if needs_header else 0)
+            if current.parts and current.tokens + cost > token_budget:
+                flush()
+                needs_header = True
+                cost = unit.tokens + 1 + header_tokens
+            if needs_header:
+                current.files.append(file_diff.path)
+                current.parts.append(file_diff.header)
+            current.hunks.append(unit)
+            current.parts.append(unit.text)
+            current.tokens += cost
+    flush()
+    return chunks
+
+
+def chunk_diff(diff: str, token_budget: int, source: str = "",
+               skip_paths: Optional[Set[str]] = None) -> List[DiffChunk]:
+    """
+    解析 diff 并按 token 预算打包为片段（见 chunk_files）
+
+    Args:
+        diff: `git diff` 输出
+        token_budget: 每个片段的 token 上限
+        source: 片段来源标记（如 "staged" / "unstaged"）
+        skip_paths: 不需要打包的文件路径（如二进制、第三方代码）
+
+    Returns:
+        DiffChunk 列表
+    """
+    files = [f for f in parse_diff(diff) if not (skip_paths and f.path in skip_paths)]
+    return chunk_files(files, token_budget, source)
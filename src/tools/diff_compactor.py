@@ -0,0 +1,215 @@
+"""
+Diff 压缩模块
+为 commit 消息生成在 token 预算内压缩 diff：
+
+- 只保留 hunk 头和变更行，连续的上下文行折叠为一行说明
+- 锁文件、生成代码、二进制/第三方代码、大段新增文件只保留增删统计
+- 文件按变更量（增删行数）从大到小排列，预算不足时优先保留变更最大的文件
+
+使用: from src.tools.diff_compactor import compact_diff
+"""
+
+import fnmatch
+import posixpath
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.core.file_context import estimate_tokens
+from src.tools.diff_chunks import DiffHunk, FileDiff, parse_diff
+from src.tools.git_snapshot import FileChange, is_vendored_path
+
+
+# commit 消息生成时 diff 的默认 token 预算
+COMMIT_DIFF_TOKEN_BUDGET = 4000
+
+# 新增文件超过该行数时只保留统计
+LARGE_ADDITION_LINES = 300
+
+# 变更行两侧保留的上下文行数
+CONTEXT_LINES = 1
+
+# 统计区最多列出的文件数
+MAX_SUMMARY_ITEMS = 30
+
+LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+    "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock", "Cargo.lock", "go.sum",
+    "composer.lock", "Gemfile.lock", "mix.lock", "pubspec.lock", "Podfile.lock",
+}
+
+GENERATED_PATTERNS = (
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.pb.cc", "*.pb.h",
+    "*.generated.*", "*.g.dart", "*.snap", "*.min.js", "*.min.css", "*.map",
+)
+
+# 仅保留统计的原因 -> 显示文本
+_REASON_LABELS = {
+    "binary": "二进制",
+    "vendored": "第三方代码",
+    "lockfile": "锁文件",
+    "generated": "生成代码",
+    "large_addition": "新增大文件",
+    "budget": "超出预算",
+}
+
+
+@dataclass
+class _FileEntry:
+    """压缩过程中的单个文件"""
+    diff: FileDiff
+    added: int
+    removed: int
+    reason: str = ""
+
+    @property
+    def weight(self) -> int:
+        return self.added + self.removed
+
+
+def _count_lines(file_diff: FileDiff) -> Tuple[int, int]:
+    """统计增删行数"""
+    added = removed = 0
+    for hunk in file_diff.hunks:
+        for line in hunk.lines:
+            if line.startswith("+"):
+                added += 1
+            elif line.startswith("-"):
+                removed += 1
+    return added, removed
+
+
+def _summary_reason(entry: _FileEntry, change: Optional[FileChange]) -> str:
+    """判断文件是否只保留统计，返回原因（空字符串表示保留 diff）"""
+    file_diff = entry.diff
+    name = posixpath.basename(file_diff.path)
+    if (change is not None and change.binary) or any(
+        line.startswith("Binary files ") or line == "GIT binary patch" for line in file_diff.header_lines
+    ):
+        return "binary"
+    if is_vendored_path(file_diff.path):
+        return "vendored"
+    if name in LOCKFILE_NAMES:
+        return "lockfile"
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_PATTERNS):
+        return "generated"
+    is_new = any(line.startswith("new file mode") for line in file_diff.header_lines)
+    if is_new and entry.removed == 0 and entry.added > LARGE_ADDITION_LINES:
+        return "large_addition"
+    return ""
+
+
+def compact_hunk(hunk: DiffHunk, context: int = CONTEXT_LINES) -> List[str]:
+    """
+    压缩单个 hunk：保留 header 与变更行，变更行两侧各保留 context 行上下文，其余折叠
+
+    Returns:
+        压缩后的行列表（含 header）
+    """
+    lines = [line for line in hunk.lines if not line.startswith("\\")]
+    changed = [i for i, line in enumerate(lines) if line.startswith(("+", "-"))]
+    keep = set()
+    for i in changed:
+        keep.update(range(max(i - context, 0), min(i + context + 1, len(lines))))
+
+    result = [hunk.header]
+    skipped = 0
+    for i, line in enumerate(lines):
+        if i in keep:
+            if skipped:
+                result.append(f" ⋯ ({skipped} 行上下文)")
+                skipped = 0
+            result.append(line)
+        else:
+            skipped += 1
+    if skipped:
+        result.append(f" ⋯ ({skipped} 行上下文)")
+    return result
+
+
+def _render_header(file_diff: FileDiff) -> List[str]:
+    """文件头只保留 diff --git 行与新增/删除/重命名/权限信息"""
+    keep_prefixes = ("new file mode", "deleted file mode", "rename from", "rename to",
+                     "copy from", "copy to", "old mode", "new mode")
+    return file_diff.header_lines[:1] + [
+        line for line in file_diff.header_lines[1:] if line.startswith(keep_prefixes)
+    ]
+
+
+def _stat_text(entry: _FileEntry) -> str:
+    """单个文件的统计说明"""
+    label = _REASON_LABELS.get(entry.reason, entry.reason)
+    if entry.reason == "binary":
+        return f"{entry.diff.path} ({label})"
+    return f"{entry.diff.path} ({label}, +{entry.added}/-{entry.removed})"
+
+
+def compact_diff(diff: str, token_budget: int = COMMIT_DIFF_TOKEN_BUDGET,
+                 changes: Optional[List[FileChange]] = None) -> str:
+    """
+    在 token 预算内压缩 diff
+
+    Args:
+        diff: `git diff` 输出
+        token_budget: 压缩结果的 token 上限（统计区另计，最多 MAX_SUMMARY_ITEMS 行）
+        changes: 对应的 FileChange 列表（用于识别二进制文件，可选）
+
+    Returns:
+        压缩后的 diff 文本
+    """
+    by_path: Dict[str, FileChange] = {c.path: c for c in changes or []}
+    entries = []
+    for file_diff in parse_diff(diff):
+        added, removed = _count_lines(file_diff)
+        entry = _FileEntry(file_diff, added, removed)
+        entry.reason = _summary_reason(entry, by_path.get(file_diff.path))
+        entries.append(entry)
+
+    # 按变更量从大到小排列（同量时保持原顺序）
+    entries.sort(key=lambda e: e.weight, reverse=True)
+
+    sections: List[str] = []
+    summarized: List[_FileEntry] = []
+    used = 0
+    for entry in entries:
+        if entry.reason:
+            summarized.append(entry)
+            continue
+
+        header = "\n".join(_render_header(entry.diff))
+        header_tokens = estimate_tokens(header) + 1
+        if used + header_tokens > token_budget:
+            entry.reason = "budget"
+            summarized.append(entry)
+            continue
+
+        parts = [header]
+        file_used = header_tokens
+        omitted = 0
+        for hunk in entry.diff.hunks:
+            text = "\n".join(compact_hunk(hunk))
+            tokens = estimate_tokens(text) + 1
+            if used + file_used + tokens > token_budget:
+                omitted += 1
+                continue
+            parts.append(text)
+            file_used += tokens
+        if entry.diff.hunks and omitted == len(entry.diff.hunks):
+            # 一个 hunk 都放不下时整个文件降级为统计
+            entry.reason = "budget"
+            summarized.append(entry)
+            continue
+        if omitted:
+            note = f"# ... {omitted} 个 hunk 超出预算已省略 (+{entry.added}/-{entry.removed})"
+            parts.append(note)
+            file_used += estimate_tokens(note) + 1
+        used += file_used
+        sections.append("\n".join(parts))
+
+    if summarized:
+        lines = ["# 以下文件仅保留统计:"]
+        lines += [f"#   {_stat_text(e)}" for e in summarized[:MAX_SUMMARY_ITEMS]]
+        if len(summarized) > MAX_SUMMARY_ITEMS:
+            lines.append(f"#   ... 还有 {len(summarized) - MAX_SUMMARY_ITEMS} 个文件")
+        sections.append("\n".join(lines))
+
+    return "\n".join(sections)
@@ -4,18 +4,23 @@ Git Commit 工具 - LangChain Tool 封装
 """
 
 from langchain_core.tools import Tool
-from src.tools.git_tools import git_tools
+from typing import Dict, Optional
+
+from src.tools.git_tools import GitTools, git_tools
+from src.tools.git_snapshot import group_changes
+from src.tools.diff_compactor import COMMIT_DIFF_TOKEN_BUDGET, compact_diff
 from src.core.agent_llm import llm_code
 from src.core.agent_config import LLM_CONFIG2
 from langchain_core.messages import HumanMessage
 
 
-def generate_commit_message_tool_func(input_str: str = "") -> str:
+def generate_commit_message_tool_func(input_str: str = "", tools: Optional[GitTools] = None) -> str:
     """
     生成 Git commit 消息
 
     Args:
         input_str: 可选的额外说明（通常不需要）
+        tools: 目标仓库的 GitTools（默认当前目录）
 
     Returns:
         格式化的 commit 消息和使用说明
@@ -23,8 +28,12 @@ def generate_commit_message_tool_func(input_str: str = "") -> str:
     try:
         print(f"[Git分析] 分析代码变更...")
 
-        # 分析 Git 变更
-        analysis = git_tools.analyze_changes()
+        # 分析 Git 变更：有暂存内容时 commit 消息只看暂存 diff，
+        # 先跳过未跟踪文件扫描（大仓库中 git status 的主要开销），没有暂存内容时再完整分析
+        tools = tools or git_tools
+        analysis = tools.analyze_changes(untracked=False)
+        if not (analysis["success"] and analysis["has_staged"]):
+            analysis = tools.analyze_changes()
 
         if not analysis["success"]:
             error_msg = analysis.get('error', 'Git分析失败')
@@ -35,6 +44,25 @@ def generate_commit_message_tool_func(input_str: str = "") -> str:
         print(f"[Git分析] {analysis['summary']}")
         print(f"[Git分析] 变更文件: {len(analysis['files_changed'])} 个")
 
+        return generate_commit_message_from_analysis(analysis)
+
+    except Exception as e:
+        error_msg = f"❌ 生成commit消息失败: {str(e)}"
+        print(f"[Commit生成] {error_msg}")
+        return error_msg
+
+
+def generate_commit_message_from_analysis(analysis: Dict) -> str:
+    """
+    根据变更分析结果（GitTools.analyze_changes / analyze_snapshot）生成 commit 消息
+
+    Args:
+        analysis: 变更分析结果
+
+    Returns:
+        格式化的 commit 消息和使用说明
+    """
+    try:
         # 准备 diff 内容
         if analysis['has_staged']:
             diff_content = analysis['staged_diff']
@@ -46,31 +74,11 @@ def generate_commit_message_tool_func(input_str: str = "") -> str:
             diff_content = analysis['status']
             diff_type = "状态"
 
-        # 获取 git status 的详细信息（包含文件状态标记）
-        status_lines = analysis['status'].split('\n')
-
-        # 分类统计文件变更
-        deleted_files = []
-        modified_files = []
-        added_files = []
-
-        for line in status_lines:
-            if not line.strip():
-                continue
-            # Git status 格式: XY filename
-            # D = deleted, M = modified, A = added, ?? = untracked
-            if line.startswith(' D'):
-                deleted_files.append(line[3:])
-            elif line.startswith('D '):
-                deleted_files.append(line[3:])
-            elif line.startswith(' M'):
-                modified_files.append(line[3:])
-            elif line.startswith('M '):
-                modified_files.append(line[3:])
-            elif line.startswith('??'):
-                added_files.append(line[3:])
-            elif line.startswith('A '):
-                added_files.append(line[3:])
+        # 按结构化变更记录分类（来自 porcelain v2 状态 + numstat）
+        groups = group_changes(analysis['changes'])
+        deleted_files = [c.label for c in groups['deleted']]
+        modified_files = [c.label for c in groups['modified']]
+        added_files = [c.label for c in groups['added']]
 
         # 构建详细的文件变更统计
         file_stats = []
@@ -83,10 +91,9 @@ def generate_commit_message_tool_func(input_str: str = "") -> str:
 
         file_stats_str = "、".join(file_stats) if file_stats else "未知变更"
 
-        # 扩大 diff 长度限制，让 LLM 能看到更多细节
-        max_diff_length = 8000
-        if len(diff_content) > max_diff_length:
-            diff_content = diff_content[:max_diff_length] + "\n\n... (diff太长，已截断)"
+        # 在 token 预算内压缩 diff：折叠上下文，锁文件/生成代码/大文件只保留统计
+        if diff_type != "状态":
+            diff_content = compact_diff(diff_content, COMMIT_DIFF_TOKEN_BUDGET, analysis['changes'])
 
         # 获取最近的 commits 作为参考
         recent_commits_str = "\n".join(analysis.get('recent_commits', [])[:5])
@@ -0,0 +1,117 @@
+"""
+大仓库模式
+在文件数很多的仓库（monorepo）中，`git status` 的主要开销是遍历工作区与扫描未跟踪文件。
+本模块检测仓库规模与 core.fsmonitor / core.untrackedCache 配置，并可按需开启：
+
+- core.untrackedCache: 缓存目录 mtime，未变化的目录不再重新扫描未跟踪文件
+- core.fsmonitor: 使用 git 内置的文件系统监视守护进程，只检查发生变化的路径（平台支持时）
+
+使用: from src.tools.git_large_repo import detect_large_repo, enable_large_repo_mode
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import Dict
+
+from src.tools.git_snapshot import _run_git
+
+
+# index 文件超过该大小视为大仓库（每个条目约 80-100 字节，约合 5 万个文件）
+LARGE_REPO_INDEX_BYTES = 5 * 1024 * 1024
+
+
+@dataclass
+class LargeRepoStatus:
+    """仓库规模与加速配置"""
+    is_repo: bool = False
+    index_bytes: int = 0
+    fsmonitor: bool = False
+    untracked_cache: bool = False
+
+    @property
+    def is_large(self) -> bool:
+        return self.index_bytes >= LARGE_REPO_INDEX_BYTES
+
+    @property
+    def estimated_files(self) -> int:
+        """按 index 大小粗略估算的文件数"""
+        return self.index_bytes // 90
+
+    @property
+    def optimized(self) -> bool:
+        return self.fsmonitor and self.untracked_cache
+
+
+def _config_true(value: str) -> bool:
+    return value.strip().lower() in ("true", "yes", "on", "1")
+
+
+def detect_large_repo(working_dir: str = ".") -> LargeRepoStatus:
+    """
+    检测仓库规模与 fsmonitor / untrackedCache 配置（只执行两条轻量命令）
+
+    Returns:
+        LargeRepoStatus
+    """
+    status = LargeRepoStatus()
+    try:
+        index = _run_git(["rev-parse", "--git-path", "index"], working_dir)
+    except (OSError, subprocess.SubprocessError):
+        return status
+    if index.returncode != 0:
+        return status
+    status.is_repo = True
+    try:
+        status.index_bytes = os.path.getsize(os.path.join(working_dir, index.stdout.strip()))
+    except OSError:
+        pass
+
+    config = _run_git(["config", "--get-regexp", r"^core\.(fsmonitor|untrackedcache)$"], working_dir)
+    for line in config.stdout.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "core.fsmonitor":
+            # 值为 true（内置守护进程）或 hook 脚本路径
+            status.fsmonitor = value.strip().lower() not in ("", "false", "no", "off", "0")
+        elif key == "core.untrackedcache":
+            status.untracked_cache = _config_true(value)
+    return status
+
+
+def fsmonitor_supported(working_dir: str = ".") -> bool:
+    """当前平台的 git 是否支持内置 fsmonitor 守护进程"""
+    result = _run_git(["fsmonitor--daemon", "status"], working_dir)
+    output = (result.stdout + result.stderr).lower()
+    if "not supported" in output or "is not a git command" in output:
+        return False
+    # 守护进程未运行时 status 返回非零，但说明命令可用
+    return True
+
+
+def enable_large_repo_mode(working_dir: str = ".") -> Dict:
+    """
+    为仓库开启 untrackedCache 与 fsmonitor（写入仓库本地配置）
+
+    Returns:
+        {"success": bool, "enabled": [str], "skipped": {str: str}, "error": str}
+    """
+    status = detect_large_repo(working_dir)
+    if not status.is_repo:
+        return {"success": False, "enabled": [], "skipped": {}, "error": "当前目录不是Git仓库"}
+
+    enabled, skipped = [], {}
+    if not status.untracked_cache:
+        # 文件系统不能可靠更新目录 mtime 时 untrackedCache 会漏报
+        check = _run_git(["update-index", "--test-untracked-cache"], working_dir, timeout=60)
+        if check.returncode == 0:
+            _run_git(["config", "core.untrackedCache", "true"], working_dir)
+            enabled.append("core.untrackedCache")
+        else:
+            skipped["core.untrackedCache"] = "文件系统不支持目录 mtime 检测"
+    if not status.fsmonitor:
+        if fsmonitor_supported(working_dir):
+            _run_git(["config", "core.fsmonitor", "true"], working_dir)
+            enabled.append("core.fsmonitor")
+        else:
+            skipped["core.fsmonitor"] = "当前平台的 git 不支持内置 fsmonitor"
+    return {"success": True, "enabled": enabled, "skipped": skipped, "error": ""}
@@ -0,0 +1,101 @@
+"""
+Git 完整工作流流水线辅助模块
+在 git pull 的网络传输期间提前完成与网络无关的工作：
+
+- 在临时 index 上执行 `git add .`，得到“暂存后”的快照（不改动真实 index 与工作区），
+  据此提前生成 commit 消息
+- pull 完成并真正暂存后，比较两次暂存的树：只有 pull 改动了已暂存文件时才需要重新生成
+- 提前确定推送分支，commit 之后不必为取分支名重新采集快照
+
+使用: from src.tools.git_pipeline import preview_staged_changes, preview_is_current, prepare_push
+"""
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.tools.git_snapshot import GitSnapshot, _run_git, collect_git_snapshot
+
+
+@dataclass
+class StagedPreview:
+    """预演 `git add .` 后的暂存状态"""
+    tree: str
+    snapshot: GitSnapshot
+    staged_paths: List[str] = field(default_factory=list)
+
+
+def _index_path(working_dir: str) -> str:
+    """真实 index 文件路径"""
+    result = _run_git(["rev-parse", "--git-path", "index"], working_dir)
+    if result.returncode != 0:
+        raise RuntimeError("当前目录不是Git仓库")
+    return os.path.join(working_dir, result.stdout.strip())
+
+
+def write_index_tree(working_dir: str = ".", env: Optional[Dict[str, str]] = None) -> str:
+    """把 index 写成树对象并返回树哈希（未合并时返回空字符串）"""
+    result = _run_git(["write-tree"], working_dir, env=env)
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+
+def preview_staged_changes(working_dir: str = ".") -> Optional[StagedPreview]:
+    """
+    在临时 index 上预演 `git add .`，返回暂存后的快照
+
+    Returns:
+        StagedPreview；不是 Git 仓库或预演失败时返回 None
+    """
+    index = _index_path(working_dir)
+    fd, tmp_index = tempfile.mkstemp(prefix="dnm_index.")
+    os.close(fd)
+    try:
+        if os.path.exists(index):
+            shutil.copyfile(index, tmp_index)
+        else:
+            # 空 index：git 不接受长度为 0 的 index 文件
+            os.remove(tmp_index)
+        env = {"GIT_INDEX_FILE": tmp_index}
+        if _run_git(["add", "."], working_dir, timeout=30, env=env).returncode != 0:
+            return None
+        tree = write_index_tree(working_dir, env)
+        if not tree:
+            return None
+        # `git add .` 之后只剩被忽略的文件未跟踪，无需扫描
+        snapshot = collect_git_snapshot(working_dir, env=env, untracked=False)
+        if not snapshot.is_repo:
+            return None
+        return StagedPreview(tree=tree, snapshot=snapshot, staged_paths=snapshot.staged_files)
+    finally:
+        for path in (tmp_index, tmp_index + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def preview_is_current(preview: StagedPreview, staged_paths: List[str], working_dir: str = ".") -> bool:
+    """
+    真正暂存后，判断预演生成的 commit 消息是否仍然适用
+
+    暂存文件集合不变、且这些文件在两棵树之间没有差异时适用；
+    pull 只改动了其他文件（HEAD 前进但暂存内容不变）不影响 commit 消息。
+    """
+    if set(staged_paths) != set(preview.staged_paths):
+        return False
+    tree = write_index_tree(working_dir)
+    if not tree:
+        return False
+    if tree == preview.tree:
+        return True
+    result = _run_git(["diff", "--name-only", "-z", preview.tree, tree], working_dir)
+    if result.returncode != 0:
+        return False
+    changed = {p for p in result.stdout.split("\0") if p}
+    return not changed & set(staged_paths)
+
+
+def prepare_push(working_dir: str = ".") -> str:
+    """提前确定推送分支（分离头指针时返回空字符串）"""
+    result = _run_git(["symbolic-ref", "--quiet", "--short", "HEAD"], working_dir)
+    return result.stdout.strip() if result.returncode == 0 else ""
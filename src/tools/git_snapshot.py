@@ -0,0 +1,384 @@
+"""
+Git 快照模块
+一次性并发采集分支、状态、暂存/未暂存 diff 与最近提交，供同一轮对话中的所有节点复用
+
+状态与 numstat 均使用 -z 输出解析为结构化记录（FileChange），
+文件名中的空格、箭头、竖线等字符不会影响分类。
+
+使用: from src.tools.git_snapshot import collect_git_snapshot, GitSnapshot
+"""
+
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.core.agent_metrics import get_metrics_collector
+
+
+# 快照中保留的最近提交数量
+SNAPSHOT_RECENT_COMMITS = 5
+
+# 快照采集的命令（只读；--no-optional-locks 避免并发命令争用 index.lock）
+_SNAPSHOT_COMMANDS = {
+    "status": ["status", "--porcelain=v2", "--branch", "-z"],
+    "staged_diff": ["diff", "--cached"],
+    "staged_numstat": ["diff", "--cached", "--numstat", "-z"],
+    "unstaged_diff": ["diff"],
+    "unstaged_numstat": ["diff", "--numstat", "-z"],
+    "log": ["log", f"-{SNAPSHOT_RECENT_COMMITS}", "--oneline", "--no-decorate"],
+}
+
+
+# 变更类型
+CHANGE_ADDED = "added"
+CHANGE_MODIFIED = "modified"
+CHANGE_DELETED = "deleted"
+CHANGE_RENAMED = "renamed"
+CHANGE_COPIED = "copied"
+CHANGE_UNTRACKED = "untracked"
+CHANGE_CONFLICTED = "conflicted"
+
+# porcelain 状态码 -> 变更类型（T 为文件类型变化，按修改处理）
+_STATUS_CODES = {
+    "A": CHANGE_ADDED,
+    "M": CHANGE_MODIFIED,
+    "T": CHANGE_MODIFIED,
+    "D": CHANGE_DELETED,
+    "R": CHANGE_RENAMED,
+    "C": CHANGE_COPIED,
+}
+
+# 第三方/生成代码目录与文件后缀：其 diff 对理解变更意图没有帮助，不发送给 LLM
+VENDORED_DIRS = ("vendor", "vendors", "node_modules", "third_party", "thirdparty", "bower_components")
+VENDORED_SUFFIXES = (".min.js", ".min.css", ".map")
+
+
+def is_vendored_path(path: str) -> bool:
+    """路径是否位于第三方代码目录或为压缩产物"""
+    parts = path.split("/")
+    return any(p in VENDORED_DIRS for p in parts[:-1]) or path.endswith(VENDORED_SUFFIXES)
+
+
+@dataclass
+class StatusEntry:
+    """porcelain v2 状态条目"""
+    xy: str                 # 两位状态码，"." 表示未变更（未跟踪为 "??"）
+    path: str
+    orig_path: str = ""     # 重命名/复制的原路径
+    conflicted: bool = False
+
+    @property
+    def short_line(self) -> str:
+        """转换为 `git status --short` 格式的行"""
+        xy = self.xy.replace(".", " ")
+        if self.orig_path:
+            return f"{xy} {self.orig_path} -> {self.path}"
+        return f"{xy} {self.path}"
+
+
+@dataclass
+class NumstatEntry:
+    """diff --numstat 条目（二进制文件的增删行数为 None）"""
+    added: Optional[int]
+    deleted: Optional[int]
+    path: str
+    orig_path: str = ""
+
+
+@dataclass
+class FileChange:
+    """单个文件的变更记录（合并 status 与 numstat）"""
+    path: str
+    kind: str                           # CHANGE_* 之一
+    orig_path: str = ""
+    staged: bool = False                # 暂存区有变更
+    unstaged: bool = False              # 工作区有未暂存变更
+    lines_added: Optional[int] = None   # 二进制或未跟踪文件为 None
+    lines_removed: Optional[int] = None
+    binary: bool = False
+
+    @property
+    def vendored(self) -> bool:
+        """是否为第三方/生成的代码"""
+        return is_vendored_path(self.path)
+
+    @property
+    def display_path(self) -> str:
+        """显示用路径（重命名显示为 旧 -> 新）"""
+        return f"{self.orig_path} -> {self.path}" if self.orig_path else self.path
+
+    @property
+    def label(self) -> str:
+        """带增删行数的显示文本"""
+        if self.binary:
+            return f"{self.display_path} (二进制)"
+        if self.lines_added is None:
+            return self.display_path
+        return f"{self.display_path} (+{self.lines_added}/-{self.lines_removed})"
+
+
+@dataclass
+class GitSnapshot:
+    """一次 Git 仓库状态快照"""
+    working_dir: str
+    is_repo: bool = False
+    branch: str = ""
+    upstream: str = ""
+    ahead: int = 0
+    behind: int = 0
+    status_entries: List[StatusEntry] = field(default_factory=list)
+    staged_diff: str = ""
+    unstaged_diff: str = ""
+    staged_numstat: List[NumstatEntry] = field(default_factory=list)
+    unstaged_numstat: List[NumstatEntry] = field(default_factory=list)
+    recent_commits: List[str] = field(default_factory=list)
+    error: str = ""
+    collected_at: float = 0.0
+    duration_ms: float = 0.0
+    # 是否扫描了未跟踪文件（--untracked-files=no 时为 False）
+    untracked_scanned: bool = True
+
+    @property
+    def has_changes(self) -> bool:
+        """工作区或暂存区是否有变更（含未跟踪文件）"""
+        return bool(self.status_entries)
+
+    @property
+    def status_short(self) -> str:
+        """`git status --short` 格式的状态文本"""
+        return "\n".join(entry.short_line for entry in self.status_entries)
+
+    @property
+    def changes(self) -> List[FileChange]:
+        """所有变更文件的结构化记录（含未跟踪文件）"""
+        return build_changes(self.status_entries, self.staged_numstat, self.unstaged_numstat)
+
+    @property
+    def staged_files(self) -> List[str]:
+        """已暂存的变更文件"""
+        return [entry.path for entry in self.staged_numstat]
+
+    @property
+    def unstaged_files(self) -> List[str]:
+        """未暂存的变更文件（不含未跟踪文件）"""
+        return [entry.path for entry in self.unstaged_numstat]
+
+
+def _split_z(raw: str) -> List[str]:
+    """按 NUL 拆分 -z 输出（去掉末尾空段）"""
+    parts = raw.split("\0")
+    if parts and parts[-1] == "":
+        parts.pop()
+    return parts
+
+
+def parse_status_v2(raw: str) -> Tuple[Dict[str, str], List[StatusEntry]]:
+    """
+    解析 `git status --porcelain=v2 --branch -z` 输出
+
+    Returns:
+        (分支头信息 {"branch.head": ..., "branch.upstream": ..., "branch.ab": ...}, 状态条目)
+    """
+    headers: Dict[str, str] = {}
+    entries: List[StatusEntry] = []
+    parts = _split_z(raw)
+    i = 0
+    while i < len(parts):
+        record = parts[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            key, _, value = record[2:].partition(" ")
+            headers[key] = value
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            fields = record.split(" ", 8)
+            entries.append(StatusEntry(xy=fields[1], path=fields[8]))
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path\0origPath
+            fields = record.split(" ", 9)
+            orig = parts[i] if i < len(parts) else ""
+            i += 1
+            entries.append(StatusEntry(xy=fields[1], path=fields[9], orig_path=orig))
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            fields = record.split(" ", 10)
+            entries.append(StatusEntry(xy=fields[1], path=fields[10], conflicted=True))
+        elif kind == "?":
+            entries.append(StatusEntry(xy="??", path=record[2:]))
+    return headers, entries
+
+
+def parse_numstat_z(raw: str) -> List[NumstatEntry]:
+    """
+    解析 `git diff --numstat -z` 输出
+
+    普通条目为 "added\\tdeleted\\tpath\\0"；重命名条目为 "added\\tdeleted\\t\\0old\\0new\\0"；
+    二进制文件的增删行数为 "-"。
+    """
+    entries: List[NumstatEntry] = []
+    parts = _split_z(raw)
+    i = 0
+    while i < len(parts):
+        record = parts[i]
+        i += 1
+        fields = record.split("\t", 2)
+        if len(fields) < 3:
+            continue
+        added = None if fields[0] == "-" else int(fields[0])
+        deleted = None if fields[1] == "-" else int(fields[1])
+        if fields[2]:
+            entries.append(NumstatEntry(added, deleted, fields[2]))
+        else:
+            old = parts[i] if i < len(parts) else ""
+            new = parts[i + 1] if i + 1 < len(parts) else ""
+            i += 2
+            entries.append(NumstatEntry(added, deleted, new, orig_path=old))
+    return entries
+
+
+def build_changes(status_entries: List[StatusEntry],
+                  staged_numstat: List[NumstatEntry],
+                  unstaged_numstat: List[NumstatEntry]) -> List[FileChange]:
+    """
+    合并状态条目与 numstat 为 FileChange 列表
+
+    变更类型优先取暂存区状态码（X），暂存区无变更时取工作区状态码（Y）；
+    增删行数为暂存区与工作区之和，任一侧为二进制即标记为二进制。
+    """
+    staged = {e.path: e for e in staged_numstat}
+    unstaged = {e.path: e for e in unstaged_numstat}
+    changes = []
+    for entry in status_entries:
+        x, y = entry.xy[0], entry.xy[1]
+        if entry.xy == "??":
+            kind = CHANGE_UNTRACKED
+        elif entry.conflicted:
+            kind = CHANGE_CONFLICTED
+        else:
+            kind = _STATUS_CODES.get(x if x != "." else y, CHANGE_MODIFIED)
+
+        change = FileChange(
+            path=entry.path,
+            kind=kind,
+            orig_path=entry.orig_path,
+            staged=x not in ".?",
+            unstaged=y not in ".?",
+        )
+        stats = [s for s in (staged.get(entry.path), unstaged.get(entry.path)) if s is not None]
+        if any(s.added is None for s in stats):
+            change.binary = True
+        elif stats:
+            change.lines_added = sum(s.added for s in stats)
+            change.lines_removed = sum(s.deleted for s in stats)
+        changes.append(change)
+    return changes
+
+
+def group_changes(changes: List[FileChange]) -> Dict[str, List[FileChange]]:
+    """
+    按提交消息关注的类别分组：删除 / 修改（含重命名、冲突）/ 新增（含复制、未跟踪）
+
+    Returns:
+        {"deleted": [...], "modified": [...], "added": [...]}
+    """
+    groups: Dict[str, List[FileChange]] = {"deleted": [], "modified": [], "added": []}
+    for change in changes:
+        if change.kind == CHANGE_DELETED:
+            groups["deleted"].append(change)
+        elif change.kind in (CHANGE_ADDED, CHANGE_COPIED, CHANGE_UNTRACKED):
+            groups["added"].append(change)
+        else:
+            groups["modified"].append(change)
+    return groups
+
+
+def _run_git(args: List[str], working_dir: str, timeout: int = 10,
+             env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """执行一条 git 命令（env 为追加的环境变量），耗时按子命令记录到指标收集器"""
+    with get_metrics_collector().measure_operation("git_call", args[0], repo=working_dir) as ctx:
+        result = subprocess.run(
+            ["git", "--no-optional-locks"] + args,
+            cwd=working_dir,
+            env={**os.environ, **env} if env else None,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout,
+        )
+        ctx["additional_data"]["returncode"] = result.returncode
+    return result
+
+
+def collect_git_snapshot(working_dir: str = ".", env: Optional[Dict[str, str]] = None,
+                         untracked: bool = True) -> GitSnapshot:
+    """
+    并发执行快照所需的全部 git 命令并组装结果
+
+    不单独调用 rev-parse：status 失败即视为不是 Git 仓库。
+
+    Args:
+        working_dir: Git 仓库路径
+        env: 追加的环境变量（如 GIT_INDEX_FILE 指向临时 index）
+        untracked: 是否扫描未跟踪文件（大仓库中这是 status 的主要开销，不需要时传 False）
+
+    Returns:
+        GitSnapshot
+    """
+    start = time.time()
+    snapshot = GitSnapshot(working_dir=working_dir, collected_at=start, untracked_scanned=untracked)
+    commands = dict(_SNAPSHOT_COMMANDS)
+    if not untracked:
+        commands["status"] = commands["status"] + ["--untracked-files=no"]
+
+    with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+        futures = {
+            name: executor.submit(_run_git, args, working_dir, 10, env)
+            for name, args in commands.items()
+        }
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+
+    status = results["status"]
+    if isinstance(status, Exception):
+        snapshot.error = f"获取Git状态失败: {status}"
+        snapshot.duration_ms = (time.time() - start) * 1000
+        return snapshot
+    if status.returncode != 0:
+        snapshot.error = "当前目录不是Git仓库"
+        snapshot.duration_ms = (time.time() - start) * 1000
+        return snapshot
+
+    snapshot.is_repo = True
+    headers, snapshot.status_entries = parse_status_v2(status.stdout)
+    head = headers.get("branch.head", "")
+    snapshot.branch = "" if head == "(detached)" else head
+    snapshot.upstream = headers.get("branch.upstream", "")
+    ab = headers.get("branch.ab", "").split()
+    if len(ab) == 2:
+        snapshot.ahead = int(ab[0].lstrip("+") or 0)
+        snapshot.behind = int(ab[1].lstrip("-") or 0)
+
+    def stdout_of(name: str) -> str:
+        result = results[name]
+        if isinstance(result, Exception) or result.returncode != 0:
+            return ""
+        return result.stdout
+
+    snapshot.staged_diff = stdout_of("staged_diff").strip()
+    snapshot.unstaged_diff = stdout_of("unstaged_diff").strip()
+    snapshot.staged_numstat = parse_numstat_z(stdout_of("staged_numstat"))
+    snapshot.unstaged_numstat = parse_numstat_z(stdout_of("unstaged_numstat"))
+    snapshot.recent_commits = [line for line in stdout_of("log").strip().split("\n") if line]
+    snapshot.duration_ms = (time.time() - start) * 1000
+    return snapshot
@@ -0,0 +1,289 @@
+"""
+Git 网络操作流式执行模块
+以 `--progress` 运行 git pull / push，实时解析 stderr 中的进度输出：
+
+- 进度事件（阶段、百分比、对象数、传输速率）实时显示在同一行
+- 超时按「无进度时间」计算，并随观察到的进度间隔自适应放宽，大仓库的慢速传输不会被误杀
+- Ctrl-C 时终止 git 进程并返回“已取消”，不把 KeyboardInterrupt 抛给上层
+- 以 C locale 运行 git，进度标题与错误信息不随系统语言翻译，便于解析和识别瞬时网络错误
+
+使用: from src.tools.git_stream import run_git_streaming, ProgressPrinter
+"""
+
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from src.core.agent_metrics import get_metrics_collector
+
+
+# 无任何进度输出时的基础超时（秒），与原固定超时一致
+STALL_TIMEOUT = 30
+
+# 自适应放宽后的最大无进度超时（秒）
+MAX_STALL_TIMEOUT = 300
+
+# 无进度超时 = max(STALL_TIMEOUT, 最长进度间隔 × 该倍数)
+STALL_GAP_FACTOR = 3
+
+# 单次操作的总时长上限（秒）
+MAX_DURATION = 3600
+
+# 终止进程后等待退出的时间（秒）
+_TERMINATE_GRACE = 3
+
+# "Receiving objects:  45% (450/1000), 1.20 MiB | 600.00 KiB/s" / "Resolving deltas: 100% (3/3), done."
+# 阶段名不限于英文（外部设置了 locale 的 git 进度标题也能识别）
+_PROGRESS_RE = re.compile(
+    r"^(?:remote: )?(?P<phase>[^\W\d_][^:]*?):\s+(?P<percent>\d+)% \((?P<current>\d+)/(?P<total>\d+)\)"
+    r"(?:, (?P<size>[\d.]+ [KMG]?i?B|[\d.]+ bytes))?"
+    r"(?: \| (?P<rate>[\d.]+ [KMG]?i?B/s|[\d.]+ bytes/s))?"
+    r"(?P<done>, done\.)?"
+)
+
+_UNIT_BYTES = {"bytes": 1, "B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+
+
+@dataclass
+class GitProgress:
+    """一条进度事件"""
+    phase: str
+    percent: int
+    current: int
+    total: int
+    rate: Optional[float] = None    # 字节/秒
+    done: bool = False
+    remote: bool = False
+
+    @property
+    def text(self) -> str:
+        """单行显示文本"""
+        parts = [f"{self.phase} {self.percent}% ({self.current}/{self.total})"]
+        if self.rate:
+            parts.append(format_rate(self.rate))
+        return " ".join(parts)
+
+
+@dataclass
+class GitStreamResult:
+    """流式执行结果"""
+    returncode: Optional[int]
+    stdout: str = ""
+    # stderr 中除进度行以外的内容（错误、提示、引用更新）
+    stderr: str = ""
+    timed_out: bool = False
+    cancelled: bool = False
+    duration_ms: float = 0.0
+    progress: List[GitProgress] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+
+def _to_bytes(value: str) -> float:
+    """'600.00 KiB/s' / '300 bytes' -> 字节数"""
+    number, unit = value.split(" ", 1)
+    return float(number) * _UNIT_BYTES.get(unit.replace("/s", ""), 1)
+
+
+def format_rate(rate: float) -> str:
+    """字节/秒 -> 可读速率"""
+    for unit in ("B", "KiB", "MiB"):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}/s"
+        rate /= 1024
+    return f"{rate:.1f} GiB/s"
+
+
+def parse_progress_line(line: str) -> Optional[GitProgress]:
+    """解析一行 git 进度输出（不是进度行时返回 None）"""
+    match = _PROGRESS_RE.match(line.strip())
+    if not match:
+        return None
+    rate = match.group("rate")
+    return GitProgress(
+        phase=match.group("phase"),
+        percent=int(match.group("percent")),
+        current=int(match.group("current")),
+        total=int(match.group("total")),
+        rate=_to_bytes(rate) if rate else None,
+        done=bool(match.group("done")),
+        remote=line.startswith("remote: "),
+    )
+
+
+def git_env() -> dict:
+    """运行 git 网络命令的环境变量（强制 C locale，输出不被翻译）"""
+    return {**os.environ, "LC_ALL": "C", "LANGUAGE": "C"}
+
+
+def _pump(stream, out: "queue.Queue", name: str) -> None:
+    """
+    读取管道，按 \\r / \\n 切分后放入队列
+
+    git 用 \\r 原地刷新进度，队列项为 (流名, 文本, 是否以 \\r 结尾)；流结束时文本为 None。
+    """
+    buffer = b""
+    while True:
+        chunk = stream.read1(4096) if hasattr(stream, "read1") else stream.read(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        parts = re.split(rb"([\r\n])", buffer)
+        buffer = parts.pop()
+        for text, sep in zip(parts[::2], parts[1::2]):
+            out.put((name, text.decode("utf-8", errors="replace"), sep == b"\r"))
+    if buffer:
+        out.put((name, buffer.decode("utf-8", errors="replace"), False))
+    out.put((name, None, False))
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    """终止 git 进程（先 terminate，超时再 kill）"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=_TERMINATE_GRACE)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_git_streaming(args: List[str], working_dir: str = ".",
+                      on_progress: Optional[Callable[[GitProgress], None]] = None,
+                      stall_timeout: float = STALL_TIMEOUT,
+                      max_duration: float = MAX_DURATION) -> GitStreamResult:
+    """
+    流式执行 git 网络命令
+
+    Args:
+        args: git 参数（如 ["pull", "--progress"]）
+        working_dir: 仓库路径
+        on_progress: 进度回调
+        stall_timeout: 基础无进度超时（秒）
+        max_duration: 总时长上限（秒）
+
+    Returns:
+        GitStreamResult
+    """
+    with get_metrics_collector().measure_operation("git_call", args[0], repo=working_dir) as ctx:
+        result = _run_streaming(args, working_dir, on_progress, stall_timeout, max_duration)
+        ctx["additional_data"].update(
+            returncode=result.returncode, timed_out=result.timed_out, cancelled=result.cancelled
+        )
+    return result
+
+
+def _run_streaming(args: List[str], working_dir: str,
+                   on_progress: Optional[Callable[[GitProgress], None]],
+                   stall_timeout: float, max_duration: float) -> GitStreamResult:
+    """run_git_streaming 的实现"""
+    start = time.time()
+    process = subprocess.Popen(
+        ["git"] + args,
+        cwd=working_dir,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=git_env(),
+    )
+    lines: "queue.Queue" = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, lines, "stdout"), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, lines, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    result = GitStreamResult(returncode=None)
+    stdout_lines: List[str] = []
+    stderr_lines: List[str] = []
+    open_streams = 2
+    last_activity = start
+    longest_gap = 0.0
+    try:
+        while open_streams:
+            try:
+                name, line, redraw = lines.get(timeout=0.2)
+            except queue.Empty:
+                now = time.time()
+                # 无进度超时随最长进度间隔放宽（慢速链路上进度本身就更新得慢）
+                limit = min(MAX_STALL_TIMEOUT, max(stall_timeout, longest_gap * STALL_GAP_FACTOR))
+                if now - last_activity > limit or now - start > max_duration:
+                    result.timed_out = True
+                    _terminate(process)
+                    break
+                continue
+
+            if line is None:
+                open_streams -= 1
+                continue
+            now = time.time()
+            longest_gap = max(longest_gap, now - last_activity)
+            last_activity = now
+            if name == "stdout":
+                stdout_lines.append(line)
+                continue
+            progress = parse_progress_line(line)
+            if progress is None:
+                # \r 结尾的是会被下一帧覆盖的进度刷新（如无总数的计数），不计入 stderr
+                if line.strip() and not redraw:
+                    stderr_lines.append(line)
+                continue
+            result.progress.append(progress)
+            if on_progress is not None:
+                on_progress(progress)
+    except KeyboardInterrupt:
+        result.cancelled = True
+        _terminate(process)
+
+    if not result.timed_out and not result.cancelled:
+        process.wait()
+    result.returncode = process.returncode
+    result.stdout = "\n".join(stdout_lines).strip()
+    result.stderr = "\n".join(stderr_lines).strip()
+    result.duration_ms = (time.time() - start) * 1000
+    return result
+
+
+class ProgressPrinter:
+    """在终端同一行实时刷新进度（非终端时不输出）"""
+
+    def __init__(self, label: str, min_interval: float = 0.1):
+        """
+        Args:
+            label: 行首标签（如 "git pull"）
+            min_interval: 最小刷新间隔（秒）
+        """
+        self.label = label
+        self.min_interval = min_interval
+        self.interactive = sys.stdout.isatty()
+        self._last_print = 0.0
+        self._width = 0
+
+    def __call__(self, progress: GitProgress) -> None:
+        if not self.interactive:
+            return
+        now = time.time()
+        if not progress.done and now - self._last_print < self.min_interval:
+            return
+        self._last_print = now
+        text = f"[{self.label}] {'远端 ' if progress.remote else ''}{progress.text}"
+        sys.stdout.write("\r" + text.ljust(self._width))
+        sys.stdout.flush()
+        self._width = len(text)
+
+    def finish(self) -> None:
+        """结束进度行"""
+        if self.interactive and self._width:
+            sys.stdout.write("\r" + " " * self._width + "\r")
+            sys.stdout.flush()
+            self._width = 0
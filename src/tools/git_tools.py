@@ -1,15 +1,49 @@
 """
 Git工具模块
 提供Git相关功能，如生成commit消息等
+
+只读查询（状态、diff、分支、最近提交）统一来自 GitSnapshot：
+每轮对话只采集一次，同一轮内的各节点共享。
 """
 
 import subprocess
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.core.agent_config import GIT_LARGE_REPO_AUTO_ENABLE
+from src.core.agent_resilience import RetryPolicy, get_retry_budget
+from src.core.logger import get_request_id
+from src.tools.commit_index import get_commit_index
+from src.tools.git_large_repo import LargeRepoStatus, detect_large_repo, enable_large_repo_mode
+from src.tools.git_snapshot import SNAPSHOT_RECENT_COMMITS, FileChange, GitSnapshot, collect_git_snapshot
+from src.tools.git_stream import GitStreamResult, ProgressPrinter, run_git_streaming
+
+
+# 可重试的瞬时网络错误（匹配 git 输出，小写）
+# 网络命令经 run_git_streaming 以 C locale 运行，这些英文信息不会被翻译
+TRANSIENT_NETWORK_ERRORS = (
+    "could not resolve host",
+    "connection reset",
+    "connection refused",
+    "connection timed out",
+    "operation timed out",
+    "the remote end hung up unexpectedly",
+    "early eof",
+    "rpc failed",
+    "http 502",
+    "http 503",
+    "http 504",
+    "temporary failure in name resolution",
+)
 
 
 class GitTools:
     """Git操作工具类"""
 
+    # 网络命令（pull / push）遇到瞬时网络错误时的重试策略
+    NETWORK_RETRY_POLICY = RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=10.0)
+
     def __init__(self, working_dir: str = "."):
         """
         初始化Git工具
@@ -18,9 +52,73 @@ class GitTools:
             working_dir: Git仓库路径
         """
         self.working_dir = working_dir
+        # (请求ID, 快照)：仅在同一轮对话内复用
+        self._snapshot: Optional[Tuple[str, GitSnapshot]] = None
+        self._snapshot_lock = threading.Lock()
+        # 大仓库检测结果（每个实例只检测一次）
+        self._large_repo: Optional[LargeRepoStatus] = None
+
+    def large_repo_status(self) -> LargeRepoStatus:
+        """
+        检测仓库规模与 fsmonitor / untrackedCache 配置（每个实例只检测一次）
+
+        大仓库未开启加速配置时：配置了 git.large_repo_auto_enable 则自动开启，否则提示一次。
+        """
+        if self._large_repo is not None:
+            return self._large_repo
+        status = detect_large_repo(self.working_dir)
+        self._large_repo = status
+        if status.is_large and not status.optimized:
+            if GIT_LARGE_REPO_AUTO_ENABLE:
+                result = enable_large_repo_mode(self.working_dir)
+                if result["enabled"]:
+                    print(f"[Git] ⚡ 大仓库模式: 已开启 {', '.join(result['enabled'])}")
+                self._large_repo = detect_large_repo(self.working_dir)
+            else:
+                print(
+                    f"[Git] 💡 仓库较大（约 {status.estimated_files:,} 个文件），"
+                    f"可在配置中设置 git.large_repo_auto_enable 开启 fsmonitor/untrackedCache 加速 git status"
+                )
+        return self._large_repo
+
+    def get_snapshot(self, refresh: bool = False, untracked: bool = True) -> GitSnapshot:
+        """
+        获取仓库快照（同一轮对话内复用，按请求ID DNM_REQ_ID 失效）
+
+        Args:
+            refresh: 是否强制重新采集
+            untracked: 是否需要未跟踪文件（不需要时用 --untracked-files=no 跳过扫描；
+                已缓存的完整快照同样可以复用）
+
+        Returns:
+            GitSnapshot
+        """
+        req_id = get_request_id()
+        with self._snapshot_lock:
+            cached = self._snapshot
+            if (not refresh and cached is not None and req_id != "-" and cached[0] == req_id
+                    and (cached[1].untracked_scanned or not untracked)):
+                return cached[1]
+
+        self.large_repo_status()
+        snapshot = collect_git_snapshot(self.working_dir, untracked=untracked)
+        if req_id != "-":
+            with self._snapshot_lock:
+                self._snapshot = (req_id, snapshot)
+        return snapshot
+
+    def invalidate_snapshot(self) -> None:
+        """使缓存的快照失效（git add/commit/pull/push 等修改仓库状态后调用）"""
+        with self._snapshot_lock:
+            self._snapshot = None
 
     def check_git_repo(self) -> bool:
         """检查当前目录是否是Git仓库"""
+        req_id = get_request_id()
+        with self._snapshot_lock:
+            cached = self._snapshot
+        if cached is not None and req_id != "-" and cached[0] == req_id:
+            return cached[1].is_repo
         try:
             result = subprocess.run(
                 ["git", "rev-parse", "--git-dir"],
@@ -47,39 +145,20 @@ class GitTools:
                 "error": str
             }
         """
-        if not self.check_git_repo():
+        snapshot = self.get_snapshot()
+        if not snapshot.is_repo:
             return {
                 "success": False,
-                "error": "当前目录不是Git仓库",
+                "error": snapshot.error,
                 "has_changes": False,
             }
 
-        try:
-            result = subprocess.run(
-                ["git", "status", "--short"],
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=5,
-            )
-
-            status_output = result.stdout.strip()
-            has_changes = len(status_output) > 0
-
-            return {
-                "success": True,
-                "status": status_output if status_output else "工作区干净",
-                "has_changes": has_changes,
-            }
-
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"获取Git状态失败: {str(e)}",
-                "has_changes": False,
-            }
+        status_output = snapshot.status_short
+        return {
+            "success": True,
+            "status": status_output if status_output else "工作区干净",
+            "has_changes": snapshot.has_changes,
+        }
 
     def get_git_diff(self, staged: bool = False) -> Dict:
         """
@@ -97,67 +176,25 @@ class GitTools:
                 "error": str
             }
         """
-        if not self.check_git_repo():
+        snapshot = self.get_snapshot()
+        if not snapshot.is_repo:
             return {
                 "success": False,
-                "error": "当前目录不是Git仓库",
+                "error": snapshot.error,
                 "has_diff": False,
                 "diff": "",
                 "files_changed": [],
             }
 
-        try:
-            # 获取diff
-            cmd = ["git", "diff"]
-            if staged:
-                cmd.append("--cached")
-
-            result = subprocess.run(
-                cmd, cwd=self.working_dir, capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10
-            )
-
-            diff_output = result.stdout.strip()
-            has_diff = len(diff_output) > 0
-
-            # 获取变更文件列表
-            stat_cmd = ["git", "diff", "--stat"]
-            if staged:
-                stat_cmd.append("--cached")
-
-            stat_result = subprocess.run(
-                stat_cmd,
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=5,
-            )
-
-            # 解析变更的文件
-            files_changed = []
-            if stat_result.stdout:
-                for line in stat_result.stdout.split("\n"):
-                    if "|" in line:
-                        filename = line.split("|")[0].strip()
-                        files_changed.append(filename)
-
-            return {
-                "success": True,
-                "diff": diff_output,
-                "has_diff": has_diff,
-                "files_changed": files_changed,
-                "type": "staged" if staged else "unstaged",
-            }
-
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"获取Git diff失败: {str(e)}",
-                "has_diff": False,
-                "diff": "",
-                "files_changed": [],
-            }
+        diff_output = snapshot.staged_diff if staged else snapshot.unstaged_diff
+        files_changed = snapshot.staged_files if staged else snapshot.unstaged_files
+        return {
+            "success": True,
+            "diff": diff_output,
+            "has_diff": len(diff_output) > 0,
+            "files_changed": files_changed,
+            "type": "staged" if staged else "unstaged",
+        }
 
     def get_recent_commits(self, count: int = 5) -> Dict:
         """
@@ -173,28 +210,19 @@ class GitTools:
                 "error": str
             }
         """
-        if not self.check_git_repo():
-            return {"success": False, "error": "当前目录不是Git仓库", "commits": []}
+        snapshot = self.get_snapshot()
+        if not snapshot.is_repo:
+            return {"success": False, "error": snapshot.error, "commits": []}
 
-        try:
-            result = subprocess.run(
-                ["git", "log", f"-{count}", "--oneline", "--no-decorate"],
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=5,
-            )
-
-            commits = []
-            if result.stdout:
-                for line in result.stdout.strip().split("\n"):
-                    if line:
-                        commits.append(line)
-
-            return {"success": True, "commits": commits}
+        if count <= SNAPSHOT_RECENT_COMMITS:
+            return {"success": True, "commits": snapshot.recent_commits[:count]}
 
+        # 超出快照范围时查提交索引（增量更新，不再每次解析 git log）
+        index, error = get_commit_index(self.working_dir)
+        if index is None:
+            return {"success": False, "error": error, "commits": []}
+        try:
+            return {"success": True, "commits": [c.oneline for c in index.recent(count)]}
         except Exception as e:
             return {
                 "success": False,
@@ -204,7 +232,7 @@ class GitTools:
 
     def get_current_branch(self) -> Dict:
         """
-        获取当前分支名称
+        获取当前分支名称（分离头指针时为空字符串）
         
         Returns:
             {
@@ -213,39 +241,17 @@ class GitTools:
                 "error": str
             }
         """
-        if not self.check_git_repo():
-            return {"success": False, "error": "当前目录不是Git仓库", "branch": ""}
-        
-        try:
-            result = subprocess.run(
-                ["git", "branch", "--show-current"],
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=5,
-            )
-            
-            if result.returncode == 0:
-                branch = result.stdout.strip()
-                return {"success": True, "branch": branch, "error": ""}
-            else:
-                return {
-                    "success": False,
-                    "error": f"获取分支失败: {result.stderr}",
-                    "branch": ""
-                }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"获取分支失败: {str(e)}",
-                "branch": ""
-            }
+        snapshot = self.get_snapshot()
+        if not snapshot.is_repo:
+            return {"success": False, "error": snapshot.error, "branch": ""}
+        return {"success": True, "branch": snapshot.branch, "error": ""}
     
-    def git_pull(self) -> Dict:
+    def git_pull(self, show_progress: bool = True) -> Dict:
         """
-        执行 git pull
+        执行 git pull（流式读取进度，Ctrl-C 可取消）
+        
+        Args:
+            show_progress: 是否在终端实时显示进度
         
         Returns:
             {
@@ -263,20 +269,13 @@ class GitTools:
                 "has_updates": False
             }
         
+        self.invalidate_snapshot()
         try:
-            result = subprocess.run(
-                ["git", "pull"],
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=30,
-            )
+            result = self._run_network(["pull", "--progress"], "git pull", show_progress)
             
-            output = result.stdout.strip()
+            output = result.stdout
             
-            if result.returncode == 0:
+            if result.success:
                 # 判断是否有更新
                 has_updates = "Already up to date" not in output and "已经是最新" not in output
                 
@@ -293,20 +292,12 @@ class GitTools:
                     "error": ""
                 }
             else:
-                error = result.stderr.strip() if result.stderr else output
                 return {
                     "success": False,
-                    "error": f"git pull 失败: {error}",
+                    "error": self._network_error("git pull", result, "可能需要解决冲突或网络问题"),
                     "message": "",
                     "has_updates": False
                 }
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "error": "git pull 超时（可能需要解决冲突或网络问题）",
-                "message": "",
-                "has_updates": False
-            }
         except Exception as e:
             return {
                 "success": False,
@@ -314,13 +305,17 @@ class GitTools:
                 "message": "",
                 "has_updates": False
             }
+        finally:
+            # 网络操作期间（含重试与取消）仓库状态可能已变化，结束后再次失效快照
+            self.invalidate_snapshot()
     
-    def git_push(self, branch: Optional[str] = None) -> Dict:
+    def git_push(self, branch: Optional[str] = None, show_progress: bool = True) -> Dict:
         """
-        执行 git push
+        执行 git push（流式读取进度，Ctrl-C 可取消）
         
         Args:
             branch: 分支名称，如果为None则自动获取当前分支
+            show_progress: 是否在终端实时显示进度
         
         Returns:
             {
@@ -358,21 +353,14 @@ class GitTools:
                 "branch": ""
             }
         
+        self.invalidate_snapshot()
         try:
             # 执行 git push origin <branch>
-            result = subprocess.run(
-                ["git", "push", "origin", branch],
-                cwd=self.working_dir,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=30,
-            )
+            result = self._run_network(["push", "--progress", "origin", branch], "git push", show_progress)
             
-            output = result.stdout.strip() + result.stderr.strip()
+            output = result.stdout + result.stderr
             
-            if result.returncode == 0:
+            if result.success:
                 message = f"✅ 已推送到远程分支 origin/{branch}"
                 return {
                     "success": True,
@@ -383,42 +371,29 @@ class GitTools:
                 }
             else:
                 # 检查是否是因为没有远程分支
-                if "no upstream branch" in output or "has no upstream branch" in output:
+                if result.returncode and ("no upstream branch" in output or "has no upstream branch" in output):
                     # 尝试设置上游分支并推送
-                    result2 = subprocess.run(
-                        ["git", "push", "--set-upstream", "origin", branch],
-                        cwd=self.working_dir,
-                        capture_output=True,
-                        text=True,
-                        encoding='utf-8',
-                        errors='replace',
-                        timeout=30,
+                    result2 = self._run_network(
+                        ["push", "--progress", "--set-upstream", "origin", branch], "git push", show_progress
                     )
                     
-                    if result2.returncode == 0:
+                    if result2.success:
                         message = f"✅ 已创建并推送到远程分支 origin/{branch}"
                         return {
                             "success": True,
                             "message": message,
                             "branch": branch,
-                            "output": result2.stdout.strip(),
+                            "output": result2.stdout + result2.stderr,
                             "error": ""
                         }
+                    result = result2
                 
-                error = result.stderr.strip() if result.stderr else output
                 return {
                     "success": False,
-                    "error": f"git push 失败: {error}",
+                    "error": self._network_error("git push", result, "可能是网络问题"),
                     "message": "",
                     "branch": branch
                 }
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "error": "git push 超时（可能是网络问题）",
-                "message": "",
-                "branch": branch
-            }
         except Exception as e:
             return {
                 "success": False,
@@ -426,10 +401,67 @@ class GitTools:
                 "message": "",
                 "branch": branch
             }
+        finally:
+            # 网络操作期间（含重试与取消）仓库状态可能已变化，结束后再次失效快照
+            self.invalidate_snapshot()
+
+    def _run_network(self, args: List[str], label: str, show_progress: bool) -> GitStreamResult:
+        """
+        流式执行 git 网络命令，show_progress 时在终端实时显示进度
+
+        遇到连接重置、DNS 解析失败等瞬时网络错误时按 NETWORK_RETRY_POLICY 退避重试，
+        每次重试需通过进程级重试预算；取消、无进度超时与其他 git 错误不重试。
+        """
+        budget = get_retry_budget()
+        budget.record_request("git_network")
+        delay = 0.0
+        attempt = 0
+        while True:
+            printer = ProgressPrinter(label) if show_progress else None
+            try:
+                result = run_git_streaming(args, self.working_dir, on_progress=printer)
+            finally:
+                if printer is not None:
+                    printer.finish()
+            if (result.success or not self._is_transient_network_error(result)
+                    or attempt >= self.NETWORK_RETRY_POLICY.max_attempts
+                    or not budget.try_acquire("git_network")):
+                return result
+            attempt += 1
+            delay = self.NETWORK_RETRY_POLICY.next_delay(delay)
+            print(f"🔄 {label} 网络错误，{delay:.1f}s 后重试 (第 {attempt} 次)")
+            time.sleep(delay)
+
+    @staticmethod
+    def _is_transient_network_error(result: GitStreamResult) -> bool:
+        """git 网络命令的失败是否为可重试的瞬时网络错误"""
+        if result.cancelled or result.timed_out:
+            return False
+        output = f"{result.stderr}\n{result.stdout}".lower()
+        return any(marker in output for marker in TRANSIENT_NETWORK_ERRORS)
+
+    @staticmethod
+    def _network_error(label: str, result: GitStreamResult, timeout_hint: str) -> str:
+        """网络命令失败时的错误信息（区分取消、超时与 git 报错）"""
+        if result.cancelled:
+            return f"{label} 已取消"
+        if result.timed_out:
+            return f"{label} 超时（长时间无进度，{timeout_hint}）"
+        return f"{label} 失败: {result.stderr or result.stdout}"
+
+    def analyze_changes(self, untracked: bool = True) -> Dict:
+        """
+        分析当前的变更，返回详细信息供LLM生成commit消息（基于本轮快照）
+
+        Args:
+            untracked: 是否包含未跟踪文件
+        """
+        return self.analyze_snapshot(self.get_snapshot(untracked=untracked))
 
-    def analyze_changes(self) -> Dict:
+    @staticmethod
+    def analyze_snapshot(snapshot: GitSnapshot) -> Dict:
         """
-        分析当前的变更，返回详细信息供LLM生成commit消息
+        分析快照中的变更，返回详细信息供LLM生成commit消息
 
         Returns:
             {
@@ -438,64 +470,44 @@ class GitTools:
                 "unstaged_diff": str,
                 "staged_diff": str,
                 "files_changed": list,
+                "changes": List[FileChange],
                 "recent_commits": list,
                 "summary": str,
                 "error": str
             }
         """
-        # 检查是否是Git仓库
-        if not self.check_git_repo():
-            return {"success": False, "error": "❌ 当前目录不是Git仓库"}
-
-        # 获取状态
-        status_result = self.get_git_status()
-        if not status_result["success"]:
-            return status_result
+        if not snapshot.is_repo:
+            return {"success": False, "error": f"❌ {snapshot.error}"}
 
         # 如果没有变更
-        if not status_result["has_changes"]:
+        if not snapshot.has_changes:
             return {"success": False, "error": "⚠️ 工作区没有变更，无需生成commit消息"}
 
-        # 获取unstaged diff
-        unstaged_diff = self.get_git_diff(staged=False)
-
-        # 获取staged diff
-        staged_diff = self.get_git_diff(staged=True)
-
-        # 获取最近的commits（用于参考风格）
-        recent_commits = self.get_recent_commits(5)
-
-        # 合并文件列表
-        all_files = list(
-            set(
-                unstaged_diff.get("files_changed", [])
-                + staged_diff.get("files_changed", [])
-            )
-        )
+        staged_files = snapshot.staged_files
+        unstaged_files = snapshot.unstaged_files
+        all_files = list(dict.fromkeys(staged_files + unstaged_files))
 
         # 生成摘要
         summary_parts = []
-        if staged_diff.get("has_diff"):
-            summary_parts.append(
-                f"已暂存 {len(staged_diff.get('files_changed', []))} 个文件"
-            )
-        if unstaged_diff.get("has_diff"):
-            summary_parts.append(
-                f"未暂存 {len(unstaged_diff.get('files_changed', []))} 个文件"
-            )
+        if snapshot.staged_diff:
+            summary_parts.append(f"已暂存 {len(staged_files)} 个文件")
+        if snapshot.unstaged_diff:
+            summary_parts.append(f"未暂存 {len(unstaged_files)} 个文件")
 
         summary = "、".join(summary_parts) if summary_parts else "有变更"
 
         return {
             "success": True,
-            "status": status_result["status"],
-            "unstaged_diff": unstaged_diff.get("diff", ""),
-            "staged_diff": staged_diff.get("diff", ""),
+            "status": snapshot.status_short,
+            "branch": snapshot.branch,
+            "unstaged_diff": snapshot.unstaged_diff,
+            "staged_diff": snapshot.staged_diff,
             "files_changed": all_files,
-            "recent_commits": recent_commits.get("commits", []),
+            "changes": snapshot.changes,
+            "recent_commits": snapshot.recent_commits,
             "summary": summary,
-            "has_staged": staged_diff.get("has_diff", False),
-            "has_unstaged": unstaged_diff.get("has_diff", False),
+            "has_staged": bool(snapshot.staged_diff),
+            "has_unstaged": bool(snapshot.unstaged_diff),
         }
 
 
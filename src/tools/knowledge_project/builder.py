@@ -19,6 +19,8 @@ import hashlib
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
+from src.core.file_cache import file_read_cache
+
 
 DEFAULT_INCLUDE = (".md", ".py", ".json")
 DEFAULT_EXCLUDE_DIRS = {".git", "node_modules", "__pycache__", ".venv", ".idea", ".cursor", ".claude"}
@@ -53,11 +55,12 @@ def list_files(work_dir: str, include_suffix: Tuple[str, ...] = DEFAULT_INCLUDE)
 
 
 def _read_text(path: Path) -> str:
+    # 经由进程级读取缓存，与 @ 引用/fs_read 共享已解码文本
     try:
-        return path.read_text(encoding="utf-8", errors="ignore")
+        return file_read_cache.read_text(str(path), encoding="utf-8", errors="ignore")
     except Exception:
         try:
-            return path.read_text(encoding="latin-1", errors="ignore")
+            return file_read_cache.read_text(str(path), encoding="latin-1", errors="ignore")
         except Exception:
             return ""
 
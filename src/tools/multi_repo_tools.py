@@ -0,0 +1,280 @@
+"""
+多仓库 Git 工具
+发现根目录下的所有 Git 仓库，并用有界线程池并发执行 status / pull / push / 生成 commit 消息，
+逐个仓库报告进度，最后汇总结果
+
+使用: from src.tools.multi_repo_tools import discover_git_repos, run_multi_repo
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple
+
+from langchain_core.tools import Tool
+from src.tools.git_tools import GitTools
+from src.tools.git_commit_tools import generate_commit_message_tool_func
+
+
+# 默认并发数（网络操作受远端限制，不宜过大）
+DEFAULT_MAX_WORKERS = 4
+
+# 默认搜索深度
+DEFAULT_MAX_DEPTH = 3
+
+# 搜索时跳过的目录
+_SKIP_DIRS = {
+    "node_modules", "__pycache__", ".venv", "venv", "env", ".tox", "dist", "build",
+    "target", ".idea", ".vscode", ".mypy_cache", ".pytest_cache",
+}
+
+
+def _list_submodules(repo: str) -> List[str]:
+    """读取 .gitmodules，返回已检出的子模块路径（包括嵌套子模块）"""
+    try:
+        with open(os.path.join(repo, ".gitmodules"), "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return []
+    submodules = []
+    for match in re.finditer(r"^\s*path\s*=\s*(.+?)\s*$", text, re.MULTILINE):
+        path = os.path.normpath(os.path.join(repo, match.group(1).strip('"')))
+        # 未初始化的子模块只有空目录，没有 .git
+        if os.path.exists(os.path.join(path, ".git")):
+            submodules.append(path)
+            submodules.extend(_list_submodules(path))
+    return submodules
+
+
+def discover_git_repos(root: str = ".", max_depth: int = DEFAULT_MAX_DEPTH) -> List[str]:
+    """
+    发现根目录下的 Git 仓库
+
+    找到仓库后不再深入其子目录，但会按 .gitmodules 列出其中已检出的子模块。
+
+    Args:
+        root: 搜索根目录
+        max_depth: 最大搜索深度（根目录为 0）
+
+    Returns:
+        仓库路径列表（按路径排序）
+    """
+    repos = set()
+    stack = [(os.path.abspath(root), 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        # .git 可能是目录（普通仓库）或文件（worktree/子模块）
+        if any(e.name == ".git" for e in entries):
+            repos.add(path)
+            repos.update(_list_submodules(path))
+            continue
+        if depth >= max_depth:
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name in _SKIP_DIRS:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, depth + 1))
+            except OSError:
+                continue
+    return sorted(repos)
+
+
+def _status(tools: GitTools) -> Dict:
+    """仓库状态摘要"""
+    snapshot = tools.get_snapshot(refresh=True)
+    if not snapshot.is_repo:
+        return {"success": False, "error": snapshot.error}
+    changes = snapshot.changes
+    parts = [f"🌿 {snapshot.branch or '(detached)'}"]
+    if snapshot.ahead or snapshot.behind:
+        parts.append(f"↑{snapshot.ahead} ↓{snapshot.behind}")
+    parts.append(f"{len(changes)} 个变更" if changes else "工作区干净")
+    return {
+        "success": True,
+        "message": "  ".join(parts),
+        "branch": snapshot.branch,
+        "ahead": snapshot.ahead,
+        "behind": snapshot.behind,
+        "changes": len(changes),
+    }
+
+
+def _pull(tools: GitTools) -> Dict:
+    """git pull（并发执行时不显示单行进度）"""
+    return tools.git_pull(show_progress=False)
+
+
+def _push(tools: GitTools) -> Dict:
+    """git push（推送当前分支）"""
+    return tools.git_push(show_progress=False)
+
+
+def _commit_message(tools: GitTools) -> Dict:
+    """生成 commit 消息（不提交）"""
+    result_text = generate_commit_message_tool_func("", tools=tools)
+    match = re.search(r'git commit -m "([^"]+)"', result_text)
+    if not match:
+        return {"success": False, "error": result_text.strip().lstrip("❌ ")}
+    return {"success": True, "message": match.group(1)}
+
+
+# 支持的操作 -> (显示名称, 执行函数)
+MULTI_REPO_ACTIONS: Dict[str, Tuple[str, Callable[[GitTools], Dict]]] = {
+    "status": ("状态", _status),
+    "pull": ("拉取", _pull),
+    "push": ("推送", _push),
+    "commit_message": ("生成 commit 消息", _commit_message),
+}
+
+
+def run_multi_repo(action: str, root: str = ".", max_workers: int = DEFAULT_MAX_WORKERS,
+                   max_depth: int = DEFAULT_MAX_DEPTH) -> Dict:
+    """
+    在根目录下的所有仓库上并发执行 Git 操作
+
+    Args:
+        action: 操作类型（status / pull / push / commit_message）
+        root: 搜索根目录
+        max_workers: 最大并发数
+        max_depth: 仓库搜索深度
+
+    Returns:
+        {
+            "success": bool,
+            "action": str,
+            "root": str,
+            "results": [{"repo": str, "success": bool, "message": str, "error": str, "duration_ms": float}],
+            "succeeded": int,
+            "failed": int,
+            "error": str
+        }
+    """
+    if action not in MULTI_REPO_ACTIONS:
+        return {
+            "success": False,
+            "error": f"不支持的操作: {action}（可选: {', '.join(MULTI_REPO_ACTIONS)}）",
+        }
+
+    label, func = MULTI_REPO_ACTIONS[action]
+    repos = discover_git_repos(root, max_depth)
+    if not repos:
+        return {"success": False, "action": action, "root": root, "error": f"{root} 下没有找到 Git 仓库"}
+
+    total = len(repos)
+    print(f"[多仓库] 在 {total} 个仓库上执行{label}（最多 {max_workers} 个同时进行）...")
+    root_abs = os.path.abspath(root)
+
+    def run_one(repo: str) -> Dict:
+        start = time.time()
+        try:
+            result = func(GitTools(repo))
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        return {
+            "repo": os.path.relpath(repo, root_abs),
+            "success": bool(result.get("success")),
+            "message": result.get("message", ""),
+            "error": result.get("error", ""),
+            "duration_ms": (time.time() - start) * 1000,
+        }
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as executor:
+        futures = [executor.submit(run_one, repo) for repo in repos]
+        for done, future in enumerate(as_completed(futures), 1):
+            item = future.result()
+            results.append(item)
+            icon = "✅" if item["success"] else "❌"
+            detail = item["message"] if item["success"] else item["error"]
+            print(f"[多仓库] 进度 {done}/{total} {icon} {item['repo']}: {detail.splitlines()[0] if detail else ''}")
+
+    results.sort(key=lambda r: r["repo"])
+    succeeded = sum(1 for r in results if r["success"])
+    return {
+        "success": True,
+        "action": action,
+        "root": root,
+        "results": results,
+        "succeeded": succeeded,
+        "failed": total - succeeded,
+    }
+
+
+def format_multi_repo_report(result: Dict) -> str:
+    """格式化多仓库操作结果"""
+    if not result.get("success"):
+        return f"❌ {result.get('error', '多仓库操作失败')}"
+
+    label = MULTI_REPO_ACTIONS[result["action"]][0]
+    lines = [
+        f"📚 多仓库{label}完成",
+        "",
+        f"📂 根目录: {result['root']}",
+        f"📊 共 {len(result['results'])} 个仓库: ✅ {result['succeeded']} 成功，❌ {result['failed']} 失败",
+        "─" * 60,
+    ]
+    for item in result["results"]:
+        icon = "✅" if item["success"] else "❌"
+        detail = item["message"] if item["success"] else item["error"]
+        lines.append(f"{icon} {item['repo']} ({item['duration_ms'] / 1000:.1f}s)")
+        # 每个仓库最多展示 3 行（git 的错误提示通常很长）
+        for line in [l for l in (detail or "").strip().splitlines() if l.strip()][:3]:
+            lines.append(f"    {line}")
+    lines.append("─" * 60)
+    return "\n".join(lines)
+
+
+def multi_repo_git_tool_func(input_str: str = "") -> str:
+    """
+    多仓库 Git 操作工具函数
+
+    Args:
+        input_str: JSON 格式的参数字符串 {"action": ..., "root": ..., "max_workers": ...}
+
+    Returns:
+        汇总报告
+    """
+    try:
+        params = json.loads(input_str) if input_str.strip() else {}
+        result = run_multi_repo(
+            action=params.get("action", "status"),
+            root=params.get("root", "."),
+            max_workers=int(params.get("max_workers", DEFAULT_MAX_WORKERS)),
+            max_depth=int(params.get("max_depth", DEFAULT_MAX_DEPTH)),
+        )
+        return format_multi_repo_report(result)
+    except Exception as e:
+        return f"❌ 多仓库操作失败: {str(e)}"
+
+
+# 创建 LangChain Tool
+multi_repo_git_tool = Tool(
+    name="multi_repo_git",
+    description="""在目录下的多个 Git 仓库上批量执行操作。
+
+适用场景:
+- "查看所有仓库的状态"
+- "把这个目录下的仓库都拉取一下"
+- "推送所有仓库"
+- "给每个仓库生成commit消息"
+
+参数（JSON）:
+- action: status / pull / push / commit_message（默认 status）
+- root: 搜索根目录（默认当前目录）
+- max_workers: 最大并发数（默认 4）
+""",
+    func=multi_repo_git_tool_func
+)
+
+
+# 导出工具
+multi_repo_tools = [multi_repo_git_tool]
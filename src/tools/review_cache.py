@@ -0,0 +1,147 @@
+"""
+Code Review 增量缓存模块
+按 (文件路径, 规范化 hunk 哈希, 模型, prompt 版本) 持久化每个 hunk 的审查结果，
+再次审查时只发送新增或变更过的 hunk
+
+使用: from src.tools.review_cache import review_cache, hunk_cache_key
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.core.agent_config import REVIEW_CACHE_FILE
+from src.core.agent_metrics import get_metrics_collector
+from src.tools.diff_chunks import DiffHunk
+
+
+# 缓存文件格式版本（结构变化时递增，旧文件直接丢弃）
+_CACHE_FORMAT = 1
+
+
+def normalize_hunk(hunk: DiffHunk) -> str:
+    """
+    规范化 hunk 内容：去掉 header 中的行号（只保留函数上下文），折叠行内空白、去掉行尾空白
+
+    这样代码整体上下移动、或只改动行内/行尾空白时，缓存依然命中；
+    行首缩进保留（Python、YAML 中缩进变化会改变语义，需要重新审查）。
+    """
+    context = hunk.header.rsplit("@@", 1)[-1].strip() if hunk.header.count("@@") >= 2 else ""
+    lines = [context]
+    for line in hunk.lines:
+        prefix, body = line[:1], line[1:]
+        indent = body[:len(body) - len(body.lstrip())]
+        lines.append(prefix + indent + " ".join(body.split()))
+    return "\n".join(lines)
+
+
+def hunk_cache_key(hunk: DiffHunk, model: str, prompt_version: str) -> str:
+    """计算 hunk 的缓存键"""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model, hunk.path, normalize_hunk(hunk)):
+        digest.update(part.encode("utf-8", errors="replace"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReviewCache:
+    """基于 JSON 文件的 hunk 审查结果缓存（线程安全，按最近使用时间淘汰）"""
+
+    def __init__(self, path: str = REVIEW_CACHE_FILE, max_entries: int = 5000):
+        """
+        初始化缓存
+
+        Args:
+            path: 缓存文件路径
+            max_entries: 最多保留的 hunk 数量
+        """
+        self.path = path
+        self.max_entries = max_entries
+        # 缓存键 -> {"result": {...}, "used": 最近使用时间}
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """延迟加载缓存文件（调用方持有锁）"""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("format") == _CACHE_FORMAT:
+                    self._entries = data.get("entries", {})
+            except (OSError, ValueError, AttributeError):
+                pass
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取 hunk 的审查结果（未命中返回 None）"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["used"] = time.time()
+            self._dirty = True
+            return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """写入 hunk 的审查结果"""
+        with self._lock:
+            self._load()[key] = {"result": result, "used": time.time()}
+            self._dirty = True
+
+    def save(self) -> None:
+        """淘汰最久未使用的条目并原子写回缓存文件"""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            if len(self._entries) > self.max_entries:
+                keep = sorted(self._entries.items(), key=lambda kv: kv[1]["used"], reverse=True)
+                self._entries = dict(keep[:self.max_entries])
+            data = {"format": _CACHE_FORMAT, "entries": self._entries}
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".review_cache.")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                print(f"[Code Review] ⚠️ 保存审查缓存失败: {e}")
+
+    def clear(self) -> None:
+        """清空缓存（包括磁盘文件）"""
+        with self._lock:
+            self._entries = {}
+            self._dirty = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries) if self._entries is not None else 0,
+            }
+
+
+# 全局实例
+review_cache = ReviewCache()
+get_metrics_collector().register_cache("code_review", review_cache.get_stats)
@@ -3,7 +3,7 @@
 集成性能监控和系统健康检查
 """
 
-from src.core.agent_config import LLM_CONFIG, LLM_CONFIG2
+from src.core.agent_config import LLM_CONFIG, LLM_CONFIG2, TRACE_DIR
 from src.core.agent_memory import memory
 from src.mcp.mcp_manager import mcp_manager
 from src.ui.file_reference_parser import get_file_suggestions
@@ -11,7 +11,9 @@ from src.core.agent_llm import get_llm_stats, reset_llm_stats
 from src.core.agent_metrics import get_metrics_collector
 from src.core.agent_monitoring import get_monitoring_dashboard
 from src.core.agent_resilience import get_resilience_manager
+from src.core.agent_tracing import get_tracer
 from src.core.logger import get_logger, log_json_event
+from src.ui.perf_view import get_perf_monitor, run_perf_view
 
 _log = get_logger("ui")
 
@@ -54,6 +56,9 @@ def print_header():
     print("  • /health         - 系统健康检查")
     print("  • /errors         - 查看错误统计")
     print("  • /reset          - 重置性能计数器")
+    print("  • /trace          - 导出上一轮追踪（Chrome trace）")
+    print("  • /perf on|off    - 常驻性能面板（对话进行中持续刷新）")
+    print("  • /perf           - 全屏性能面板（两轮对话之间查看，Ctrl+C 退出）")
     print("  • /help           - 显示详细帮助")
     print("\n" + "=" * 80 + "\n")
 
@@ -318,6 +323,12 @@ def handle_special_commands(user_input: str) -> bool:
                 for issue in comp_data["issues"]:
                     print(f"    ⚠️ {issue}")
         
+        windows = health.components.get("performance", {}).get("windows", {})
+        if windows:
+            print("\n⏱️ 滑动窗口 (操作数 / 成功率 / 平均耗时):")
+            for label, w in windows.items():
+                print(f"  • {label:<4} {w['count']:>5} 次  {w['success_rate']:>6.1%}  {w['avg_duration_ms']:>8.1f}ms")
+        
         if health.recommendations:
             print("\n💡 优化建议:")
             for rec in health.recommendations:
@@ -387,4 +398,50 @@ def handle_special_commands(user_input: str) -> bool:
         print("  • 熔断器状态已重置\n")
         return False
     
+    # 导出上一轮追踪
+    if user_input_lower in ['/trace', '/追踪']:
+        tracer = get_tracer()
+        trace = tracer.get_turn()
+        if trace is None:
+            print("\n📭 暂无追踪记录（执行一条指令后再试）\n")
+            return False
+        
+        print(f"\n🧭 上一轮追踪 [req:{trace.req_id}] 总耗时 {trace.duration_ms:.0f}ms")
+        print("─" * 80)
+        # 按类别汇总耗时（节点、LLM、工具、子进程）
+        by_category = {}
+        for span in trace.spans:
+            count, total = by_category.get(span.category, (0, 0.0))
+            by_category[span.category] = (count + 1, total + span.duration_ms)
+        for category, (count, total) in sorted(by_category.items(), key=lambda x: -x[1][1]):
+            print(f"  • {category:<14} {count:>4} 个  {total:>9.0f}ms")
+        if trace.dropped:
+            print(f"  ⚠️ 超出上限丢弃 {trace.dropped} 个 span")
+        
+        try:
+            path = tracer.export_chrome_trace(TRACE_DIR, trace.req_id)
+            print(f"\n📁 已导出: {path}")
+            print("💡 在 chrome://tracing 或 https://ui.perfetto.dev 中打开")
+        except OSError as e:
+            print(f"\n❌ 导出失败: {e}")
+        print("─" * 80 + "\n")
+        return False
+    
+    # 常驻性能面板（后台刷新，对话进行中也能看到进行中的操作）
+    if user_input_lower in ['/perf on', '/perf off']:
+        monitor = get_perf_monitor()
+        if user_input_lower == '/perf off':
+            monitor.stop()
+            print("\n📈 常驻性能面板已关闭\n")
+        elif monitor.start():
+            print("\n📈 常驻性能面板已开启（/perf off 关闭）\n")
+        else:
+            print("\n⚠️ 当前输出不是终端，无法常驻显示，请使用 /perf once\n")
+        return False
+    
+    # 全屏性能面板（/perf once 只输出一次）
+    if user_input_lower in ['/perf', '/性能', '/perf once']:
+        run_perf_view(once=user_input_lower.endswith("once"))
+        return False
+    
     return None
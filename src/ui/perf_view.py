@@ -0,0 +1,349 @@
+"""
+实时性能面板（交互模式 /perf）
+展示进行中的操作、上一轮各节点耗时、LLM TTFT 与 tokens/s、
+缓存命中率、MCP 服务器状态与熔断器状态。
+
+- /perf on|off: 后台线程把面板固定在终端底部，对话进行中持续刷新（可观察进行中的操作）
+- /perf: 两轮对话之间全屏原地刷新，Ctrl+C 退出；/perf once 只输出一次
+
+数据全部在刷新时从 MetricsCollector / Tracer / ResilienceManager 拉取，
+面板关闭时不运行任何线程，也不在记录路径上增加开销。
+"""
+
+import atexit
+import shutil
+import sys
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.agent_metrics import MetricsCollector, get_metrics_collector
+from src.core.agent_resilience import ResilienceManager, get_resilience_manager
+from src.core.agent_tracing import Tracer, get_tracer
+
+
+# 刷新间隔（秒）
+PERF_REFRESH_INTERVAL = 1.0
+
+# 计算 TTFT / tokens/s 时回看的最近指标条数
+LLM_SAMPLE_COUNT = 200
+
+# 各区块最多显示的行数
+MAX_ROWS = 8
+
+# 常驻面板最多占用的终端行数（不超过终端高度的一半）
+PINNED_MAX_ROWS = 16
+
+_BREAKER_EMOJI = {"OPEN": "🔴", "CLOSED": "🟢", "HALF_OPEN": "🟡"}
+_MCP_EMOJI = {"ok": "🟢", "error": "🔴", "idle": "⚪"}
+
+
+def _median(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def _llm_stats(collector: MetricsCollector) -> Dict[str, Any]:
+    """从最近的 LLM 指标计算 TTFT（仅流式）与生成速度"""
+    ttfts: List[float] = []
+    rates: List[float] = []
+    calls = 0
+    for metric in collector.get_recent_metrics(LLM_SAMPLE_COUNT):
+        if not metric.operation_type.startswith("llm") or not metric.success:
+            continue
+        calls += 1
+        data = metric.additional_data or {}
+        ttft_ms = data.get("ttft_ms")
+        if ttft_ms is not None:
+            ttfts.append(ttft_ms)
+        completion = (metric.token_usage or {}).get("completion_tokens") or data.get("completion_tokens") or 0
+        # 生成阶段耗时：流式扣除首块等待
+        generation_ms = metric.duration_ms - (ttft_ms or 0)
+        if completion and generation_ms > 0:
+            rates.append(completion / (generation_ms / 1000))
+    return {
+        "calls": calls,
+        "ttft_p50_ms": _median(ttfts),
+        "ttft_last_ms": ttfts[-1] if ttfts else None,
+        "tokens_per_s": _median(rates),
+    }
+
+
+def _last_turn(tracer: Tracer) -> Optional[Dict[str, Any]]:
+    """上一轮对话按节点汇总的耗时"""
+    trace = tracer.get_turn()
+    if trace is None:
+        return None
+    nodes: Dict[str, Tuple[int, float]] = {}
+    for span in trace.spans:
+        if span.category == "node":
+            count, total = nodes.get(span.name, (0, 0.0))
+            nodes[span.name] = (count + 1, total + span.duration_ms)
+    return {
+        "req_id": trace.req_id,
+        "duration_ms": trace.duration_ms,
+        "nodes": sorted(
+            ({"name": name, "count": count, "total_ms": total} for name, (count, total) in nodes.items()),
+            key=lambda node: -node["total_ms"],
+        ),
+    }
+
+
+def collect_perf_snapshot(collector: Optional[MetricsCollector] = None, tracer: Optional[Tracer] = None,
+                          resilience: Optional[ResilienceManager] = None, mcp=None) -> Dict[str, Any]:
+    """
+    采集一次面板数据
+
+    Args:
+        collector / tracer / resilience / mcp: 默认使用全局实例
+    """
+    collector = collector or get_metrics_collector()
+    tracer = tracer or get_tracer()
+    resilience = resilience or get_resilience_manager()
+    if mcp is None:
+        from src.mcp.mcp_manager import mcp_manager as mcp
+
+    resilience_status = resilience.get_health_status()
+    try:
+        mcp_states = mcp.get_server_states()
+    except Exception as e:
+        mcp_states = {"error": str(e)}
+
+    return {
+        "timestamp": time.time(),
+        "window_1m": collector.get_window_stats(60),
+        "inflight": collector.get_inflight_operations(),
+        "last_turn": _last_turn(tracer),
+        "llm": _llm_stats(collector),
+        "caches": collector.get_cache_stats(),
+        "mcp": mcp_states,
+        "circuit_breakers": resilience_status.get("circuit_breakers", {}),
+        "retry_budget": resilience_status.get("retry_budget"),
+    }
+
+
+def _fmt_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}ms"
+
+
+def render_perf_view(snapshot: Dict[str, Any]) -> List[str]:
+    """把面板数据渲染为文本行"""
+    lines = [
+        f"📈 实时性能  {time.strftime('%H:%M:%S', time.localtime(snapshot['timestamp']))}",
+        "─" * 80,
+    ]
+    window = snapshot.get("window_1m")
+    if window and window.get("count"):
+        lines.append(f"⏱️ 最近1分钟: {window['count']} 次  成功率 {window['success_rate']:.1%}"
+                     f"  平均 {window['avg_duration_ms']:.0f}ms")
+
+    inflight = snapshot["inflight"]
+    lines.append(f"\n🔄 进行中 ({len(inflight)}):")
+    if not inflight:
+        lines.append("  (无)")
+    for op in inflight[:MAX_ROWS]:
+        lines.append(f"  • {op['type']:<14} {op['name'][:30]:<30} {op['elapsed_ms']:>8.0f}ms  [{op['thread']}]")
+
+    turn = snapshot["last_turn"]
+    if turn is None:
+        lines.append("\n🧭 上一轮: 暂无追踪")
+    else:
+        lines.append(f"\n🧭 上一轮 [req:{turn['req_id']}] 总耗时 {turn['duration_ms']:.0f}ms:")
+        for node in turn["nodes"][:MAX_ROWS]:
+            share = node["total_ms"] / turn["duration_ms"] if turn["duration_ms"] else 0
+            lines.append(f"  • {node['name']:<30} {node['count']:>3} 次 {node['total_ms']:>8.0f}ms  {share:>5.0%}")
+
+    llm = snapshot["llm"]
+    rate = "-" if llm["tokens_per_s"] is None else f"{llm['tokens_per_s']:.1f}"
+    lines.append(f"\n🤖 LLM (最近 {llm['calls']} 次): TTFT p50 {_fmt_ms(llm['ttft_p50_ms'])}"
+                 f"  最近 {_fmt_ms(llm['ttft_last_ms'])}  生成 {rate} tokens/s")
+
+    caches = snapshot["caches"]
+    if caches:
+        lines.append("\n💾 缓存命中率:")
+        for name, stats in caches.items():
+            if "error" in stats:
+                lines.append(f"  • {name}: ⚠️ {stats['error']}")
+            else:
+                lines.append(f"  • {name:<14} {stats.get('hit_rate', 0):>6.1%}"
+                             f"  ({stats.get('hits', 0)} 命中 / {stats.get('misses', 0)} 未命中)")
+
+    mcp = snapshot["mcp"]
+    if "error" in mcp:
+        lines.append(f"\n🔌 MCP 服务器: ⚠️ {mcp['error']}")
+    elif mcp:
+        lines.append("\n🔌 MCP 服务器:")
+        for name, state in list(mcp.items())[:MAX_ROWS]:
+            suffix = " (发现中)" if state.get("discovering") else ""
+            lines.append(f"  {_MCP_EMOJI.get(state['last_status'], '⚪')} {name:<24} {state['tools']:>3} 工具"
+                         f"  {state['calls']:>4} 次 / 失败 {state['failures']}"
+                         f"  最近 {_fmt_ms(state['last_latency_ms'])}{suffix}")
+
+    breakers = snapshot["circuit_breakers"]
+    budget = snapshot.get("retry_budget")
+    lines.append("\n🛡️ 熔断器:" + ("" if breakers else " (无)"))
+    for name, breaker in breakers.items():
+        lines.append(f"  {_BREAKER_EMOJI.get(breaker['state'], '⚪')} {name:<24} {breaker['state']:<9}"
+                     f" 失败 {breaker['failure_count']}")
+    if budget:
+        lines.append(f"  重试预算: {budget['retries']}/{budget['requests']} 次"
+                     f" (最近 {budget['window_seconds']}s, 剩余 {budget['available']})")
+    lines.append("─" * 80)
+    return lines
+
+
+def run_perf_view(interval: float = PERF_REFRESH_INTERVAL, once: bool = False, **sources) -> None:
+    """
+    运行实时面板（原地刷新，Ctrl+C 退出）
+
+    Args:
+        interval: 刷新间隔（秒）
+        once: 只输出一次（非终端输出时自动只输出一次）
+
+    阻塞当前线程，只适合在两轮对话之间查看；对话进行中观察请用 PerfMonitor（/perf on）。
+        **sources: 传给 collect_perf_snapshot 的数据来源
+    """
+    if once or not sys.stdout.isatty():
+        print("\n" + "\n".join(render_perf_view(collect_perf_snapshot(**sources))) + "\n")
+        return
+
+    print("💡 Ctrl+C 退出；/perf on 可在对话进行中常驻显示")
+    previous = 0
+    sys.stdout.write("\033[?25l")  # 隐藏光标
+    try:
+        while True:
+            lines = render_perf_view(collect_perf_snapshot(**sources))
+            # 回到上次输出的起始行，逐行覆盖并清除多余内容
+            prefix = f"\033[{previous}F" if previous else "\n"
+            sys.stdout.write(prefix + "".join(line + "\033[K\n" for line in "\n".join(lines).split("\n")) + "\033[J")
+            sys.stdout.flush()
+            previous = "\n".join(lines).count("\n") + 1
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout.write("\033[?25h\n")
+        sys.stdout.flush()
+
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def _clip(text: str, width: int) -> str:
+    """按终端显示宽度截断一行（中文与 emoji 占两列）"""
+    if _display_width(text) <= width:
+        return text
+    used = 0
+    for i, ch in enumerate(text):
+        used += 2 if unicodedata.east_asian_width(ch) in "WF" else 1
+        if used > width - 1:
+            return text[:i] + "…"
+    return text
+
+
+class PerfMonitor:
+    """
+    常驻性能面板（/perf on|off）
+
+    通过终端滚动区域把对话输出限制在上方，后台线程按间隔在底部固定区域重绘面板，
+    对话进行中（agent.invoke 期间）也持续刷新。内容不变时不重绘；关闭后恢复滚动区域。
+    """
+
+    def __init__(self, interval: float = PERF_REFRESH_INTERVAL, stream=None, **sources):
+        """
+        Args:
+            interval: 刷新间隔（秒）
+            stream: 输出流（默认 sys.stdout）
+            **sources: 传给 collect_perf_snapshot 的数据来源
+        """
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.sources = sources
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._size: Tuple[int, int] = (0, 0)
+        self._height = 0
+        self._atexit_registered = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """开启面板（非终端输出时返回 False）"""
+        if self.running:
+            return True
+        if not self.stream.isatty():
+            return False
+        cols, rows = shutil.get_terminal_size()
+        self._size = (cols, rows)
+        self._height = max(3, min(PINNED_MAX_ROWS, rows // 2))
+        # 先换行腾出底部区域，再把滚动区域限制在上方（设置滚动区域会移动光标，需保存/恢复）
+        self.stream.write("\n" * self._height + f"\033[{self._height}A"
+                          + f"\0337\033[1;{rows - self._height}r\0338")
+        self.stream.flush()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="PerfMonitor")
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """关闭面板并恢复整屏滚动"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        cols, rows = self._size
+        clear = "".join(f"\033[{row};1H\033[K" for row in range(rows - self._height + 1, rows + 1))
+        with self._lock:
+            self.stream.write(f"\0337\033[r{clear}\0338")
+            self.stream.flush()
+
+    def _loop(self) -> None:
+        previous = None
+        while not self._stop.is_set():
+            try:
+                text = "\n".join(render_perf_view(collect_perf_snapshot(**self.sources)))
+                lines = [line for line in text.split("\n") if line.strip()]
+            except Exception as e:
+                lines = [f"📈 实时性能: ⚠️ {e}"]
+            # 首行只有时间戳变化，比较时忽略
+            if lines[1:] != previous:
+                previous = lines[1:]
+                self._draw(lines)
+            self._stop.wait(self.interval)
+
+    def _draw(self, lines: List[str]) -> None:
+        cols, rows = self._size
+        top = rows - self._height + 1
+        lines = lines[:self._height]
+        out = ["\0337"]
+        for i in range(self._height):
+            line = _clip(lines[i], cols - 1) if i < len(lines) else ""
+            out.append(f"\033[{top + i};1H{line}\033[K")
+        out.append("\0338")
+        with self._lock:
+            self.stream.write("".join(out))
+            self.stream.flush()
+
+
+# 全局实例
+_perf_monitor: Optional[PerfMonitor] = None
+
+
+def get_perf_monitor() -> PerfMonitor:
+    """获取全局常驻性能面板"""
+    global _perf_monitor
+    if _perf_monitor is None:
+        _perf_monitor = PerfMonitor()
+    return _perf_monitor
@@ -0,0 +1,118 @@
+"""
+性能指标收集器测试
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.agent_metrics as agent_metrics
+from src.core.agent_metrics import LatencyHistogram, MetricsCollector, SlidingWindowStats
+
+
+class TestMetricsCollector:
+    """LatencyHistogram / MetricsCollector 聚合测试类"""
+
+    def test_histogram_percentiles(self):
+        """对数分桶的分位数与精确值的相对误差在 5% 以内"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(4, 1.2) for _ in range(5000)]
+        histogram = LatencyHistogram()
+        for v in values:
+            histogram.record(v)
+        ordered = sorted(values)
+        for q in (50, 90, 99):
+            exact = ordered[int(len(ordered) * q / 100) - 1]
+            assert abs(histogram.percentile(q) - exact) / exact < 0.05
+        assert LatencyHistogram().percentile(50) == 0.0
+
+    def test_aggregates_and_ring_buffer(self):
+        """聚合覆盖整个会话；原始样本只保留最近 buffer_size 条"""
+        collector = MetricsCollector(buffer_size=3, auto_export=False)
+        for i in range(10):
+            collector._record_metric("tool_call", "a", float(i + 1), success=i != 0)
+        collector._record_metric("llm_call", "m", 100.0, success=True)
+
+        assert [m.duration_ms for m in collector.get_recent_metrics(2)] == [10.0, 100.0]
+        assert len(collector.get_recent_metrics(50)) == 3
+
+        tool = collector.get_operation_stats("tool_call")
+        assert tool["count"] == 10 and tool["failed_operations"] == 1
+        assert (tool["min_duration_ms"], tool["max_duration_ms"]) == (1.0, 10.0)
+        assert 4.5 <= tool["p50_ms"] <= 5.5 and 9.5 <= tool["p99_ms"] <= 10.0
+        assert collector.get_operation_stats()["count"] == 11
+        assert list(collector.get_operation_breakdown("tool_call")) == ["a"]
+        assert "p50 / p90 / p99" in collector.format_stats_report()
+
+        collector.reset_session_stats()
+        assert collector.get_operation_stats()["count"] == 0
+
+    def test_record_does_not_take_lock(self):
+        """记录只追加到待处理队列：锁被占用时记录仍立即返回，读取时汇总"""
+        collector = MetricsCollector(auto_export=False)
+        done = threading.Event()
+        with collector._lock:
+            worker = threading.Thread(
+                target=lambda: (collector._record_metric("tool_call", "a", 1.0, True), done.set())
+            )
+            worker.start()
+            assert done.wait(2)
+        worker.join()
+        assert collector.get_operation_stats("tool_call")["count"] == 1
+
+    def test_pending_is_bounded(self, monkeypatch):
+        """没有后台线程时待处理样本超过上限由记录线程汇总"""
+        monkeypatch.setattr(agent_metrics, "MAX_PENDING_METRICS", 5)
+        collector = MetricsCollector(auto_export=False)
+        for _ in range(20):
+            collector._record_metric("tool_call", "a", 1.0, True)
+        assert len(collector._pending) <= 5
+        assert collector.get_session_stats().total_operations == 20
+
+    def test_export_is_atomic(self, tmp_path):
+        """导出写临时文件后原子替换，不留下临时文件"""
+        collector = MetricsCollector(auto_export=False)
+        collector.export_file = tmp_path / "performance_metrics.json"
+        collector._record_metric("llm_call", "m", 12.0, True,
+                                 token_usage={"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3})
+        collector.flush()
+        data = json.loads(collector.export_file.read_text(encoding="utf-8"))
+        assert data["session_stats"]["llm_calls"] == 1
+        assert data["operation_stats"]["llm_call/m"]["count"] == 1
+        assert [p.name for p in tmp_path.iterdir()] == ["performance_metrics.json"]
+
+    def test_sliding_window(self):
+        """滑动窗口只统计最近的样本，旧桶随新样本淘汰"""
+        windows = SlidingWindowStats(horizon_seconds=900, bucket_seconds=10, slow_threshold_ms=100)
+        now = 100_000.0
+        for i in range(20):
+            windows.record(now - 600 + i, 10.0, True)
+        for i in range(10):
+            windows.record(now - 30 + i, 200.0, i % 2 == 0, tokens=5)
+
+        last_minute = windows.window(60, now=now)
+        assert last_minute["count"] == 10
+        assert last_minute["error_rate"] == 0.5 and last_minute["slow_rate"] == 1.0
+        assert last_minute["tokens"] == 50
+        fifteen = windows.window(900, now=now)
+        assert fifteen["count"] == 30
+        assert abs(fifteen["avg_duration_ms"] - (20 * 10 + 10 * 200) / 30) < 1e-9
+        assert windows.window(60, now=now + 3600)["count"] == 0
+
+        windows.record(now + 1000, 1.0, True)
+        assert all(b.start > now + 1000 - 900 for b in windows.buckets)
+
+    def test_collector_feeds_windows(self):
+        """汇总待处理样本时同时更新滑动窗口"""
+        collector = MetricsCollector(auto_export=False)
+        collector._record_metric("llm_call", "m", 10.0, False,
+                                 token_usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2})
+        stats = collector.get_window_stats(60)
+        assert (stats["count"], stats["failures"], stats["tokens"]) == (1, 1, 2)
+        collector.reset_session_stats()
+        assert collector.get_window_stats(60)["count"] == 0
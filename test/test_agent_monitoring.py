@@ -0,0 +1,75 @@
+"""
+监控仪表板滑动窗口健康评估测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_metrics import MetricsCollector
+from src.core.agent_monitoring import MonitoringDashboard
+
+
+def _dashboard() -> MonitoringDashboard:
+    dashboard = MonitoringDashboard()
+    dashboard.metrics = MetricsCollector(auto_export=False)
+    return dashboard
+
+
+def _window(count: int, failures: int = 0, slow: int = 0) -> dict:
+    return {
+        "window_seconds": 60, "count": count, "failures": failures,
+        "success_rate": (count - failures) / count if count else 1.0,
+        "error_rate": failures / count if count else 0.0,
+        "avg_duration_ms": 100.0, "slow_rate": slow / count if count else 0.0, "tokens": 0,
+    }
+
+
+class TestMonitoringDashboard:
+    """滑动窗口健康评估与燃烧率告警测试类"""
+
+    def test_recent_failures_not_diluted(self):
+        """一小时的成功历史不会稀释最近一分钟的集中失败"""
+        dashboard = _dashboard()
+        for _ in range(1000):
+            dashboard.metrics._record_metric("tool_call", "old", 10.0, True)
+        # 把旧样本移出 15 分钟窗口
+        dashboard.metrics._drain()
+        for bucket in dashboard.metrics.windows.buckets:
+            bucket.start -= 3600
+        for _ in range(10):
+            dashboard.metrics._record_metric("llm_call", "m", 10.0, False)
+
+        performance = dashboard.get_system_health().components["performance"]
+        assert performance["status"] == "critical"
+        assert performance["windows"]["1m"]["count"] == 10
+        assert performance["slo_alerts"][0]["slo"] == "availability"
+        assert dashboard.metrics.get_session_stats().success_rate > 0.98
+
+    def test_burn_rate_rules(self):
+        """短窗口与长窗口同时超过阈值才告警；样本过少时不评估"""
+        dashboard = _dashboard()
+        # 5m/15m 持续 10% 失败（燃烧率 10x）：degraded，不到 critical
+        windows = {"1m": _window(20, 2), "5m": _window(100, 10), "15m": _window(300, 30)}
+        alerts = dashboard._burn_rate_alerts(windows)
+        assert [(a["slo"], a["severity"]) for a in alerts] == [("availability", "degraded")]
+
+        # 只有最近一分钟失败：长窗口未超过阈值，不告警
+        windows = {"1m": _window(10, 2), "5m": _window(400, 2), "15m": _window(1200, 2)}
+        assert dashboard._burn_rate_alerts(windows) == []
+
+        # 样本过少
+        windows = {"1m": _window(2, 2), "5m": _window(2, 2), "15m": _window(2, 2)}
+        assert dashboard._burn_rate_alerts(windows) == []
+
+        # 延迟 SLO：70% 慢操作
+        windows = {"1m": _window(10, 0, 7), "5m": _window(50, 0, 35), "15m": _window(100, 0, 70)}
+        assert [(a["slo"], a["severity"]) for a in dashboard._burn_rate_alerts(windows)] == [("latency", "degraded")]
+
+    def test_idle_is_healthy(self):
+        """窗口内没有操作时性能组件为 healthy"""
+        performance = _dashboard().get_system_health().components["performance"]
+        assert performance["status"] == "healthy"
+        assert performance["metrics"]["total_operations"] == 0
@@ -0,0 +1,227 @@
+"""
+系统韧性管理测试
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_resilience import (
+    CircuitBreakerState, ErrorContext, ErrorType, FallbackResult, FallbackStrategy, ResilienceManager,
+    RetryBudget, RetryPolicy, decorrelated_jitter,
+)
+
+
+def _context(operation_name: str) -> ErrorContext:
+    return ErrorContext(
+        error_type=ErrorType.TOOL_CALL_FAILED,
+        error_message="boom",
+        node_name="test",
+        user_input="",
+        operation_name=operation_name,
+    )
+
+
+class TestCircuitBreaker:
+    """熔断器状态转换测试类"""
+
+    def test_open_and_half_open(self):
+        """达到阈值打开，超过恢复时间转为 HALF_OPEN，成功后关闭"""
+        breaker = CircuitBreakerState(failure_threshold=3, recovery_timeout=60)
+        assert [breaker.record_failure() for _ in range(4)] == [False, False, True, False]
+        assert breaker.is_open()
+
+        breaker.last_failure_time = datetime.now() - timedelta(seconds=61)
+        assert not breaker.is_open()
+        assert breaker.state == "HALF_OPEN"
+
+        breaker.record_success()
+        snapshot = breaker.snapshot()
+        assert (snapshot["state"], snapshot["failure_count"]) == ("CLOSED", 0)
+
+    def test_concurrent_failures_counted_exactly(self):
+        """并发记录失败不丢计数，且只有一个线程观察到打开转换"""
+        manager = ResilienceManager()
+        opened = []
+
+        def fail():
+            breaker = manager._get_circuit_breaker("tool_call")
+            for _ in range(500):
+                if breaker.record_failure():
+                    opened.append(1)
+
+        threads = [threading.Thread(target=fail) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        status = manager.get_health_status()["circuit_breakers"]["tool_call"]
+        assert status["failure_count"] == 4000
+        assert status["state"] == "OPEN"
+        assert len(opened) == 1
+
+
+class TestRetryBudget:
+    """重试预算与退避测试类"""
+
+    def test_ratio_and_min_retries(self):
+        """重试数不超过 请求数 × ratio，低流量时有保底次数"""
+        budget = RetryBudget(ratio=0.1, window=60, min_retries=2)
+        now = 1000.0
+        assert [budget.try_acquire("llm_call", now=now) for _ in range(3)] == [True, True, False]
+
+        for _ in range(50):
+            budget.record_request("llm_call", now=now)
+        assert [budget.try_acquire("llm_call", now=now) for _ in range(4)] == [True, True, True, False]
+
+        stats = budget.get_stats(now=now)
+        assert (stats["requests"], stats["retries"], stats["available"]) == (50, 5, 0)
+        assert stats["by_operation"]["llm_call"] == {"requests": 50, "granted": 5, "denied": 2}
+
+    def test_window_expiry(self):
+        """超出窗口的请求与重试不再计入"""
+        budget = RetryBudget(ratio=0.5, window=10, min_retries=0)
+        for _ in range(4):
+            budget.record_request(now=100.0)
+        assert budget.try_acquire(now=100.0) and budget.try_acquire(now=105.0)
+        assert not budget.try_acquire(now=109.0)
+        assert not budget.try_acquire(now=111.0)
+        assert budget.get_stats(now=111.0)["requests"] == 0
+
+    def test_decorrelated_jitter_bounds(self):
+        """退避在 [base, 上次 × 3] 内且不超过上限"""
+        delay = 0.0
+        for _ in range(200):
+            previous, delay = delay, decorrelated_jitter(delay, 1.0, 20.0)
+            assert 1.0 <= delay <= min(20.0, max(previous, 1.0) * 3)
+        assert RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=False).next_delay(4.0) == 5.0
+
+    def test_manager_retry_respects_budget(self, monkeypatch):
+        """预算耗尽时 _retry_with_backoff 不等待直接失败"""
+        manager = ResilienceManager(retry_budget=RetryBudget(min_retries=0))
+        monkeypatch.setattr(time, "sleep", lambda s: (_ for _ in ()).throw(AssertionError("slept")))
+        result = manager._retry_with_backoff(RuntimeError("boom"), _context("tool_call"))
+        assert result.error_message == "重试预算已耗尽"
+        assert manager.get_health_status()["retry_budget"]["by_operation"]["tool_call"]["denied"] == 1
+
+
+    def test_mcp_call_retries_spawn_only(self, monkeypatch):
+        """MCP 调用只重试进程启动失败，超时（请求可能已送达）直接抛出"""
+        import subprocess
+        import src.mcp.mcp_manager as mcp_module
+
+        class _Process:
+            returncode = 0
+
+            def __init__(self, hang):
+                self.hang = hang
+
+            def communicate(self, input=None, timeout=None):
+                if self.hang and input is not None:
+                    raise subprocess.TimeoutExpired("mcp", timeout)
+                return "ok", ""
+
+            def kill(self):
+                pass
+
+        outcomes = []
+
+        def popen(command, **kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return _Process(hang=outcome)
+
+        monkeypatch.setattr(mcp_module.subprocess, "Popen", popen)
+        monkeypatch.setattr(mcp_module, "get_retry_budget", lambda: RetryBudget(min_retries=5))
+        monkeypatch.setattr(mcp_module.time, "sleep", lambda s: None)
+        manager = mcp_module.MCPManager.__new__(mcp_module.MCPManager)
+
+        outcomes[:] = [PermissionError("busy"), False]
+        assert manager._run_mcp_process(["mcp"], {}, "test") == ("ok", "", 0)
+        assert outcomes == []
+
+        outcomes[:] = [True, False]
+        with pytest.raises(subprocess.TimeoutExpired):
+            manager._run_mcp_process(["mcp"], {}, "test")
+        assert outcomes == [False]
+
+
+class TestResilienceManager:
+    """ResilienceManager 并发错误处理测试类"""
+
+    def test_parallel_failures_do_not_block_each_other(self):
+        """多个线程的降级策略同时执行（串行时屏障会超时）"""
+        manager = ResilienceManager()
+        parties = 4
+        barrier = threading.Barrier(parties, timeout=5)
+        met = []
+
+        def slow_degradation(error, context):
+            barrier.wait()
+            met.append(context.operation_name)
+            return FallbackResult(success=True, response="ok",
+                                  strategy_used=FallbackStrategy.GRACEFUL_DEGRADATION)
+
+        manager._graceful_degradation = slow_degradation
+        results = []
+
+        def handle(i):
+            results.append(manager.handle_error(RuntimeError("boom"), _context(f"op{i}")))
+
+        threads = [threading.Thread(target=handle, args=(i,)) for i in range(parties)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(met) == [f"op{i}" for i in range(parties)]
+        assert all(r.response == "ok" for r in results)
+        assert manager.get_health_status()["total_recoveries"] == parties
+
+    def test_backoff_does_not_block_other_operations(self):
+        """一个操作的退避等待期间，其他操作的错误处理与健康查询不被阻塞"""
+        manager = ResilienceManager(retry_budget=RetryBudget(min_retries=10))
+        manager.retry_policies["tool_call"].base_delay = 1.0
+        manager.retry_policies["tool_call"].max_delay = 1.0
+        manager.retry_policies["tool_call"].jitter = False
+        started = threading.Event()
+        original = manager._retry_with_backoff
+
+        def retry(error, context):
+            started.set()
+            return original(error, context)
+
+        manager._retry_with_backoff = retry
+        worker = threading.Thread(target=manager.handle_error,
+                                  args=(RuntimeError("slow"), _context("tool_call")))
+        worker.start()
+        assert started.wait(5)
+
+        begin = time.perf_counter()
+        result = manager.handle_error(RuntimeError("fast"), _context("command_exec"))
+        manager.get_health_status()
+        elapsed = time.perf_counter() - begin
+        worker.join()
+
+        assert result.strategy_used == FallbackStrategy.GRACEFUL_DEGRADATION
+        assert elapsed < 0.5
+
+    def test_open_circuit_short_circuits(self):
+        """熔断器打开后直接返回熔断响应"""
+        manager = ResilienceManager()
+        for _ in range(5):
+            manager._update_circuit_breaker("command_exec", failed=True)
+        result = manager.handle_error(RuntimeError("boom"), _context("command_exec"))
+        assert result.strategy_used == FallbackStrategy.CIRCUIT_BREAKER
+        assert not result.success
+        manager.reset_stats()
+        assert manager.get_health_status()["circuit_breakers"] == {}
@@ -0,0 +1,127 @@
+"""
+分层追踪测试
+"""
+
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_metrics import MetricsCollector
+from src.core.agent_tracing import Tracer, to_chrome_trace, traced_node
+import src.core.agent_tracing as agent_tracing
+
+
+class TestTracer:
+    """Tracer 层级关系与 Chrome trace 导出测试类"""
+
+    def test_span_outside_turn_is_noop(self):
+        """不在对话轮次内时 span 为空操作"""
+        tracer = Tracer()
+        with tracer.span("git_pull", "node") as span:
+            assert span is None
+        assert tracer.get_turn() is None
+
+    def test_parent_ids(self):
+        """turn → 节点 → LLM 调用的父子关系"""
+        tracer = Tracer()
+        with tracer.turn("abc12345", input="hi") as root:
+            with tracer.span("answer_question", "node") as node:
+                with tracer.span("kimi", "llm_call") as llm:
+                    pass
+        trace = tracer.get_turn()
+        assert trace.req_id == "abc12345"
+        assert root.parent_id is None
+        assert node.parent_id == root.span_id
+        assert llm.parent_id == node.span_id
+        assert {s.req_id for s in trace.spans} == {"abc12345"}
+        assert [s.name for s in trace.spans] == ["kimi", "answer_question"]
+
+    def test_worker_thread_attaches_to_root(self, monkeypatch):
+        """线程池中没有上下文的 span 按 DNM_REQ_ID 挂到根 span 下"""
+        tracer = Tracer()
+        monkeypatch.setenv("DNM_REQ_ID", "r1")
+        spans = []
+        with tracer.turn("r1") as root:
+            def worker():
+                with tracer.span("git_call", "git_call") as span:
+                    spans.append(span)
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        assert spans[0].parent_id == root.span_id
+        assert spans[0].thread_id != root.thread_id
+
+    def test_error_status(self):
+        """异常时 span 标记为 error 并继续抛出"""
+        tracer = Tracer()
+        with pytest.raises(ValueError):
+            with tracer.turn("r2"):
+                with tracer.span("execute_command", "node"):
+                    raise ValueError("boom")
+        trace = tracer.get_turn("r2")
+        assert trace.root.status == "error"
+        assert trace.spans[0].status == "error"
+        assert "boom" in trace.spans[0].attrs["error"]
+
+    def test_measure_operation_and_traced_node(self, monkeypatch):
+        """measure_operation 与 traced_node 自动创建 span"""
+        tracer = Tracer()
+        monkeypatch.setattr(agent_tracing, "tracer", tracer)
+        collector = MetricsCollector(auto_export=False)
+
+        def node(state):
+            with collector.measure_operation("tool_call", "read_file", server="fs") as ctx:
+                ctx["token_usage"] = {"total_tokens": 3}
+            return state
+
+        wrapped = traced_node("execute_mcp_tool", node)
+        assert wrapped.__name__ == "node"
+        with tracer.turn("r3"):
+            assert wrapped({"x": 1}) == {"x": 1}
+        tool, node_span = tracer.get_turn().spans
+        assert (node_span.name, node_span.category) == ("execute_mcp_tool", "node")
+        assert (tool.name, tool.category) == ("read_file", "tool_call")
+        assert tool.parent_id == node_span.span_id
+        assert tool.attrs["server"] == "fs"
+        assert tool.attrs["token_usage"] == {"total_tokens": 3}
+
+    def test_chrome_trace_export(self, tmp_path):
+        """导出 Chrome trace-event JSON（"X" 事件，微秒，带父 span ID）"""
+        tracer = Tracer()
+        with tracer.turn("r4"):
+            with tracer.span("git_push", "node", branch="main"):
+                pass
+        data = to_chrome_trace(tracer.get_turn())
+        complete = [e for e in data["traceEvents"] if e["ph"] == "X"]
+        assert [e["name"] for e in complete] == ["turn", "git_push"]
+        turn, push = complete
+        assert turn["ts"] == 0
+        assert push["ts"] >= 0 and push["dur"] <= turn["dur"]
+        assert push["args"]["parent_id"] == turn["args"]["span_id"]
+        assert push["args"]["req_id"] == "r4"
+        assert push["args"]["branch"] == "main"
+
+        path = tracer.export_chrome_trace(str(tmp_path), "r4")
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f)["otherData"]["req_id"] == "r4"
+        assert tracer.export_chrome_trace(str(tmp_path), "missing") is None
+
+    def test_history_and_span_cap(self, monkeypatch):
+        """只保留最近 N 轮；单轮 span 超过上限时丢弃并计数"""
+        monkeypatch.setattr(agent_tracing, "MAX_SPANS_PER_TURN", 2)
+        tracer = Tracer(history=2)
+        for i in range(3):
+            with tracer.turn(f"t{i}"):
+                for _ in range(3):
+                    with tracer.span("n", "node"):
+                        pass
+        turns = tracer.list_turns()
+        assert [t.req_id for t in turns] == ["t1", "t2"]
+        assert len(turns[-1].spans) == 2
+        assert turns[-1].dropped == 1
@@ -0,0 +1,96 @@
+"""
+提交历史索引测试
+"""
+
+import os
+import subprocess
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.commit_index import CommitIndex, parse_log_records
+
+
+def _git(repo, *args, env=None):
+    """在测试仓库中执行 git 命令"""
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, env=env)
+
+
+def _commit(repo, name, author, timestamp):
+    """写入文件并以指定作者、时间提交"""
+    with open(os.path.join(repo, name), "w") as f:
+        f.write("line\n" * 3)
+    env = dict(os.environ, GIT_AUTHOR_DATE=f"@{timestamp} +0000", GIT_COMMITTER_DATE=f"@{timestamp} +0000")
+    _git(repo, "add", name)
+    _git(repo, "-c", f"user.name={author}", "-c", f"user.email={author}@example.com",
+         "commit", "-qm", f"add {name} | {author}", env=env)
+
+
+class TestCommitIndex:
+    """parse_log_records / CommitIndex 测试类"""
+
+    def test_parse_log_records(self):
+        """标题中的分隔符不影响解析，numstat 按提交归属"""
+        raw = ("\x1eaaa\x1fX\x1fx@y\x1f100\x1ffix | pipe\0\n2\t1\ta.py\0-\t-\tlogo.png\0"
+               "\x1ebbb\x1fY\x1fy@y\x1f50\x1finit\0\n1\t0\tb.py\0")
+        records = parse_log_records(raw)
+        assert [r.hash for r in records] == ["aaa", "bbb"]
+        assert records[0].subject == "fix | pipe"
+        assert records[0].files == [[2, 1, "a.py"], [None, None, "logo.png"]]
+        assert records[0].lines_added == 2 and records[1].timestamp == 50
+
+    def test_incremental_update_and_query(self, tmp_path):
+        """只读取新增提交；按时间与作者查询；reset 后从已有记录中选取历史"""
+        repo = str(tmp_path / "repo")
+        os.makedirs(repo)
+        _git(repo, "init", "-q")
+        _commit(repo, "a.txt", "alice", 1700001000)
+        _commit(repo, "b.txt", "bob", 1700002000)
+
+        index = CommitIndex(repo, str(tmp_path / "index"))
+        assert index.update() == 2
+        _commit(repo, "c.txt", "alice", 1700003000)
+        assert index.update() == 1
+        assert index.update() == 0
+
+        # 重新加载磁盘上的索引
+        reloaded = CommitIndex(repo, str(tmp_path / "index"))
+        assert [c.subject for c in reloaded.query(author="ALICE")] == ["add c.txt | alice", "add a.txt | alice"]
+        assert [c.author for c in reloaded.query(since=1700001500, until=1700002500)] == ["bob"]
+        assert reloaded.recent(1)[0].files == [[3, 0, "c.txt"]]
+
+        _git(repo, "reset", "-q", "--hard", "HEAD~2")
+        assert reloaded.update() == 0
+        assert [c.author for c in reloaded.query()] == ["alice"]
+
+    def test_branch_switch_reads_only_unknown_commits(self, tmp_path, monkeypatch):
+        """切换分支只读取对方分支上的新提交，来回切换不再读取 git log"""
+        repo = str(tmp_path / "repo")
+        os.makedirs(repo)
+        _git(repo, "init", "-q", "-b", "main")
+        _commit(repo, "a.txt", "alice", 1700001000)
+        _commit(repo, "b.txt", "alice", 1700002000)
+        _git(repo, "checkout", "-q", "-b", "feature", "HEAD~1")
+        _commit(repo, "f.txt", "bob", 1700003000)
+
+        index = CommitIndex(repo, str(tmp_path / "index"))
+        assert index.update() == 2
+        _git(repo, "checkout", "-q", "main")
+        assert index.update() == 1
+        assert [c.subject for c in index.query()] == ["add b.txt | alice", "add a.txt | alice"]
+
+        reads = []
+        original = index._read_log
+        monkeypatch.setattr(index, "_read_log", lambda *a: reads.append(a) or original(*a))
+        for branch in ("feature", "main", "feature"):
+            _git(repo, "checkout", "-q", branch)
+            assert index.update() == 0
+        assert reads == []
+        assert [c.subject for c in index.query()] == ["add f.txt | bob", "add a.txt | alice"]
+
+        # rebase 改写的提交才需要读取；已不存在的排除点被忽略
+        index._tips.append("0" * 40)
+        _git(repo, "-c", "user.name=bob", "-c", "user.email=bob@example.com", "rebase", "-q", "main")
+        assert index.update() == 1
+        assert [c.subject for c in index.query()] == ["add f.txt | bob", "add b.txt | alice", "add a.txt | alice"]
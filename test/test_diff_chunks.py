@@ -0,0 +1,51 @@
+"""
+Diff 分块测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.diff_chunks import DiffHunk, chunk_diff, parse_diff, split_hunk
+
+
+def _file_diff(path, hunks):
+    """构造单个文件的 diff 文本"""
+    lines = [f"diff --git a/{path} b/{path}", "index 111..222 100644", f"--- a/{path}", f"+++ b/{path}"]
+    for start, body in hunks:
+        lines.append(f"@@ -{start},3 +{start},3 @@ def f():")
+        lines.extend(body)
+    return "\n".join(lines)
+
+
+class TestDiffChunks:
+    """parse_diff / split_hunk / chunk_diff 测试类"""
+
+    def test_parse_files_and_hunks(self):
+        """按文件与 hunk 解析，路径取自 +++ 行"""
+        diff = _file_diff("a.py", [(1, ["-x", "+y"]), (20, [" z"])]) + "\n" + _file_diff("b.py", [(5, ["+w"])])
+        files = parse_diff(diff)
+        assert [f.path for f in files] == ["a.py", "b.py"]
+        assert len(files[0].hunks) == 2 and files[0].hunks[1].path == "a.py"
+
+    def test_split_hunk_recomputes_line_numbers(self):
+        """超出预算的 hunk 按行拆分，起始行号连续"""
+        hunk = DiffHunk("a.py", "@@ -10,6 +10,6 @@", [" a" * 20, "-b" * 20, "+c" * 20, " d" * 20])
+        pieces = split_hunk(hunk, 15)
+        assert len(pieces) == 4
+        assert [p.header for p in pieces] == ["@@ -10 +10 @@", "@@ -11 +11 @@", "@@ -12 +11 @@", "@@ -12 +12 @@"]
+
+    def test_chunks_respect_budget_and_repeat_headers(self):
+        """每个片段不超过预算，且都带有所含文件的文件头"""
+        body = [f"+line {i} " + "x" * 40 for i in range(10)]
+        diff = _file_diff("big.py", [(1, body), (100, body)]) + "\n" + _file_diff("small.py", [(1, ["+ok"])])
+        chunks = chunk_diff(diff, 200, "staged", skip_paths={"skip.py"})
+        assert len(chunks) >= 2
+        for chunk in chunks:
+            assert chunk.tokens <= 200
+            assert chunk.source == "staged"
+            for path in chunk.files:
+                assert f"+++ b/{path}" in chunk.text
+        assert chunk_diff(diff, 200, skip_paths={"big.py", "small.py"}) == []
@@ -0,0 +1,56 @@
+"""
+Diff 压缩测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.file_context import estimate_tokens
+from src.tools.diff_compactor import compact_diff
+
+
+def _file_diff(path, body, new=False):
+    """构造单个文件的 diff 文本"""
+    lines = [f"diff --git a/{path} b/{path}"]
+    if new:
+        lines.append("new file mode 100644")
+    lines += ["index 111..222 100644", f"--- a/{path}", f"+++ b/{path}", "@@ -1,9 +1,9 @@ def f():"]
+    return "\n".join(lines + body)
+
+
+class TestDiffCompactor:
+    """compact_diff 测试类"""
+
+    def test_collapses_context_and_orders_by_weight(self):
+        """折叠上下文，变更量大的文件排在前面"""
+        small = _file_diff("small.py", [" a", " b", " c", "-old", "+new", " d", " e", " f"])
+        big = _file_diff("big.py", ["+x1", "+x2", "+x3", "-y"])
+        result = compact_diff(small + "\n" + big, 1000)
+        assert result.index("big.py") < result.index("small.py")
+        assert " ⋯ (2 行上下文)\n c\n-old" in result and "\n b\n" not in result
+        assert "index 111..222" not in result
+
+    def test_lockfiles_and_large_additions_become_stats(self):
+        """锁文件、生成代码与新增大文件只保留统计"""
+        lock = _file_diff("web/package-lock.json", ["+dep"] * 50)
+        generated = _file_diff("api/user_pb2.py", ["+gen"] * 5)
+        large = _file_diff("data.py", ["+row"] * 400, new=True)
+        code = _file_diff("app.py", ["-a", "+b"])
+        result = compact_diff("\n".join([lock, generated, large, code]), 1000)
+        assert "+dep" not in result and "+gen" not in result and "+row" not in result
+        assert "web/package-lock.json (锁文件, +50/-0)" in result
+        assert "api/user_pb2.py (生成代码, +5/-0)" in result
+        assert "data.py (新增大文件, +400/-0)" in result
+        assert "+b" in result
+
+    def test_respects_token_budget(self):
+        """超出预算的文件降级为统计"""
+        files = [_file_diff(f"m{i}.py", [f"+line {i} " + "x" * 80] * (10 - i)) for i in range(5)]
+        result = compact_diff("\n".join(files), 300)
+        body = result.split("# 以下文件仅保留统计:")[0]
+        assert estimate_tokens(body) <= 300
+        assert "(超出预算" in result
+        assert result.startswith("diff --git a/m0.py")
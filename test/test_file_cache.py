@@ -0,0 +1,68 @@
+"""
+文件读取缓存测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_config import _positive_int
+from src.core.file_cache import FileReadCache
+
+
+class TestFileReadCache:
+    """FileReadCache 命中、失效与淘汰测试类"""
+
+    def test_hit_and_invalidate_on_rewrite(self, tmp_path):
+        """重复读取命中缓存，文件改写后重新读取"""
+        cache = FileReadCache(max_bytes=1024)
+        path = tmp_path / "a.txt"
+        path.write_text("one", encoding="utf-8")
+
+        assert cache.read_text(str(path)) == "one"
+        assert cache.read_text(str(path)) == "one"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        path.write_text("second", encoding="utf-8")
+        assert cache.read_text(str(path)) == "second"
+        assert cache.misses == 2
+        assert cache.get_stats()["bytes"] == len("second")
+
+        cache.invalidate(str(path))
+        assert cache.get_stats()["entries"] == 0
+
+    def test_lru_eviction_under_byte_cap(self, tmp_path):
+        """超出字节上限时淘汰最久未用的项，超过上限 1/4 的文件不缓存"""
+        cache = FileReadCache(max_bytes=100)
+        paths = []
+        for name in "abcde":
+            path = tmp_path / f"{name}.txt"
+            path.write_text(name * 25, encoding="utf-8")
+            paths.append(str(path))
+
+        cache.read_text(paths[0])
+        cache.read_text(paths[1])
+        cache.read_text(paths[0])  # a 变为最近使用
+        for path in paths[2:]:
+            cache.read_text(path)
+
+        stats = cache.get_stats()
+        assert (stats["entries"], stats["bytes"], stats["evictions"]) == (4, 100, 1)
+        cache.read_text(paths[0])
+        assert cache.hits == 2
+        cache.read_text(paths[1])
+        assert cache.hits == 2  # b 已被淘汰
+
+        big = tmp_path / "big.txt"
+        big.write_text("x" * 26, encoding="utf-8")
+        cache.read_text(str(big))
+        assert str(big) not in {key[0] for key in cache._entries}
+
+    def test_cache_size_config_guard(self):
+        """缓存上限配置非法或非正时回退到默认值"""
+        assert _positive_int("128", 64) == 128
+        assert _positive_int("abc", 64) == 64
+        assert _positive_int(None, 64) == 64
+        assert _positive_int(0, 64) == 64
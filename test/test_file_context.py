@@ -0,0 +1,64 @@
+"""
+文件上下文组装测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.file_context import FileContextAssembler, estimate_tokens, tokenize
+
+
+def _reader(contents):
+    """构造 read_file 风格的读取函数"""
+    def read(path):
+        if path not in contents:
+            return {"success": False, "error": "not found"}
+        return {"success": True, "content": contents[path]}
+    return read
+
+
+class TestFileContextAssembler:
+    """FileContextAssembler 测试类"""
+
+    def test_small_files_included_completely(self):
+        """预算充足时完整包含文件"""
+        contents = {"a.py": "def foo():\n    return 1\n"}
+        result = FileContextAssembler().assemble(["a.py"], "foo", 1000, _reader(contents))
+        assert result["files"]["a.py"]["complete"]
+        assert "return 1" in result["context"]
+
+    def test_large_file_keeps_relevant_chunk(self):
+        """超出预算时保留与问题相关的片段和大纲"""
+        lines = [f"def filler_{i}():\n    value = {i}\n" for i in range(200)]
+        lines[150] = "def parse_config():\n    load_yaml_settings()\n"
+        contents = {"big.py": "".join(lines)}
+        result = FileContextAssembler(chunk_lines=20).assemble(
+            ["big.py"], "where is parse_config defined", 200, _reader(contents)
+        )
+        assert not result["files"]["big.py"]["complete"]
+        assert "load_yaml_settings" in result["context"]
+        assert "L1 def filler_0" in result["context"]
+        assert result["used_tokens"] <= 200
+
+    def test_read_errors_reported(self):
+        """读取失败的文件记录错误而不是抛出"""
+        result = FileContextAssembler().assemble(["missing.py"], "", 100, _reader({}))
+        assert result["files"]["missing.py"]["error"] == "not found"
+        assert result["contents"] == {}
+
+    def test_tokenize_and_estimate(self):
+        """分词拆分驼峰与中文二元组，估算 token"""
+        assert {"getvalue", "get", "value", "性能", "能指"} <= set(tokenize("getValue 性能指"))
+        assert estimate_tokens("abcd" * 10) == 10
+        assert estimate_tokens("中文") == 2
+
+    def test_empty_file_is_complete(self):
+        """空文件视为完整包含，渲染为空文件标记而不是预算不足"""
+        result = FileContextAssembler().assemble(["empty.py"], "foo", 100, _reader({"empty.py": ""}))
+        info = result["files"]["empty.py"]
+        assert info["complete"] and info["total_chunks"] == 0
+        assert "(空文件)" in result["context"]
+        assert "预算不足" not in result["context"]
@@ -0,0 +1,59 @@
+"""
+大仓库模式测试
+"""
+
+import os
+import subprocess
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_metrics import MetricsCollector
+from src.tools import git_snapshot
+from src.tools.git_large_repo import detect_large_repo
+from src.tools.git_snapshot import collect_git_snapshot
+
+
+def _repo(tmp_path):
+    """含一个已暂存文件和一个未跟踪文件的仓库"""
+    repo = str(tmp_path)
+    subprocess.run(["git", "init", "-q", repo], check=True)
+    for name in ("tracked.txt", "untracked.txt"):
+        with open(os.path.join(repo, name), "w") as f:
+            f.write("x\n")
+    subprocess.run(["git", "add", "tracked.txt"], cwd=repo, check=True)
+    return repo
+
+
+class TestGitLargeRepo:
+    """detect_large_repo / 跳过未跟踪文件 / git 调用计时 测试类"""
+
+    def test_detect_reads_config(self, tmp_path):
+        """读取 index 大小与 fsmonitor / untrackedCache 配置"""
+        repo = _repo(tmp_path)
+        status = detect_large_repo(repo)
+        assert status.is_repo and status.index_bytes > 0 and not status.is_large
+        assert not status.untracked_cache and not status.fsmonitor
+
+        subprocess.run(["git", "config", "core.untrackedCache", "true"], cwd=repo, check=True)
+        subprocess.run(["git", "config", "core.fsmonitor", "/path/to/hook"], cwd=repo, check=True)
+        status = detect_large_repo(repo)
+        assert status.untracked_cache and status.fsmonitor and status.optimized
+        assert not detect_large_repo(str(tmp_path / "missing")).is_repo
+
+    def test_snapshot_without_untracked_and_timing(self, tmp_path, monkeypatch):
+        """untracked=False 时不扫描未跟踪文件；每条 git 命令按子命令计时"""
+        collector = MetricsCollector(auto_export=False)
+        monkeypatch.setattr(git_snapshot, "get_metrics_collector", lambda: collector)
+        repo = _repo(tmp_path)
+
+        full = collect_git_snapshot(repo)
+        fast = collect_git_snapshot(repo, untracked=False)
+        assert [c.path for c in full.changes] == ["tracked.txt", "untracked.txt"]
+        assert [c.path for c in fast.changes] == ["tracked.txt"]
+        assert full.untracked_scanned and not fast.untracked_scanned
+
+        breakdown = collector.get_operation_breakdown("git_call")
+        assert breakdown["status"]["count"] == 2
+        assert breakdown["diff"]["count"] == 8
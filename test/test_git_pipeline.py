@@ -0,0 +1,113 @@
+"""
+Git 完整工作流流水线辅助函数测试
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.git_pipeline import prepare_push, preview_is_current, preview_staged_changes
+
+
+def _git(repo, *args):
+    """在测试仓库中执行 git 命令"""
+    return subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                          cwd=repo, check=True, capture_output=True, text=True).stdout
+
+
+def _write(repo, name, content):
+    with open(os.path.join(repo, name), "w") as f:
+        f.write(content)
+
+
+def _setup(tmp_path):
+    """远端仓库 + 两个克隆：work 有本地修改，other 推送无关提交"""
+    remote = str(tmp_path / "remote.git")
+    work = str(tmp_path / "work")
+    other = str(tmp_path / "other")
+    subprocess.run(["git", "init", "-q", "--bare", remote], check=True)
+    subprocess.run(["git", "clone", "-q", remote, work], check=True, capture_output=True)
+    _write(work, "a.txt", "a\n")
+    _write(work, "b.txt", "b\n")
+    _git(work, "add", ".")
+    _git(work, "commit", "-qm", "init")
+    _git(work, "push", "-q", "origin", "HEAD")
+    subprocess.run(["git", "clone", "-q", remote, other], check=True, capture_output=True)
+    return work, other
+
+
+class TestGitPipeline:
+    """preview_staged_changes / preview_is_current / prepare_push 测试类"""
+
+    def test_preview_does_not_touch_index(self, tmp_path):
+        """预演 git add 得到暂存快照，真实 index 保持不变"""
+        work, _ = _setup(tmp_path)
+        _write(work, "a.txt", "a2\n")
+        _write(work, "new.txt", "n\n")
+
+        preview = preview_staged_changes(work)
+        assert sorted(preview.staged_paths) == ["a.txt", "new.txt"]
+        assert "+a2" in preview.snapshot.staged_diff
+        assert _git(work, "diff", "--cached", "--name-only") == ""
+        assert prepare_push(work) == _git(work, "branch", "--show-current").strip()
+
+    def test_message_reused_unless_pull_touches_staged_files(self, tmp_path):
+        """pull 只改动其他文件时预演仍然适用；暂存内容变化时失效"""
+        work, other = _setup(tmp_path)
+        _write(other, "b.txt", "b2\n")
+        _git(other, "commit", "-qam", "other change")
+        _git(other, "push", "-q", "origin", "HEAD")
+
+        _write(work, "a.txt", "a2\n")
+        preview = preview_staged_changes(work)
+        _git(work, "pull", "-q")
+        _git(work, "add", ".")
+        assert preview_is_current(preview, ["a.txt"], work)
+
+        _write(work, "a.txt", "a3\n")
+        _git(work, "add", ".")
+        assert not preview_is_current(preview, ["a.txt"], work)
+        assert not preview_is_current(preview, ["a.txt", "b.txt"], work)
+
+    def test_failed_pull_cancels_message_generation(self, monkeypatch):
+        """pull 失败时取消流水线，预演完成后不再调用 LLM 生成 commit 消息"""
+        pytest.importorskip("langchain_core")
+        import src.core.nodes.git_workflow as git_workflow
+
+        previewing, release = threading.Event(), threading.Event()
+        llm_calls = []
+
+        def slow_preview(path):
+            previewing.set()
+            release.wait(5)
+            return SimpleNamespace(snapshot=None)
+
+        monkeypatch.setattr(git_workflow, "preview_staged_changes", slow_preview)
+        monkeypatch.setattr(git_workflow, "prepare_push", lambda path: "main")
+        monkeypatch.setattr(git_workflow.GitTools, "analyze_snapshot",
+                            staticmethod(lambda snapshot: {"success": True}))
+        monkeypatch.setattr(git_workflow, "generate_commit_message_from_analysis",
+                            lambda analysis: llm_calls.append(analysis) or 'git commit -m "msg"')
+        pipelines = []
+
+        def failing_pull():
+            # pull 在预演进行中失败
+            previewing.wait(5)
+            pipelines.append(git_workflow._current_pipeline())
+            return {"success": False, "error": "network down"}
+
+        monkeypatch.setattr(git_workflow.git_tools, "git_pull", failing_pull)
+        result = git_workflow.git_pull_node({"intent": "full_git_workflow"})
+        release.set()
+
+        assert not result["git_pull_success"]
+        assert pipelines[0].message_future.result(5)[1] == ""
+        assert llm_calls == []
+        assert git_workflow._current_pipeline() is None
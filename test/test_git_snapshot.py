@@ -0,0 +1,60 @@
+"""
+Git 快照解析测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.git_snapshot import (
+    build_changes,
+    group_changes,
+    parse_numstat_z,
+    parse_status_v2,
+)
+
+
+class TestGitSnapshotParsing:
+    """porcelain v2 / numstat 解析测试类"""
+
+    def test_status_v2_entries_and_branch(self):
+        """解析分支头、普通变更、重命名与未跟踪文件"""
+        raw = (
+            "# branch.oid 0123\0# branch.head main\0# branch.upstream origin/main\0# branch.ab +2 -1\0"
+            "1 .M N... 100644 100644 100644 aaa bbb src/a b.py\0"
+            "2 R. N... 100644 100644 100644 aaa bbb R100 new.py\0old.py\0"
+            "? notes.txt\0"
+        )
+        headers, entries = parse_status_v2(raw)
+        assert headers["branch.head"] == "main"
+        assert headers["branch.ab"] == "+2 -1"
+        assert [e.short_line for e in entries] == [
+            " M src/a b.py",
+            "R  old.py -> new.py",
+            "?? notes.txt",
+        ]
+
+    def test_numstat_z_rename_and_binary(self):
+        """解析重命名条目与二进制文件"""
+        entries = parse_numstat_z("3\t1\ta.py\0-\t-\timg.png\0" "0\t0\t\0old.py\0new.py\0")
+        assert (entries[0].added, entries[0].deleted, entries[0].path) == (3, 1, "a.py")
+        assert entries[1].added is None
+        assert (entries[2].path, entries[2].orig_path) == ("new.py", "old.py")
+
+    def test_build_changes(self):
+        """合并状态与 numstat 为 FileChange 并分组"""
+        entries = parse_status_v2(
+            "1 M. N... 100644 100644 100644 a b app.py\0"
+            "1 A. N... 000000 100644 100644 a b logo.png\0"
+            "1 A. N... 000000 100644 100644 a b vendor/lib.js\0"
+            "1 .D N... 100644 100644 000000 a b old.txt\0"
+        )[1]
+        staged = parse_numstat_z("2\t1\tapp.py\0-\t-\tlogo.png\0" "5\t0\tvendor/lib.js\0")
+        unstaged = parse_numstat_z("0\t3\told.txt\0")
+        changes = build_changes(entries, staged, unstaged)
+        groups = group_changes(changes)
+        assert [c.label for c in groups["modified"]] == ["app.py (+2/-1)"]
+        assert [c.path for c in groups["deleted"]] == ["old.txt"]
+        assert changes[1].binary and changes[2].vendored
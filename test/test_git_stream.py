@@ -0,0 +1,137 @@
+"""
+Git 网络操作流式执行测试
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.git_stream import parse_progress_line, run_git_streaming
+
+
+class TestGitStream:
+    """parse_progress_line / run_git_streaming 测试类"""
+
+    def test_parse_progress_line(self):
+        """解析阶段、百分比、对象数与速率，非进度行返回 None"""
+        progress = parse_progress_line("Receiving objects:  45% (450/1000), 1.20 MiB | 600.00 KiB/s")
+        assert (progress.phase, progress.percent, progress.current, progress.total) == ("Receiving objects", 45, 450, 1000)
+        assert progress.rate == 600 * 1024 and not progress.done
+
+        remote = parse_progress_line("remote: Compressing objects: 100% (3/3), done.")
+        assert remote.remote and remote.done and remote.rate is None
+        assert parse_progress_line("To /tmp/remote.git") is None
+
+        localized = parse_progress_line("接收对象中:  45% (450/1000), 1.20 MiB | 600.00 KiB/s")
+        assert (localized.phase, localized.percent, localized.total) == ("接收对象中", 45, 1000)
+
+    def test_c_locale_and_redraw_frames(self, tmp_path, monkeypatch):
+        """git 以 C locale 运行；\\r 刷新的非进度帧不计入 stderr"""
+        monkeypatch.setenv("LC_ALL", "zh_CN.UTF-8")
+        monkeypatch.setenv("LANGUAGE", "zh_CN")
+        script = ("!printf 'Counting objects: 1\\rCounting objects: 2\\rCounting objects: 2, done.\\n' >&2;"
+                  " echo \"$LC_ALL/$LANGUAGE\"")
+        result = run_git_streaming(["-c", f"alias.fake={script}", "fake"], str(tmp_path))
+        assert result.success
+        assert result.stdout == "C/C"
+        assert result.stderr == "Counting objects: 2, done."
+
+    def test_push_streams_progress(self, tmp_path):
+        """推送时产生进度事件，进度行不混入 stderr"""
+        remote = str(tmp_path / "remote.git")
+        work = str(tmp_path / "work")
+        subprocess.run(["git", "init", "-q", "--bare", remote], check=True)
+        subprocess.run(["git", "init", "-q", work], check=True)
+        with open(os.path.join(work, "data.bin"), "wb") as f:
+            f.write(os.urandom(200000))
+        subprocess.run(["git", "add", "."], cwd=work, check=True)
+        subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"],
+                       cwd=work, check=True)
+
+        events = []
+        result = run_git_streaming(["push", "--progress", remote, "HEAD:refs/heads/main"], work,
+                                   on_progress=events.append)
+        assert result.success
+        assert any(e.phase == "Writing objects" and e.done for e in events)
+        assert "Writing objects" not in result.stderr
+
+    def test_stall_timeout_terminates(self, tmp_path):
+        """长时间无输出时终止进程并标记超时"""
+        start = time.time()
+        result = run_git_streaming(["-c", "alias.stall=!sleep 5", "stall"], str(tmp_path), stall_timeout=0.5)
+        assert result.timed_out and not result.success
+        assert time.time() - start < 4
+
+    def test_network_retry_on_transient_error(self, monkeypatch):
+        """瞬时网络错误在重试预算内退避重试，其他错误不重试"""
+        import src.tools.git_tools as git_tools
+        from src.core.agent_resilience import RetryBudget
+        from src.tools.git_stream import GitStreamResult
+
+        outcomes = [
+            GitStreamResult(returncode=128, stderr="fatal: unable to access: Could not resolve host: example.com"),
+            GitStreamResult(returncode=0, stdout="ok"),
+        ]
+        calls = []
+
+        def fake_run(args, cwd, on_progress=None):
+            calls.append(args)
+            return outcomes[len(calls) - 1]
+
+        monkeypatch.setattr(git_tools, "run_git_streaming", fake_run)
+        monkeypatch.setattr(git_tools, "get_retry_budget", lambda: RetryBudget(min_retries=5))
+        monkeypatch.setattr(git_tools.time, "sleep", lambda s: None)
+        tools = git_tools.GitTools(".")
+        assert tools._run_network(["pull"], "git pull", False).success
+        assert len(calls) == 2
+
+        calls.clear()
+        outcomes[0] = GitStreamResult(returncode=1, stderr="CONFLICT (content)")
+        assert not tools._run_network(["pull"], "git pull", False).success
+        assert len(calls) == 1
+
+    def test_pull_push_invalidate_snapshot_after_network(self, monkeypatch):
+        """网络操作期间缓存的快照在 pull/push 结束后失效（包括 Ctrl-C 取消）"""
+        import src.tools.git_tools as git_tools
+        from src.tools.git_stream import GitStreamResult
+
+        tools = git_tools.GitTools(".")
+        monkeypatch.setattr(tools, "check_git_repo", lambda: True)
+
+        def cache_during_run(args, label, show_progress):
+            tools._snapshot = ("req", object())
+            if args[0] == "push":
+                raise KeyboardInterrupt
+            return GitStreamResult(returncode=0, stdout="Already up to date.")
+
+        monkeypatch.setattr(tools, "_run_network", cache_during_run)
+        assert tools.git_pull(show_progress=False)["success"]
+        assert tools._snapshot is None
+
+        try:
+            tools.git_push(branch="main", show_progress=False)
+        except KeyboardInterrupt:
+            pass
+        assert tools._snapshot is None
+
+    def test_network_retry_under_localized_system(self, tmp_path, monkeypatch):
+        """系统为中文 locale 时网络命令仍输出英文错误，瞬时错误照常重试"""
+        import src.tools.git_tools as git_tools
+        from src.core.agent_resilience import RetryBudget
+
+        monkeypatch.setenv("LC_ALL", "zh_CN.UTF-8")
+        monkeypatch.setenv("LANGUAGE", "zh_CN")
+        monkeypatch.setattr(git_tools, "get_retry_budget", lambda: RetryBudget(min_retries=5))
+        monkeypatch.setattr(git_tools.time, "sleep", lambda s: None)
+        script = ("!echo x >> calls; if [ \"$LC_ALL\" = C ]; then"
+                  " echo 'fatal: the remote end hung up unexpectedly' >&2;"
+                  " else echo '致命错误：远端意外挂断了' >&2; fi; exit 128")
+        tools = git_tools.GitTools(str(tmp_path))
+        result = tools._run_network(["-c", f"alias.fetchfail={script}", "fetchfail"], "git pull", False)
+        assert not result.success
+        assert "remote end hung up" in result.stderr
+        assert (tmp_path / "calls").read_text().count("x") == 1 + tools.NETWORK_RETRY_POLICY.max_attempts
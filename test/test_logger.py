@@ -0,0 +1,140 @@
+"""
+异步日志管线测试
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.logger as logger_module
+from src.core.logger import get_logging_stats, log_json_event, set_event_sampling
+
+
+class _SlowHandler(logging.Handler):
+    """每条记录写出都很慢的 handler（可被 gate 阻塞）"""
+
+    def __init__(self, delay: float = 0.0, gate: threading.Event = None):
+        super().__init__()
+        self.delay = delay
+        self.gate = gate
+        self.records = []
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        self.records.append((record.request_id, record.getMessage()))
+
+
+def _pipeline(name: str, target: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"test_async_logging.{name}")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = logger_module._async_handler(target)
+    handler.addFilter(logger_module._RequestIdFilter())
+    logger.addHandler(handler)
+    return logger
+
+
+def _stop_last_listener():
+    logger_module._listeners.pop().stop()
+
+
+class TestAsyncLogging:
+    """QueueHandler / QueueListener 异步日志测试类"""
+
+    def test_caller_not_blocked_by_slow_handler(self, monkeypatch):
+        """写出很慢时调用方只入队，请求ID 在调用方线程注入"""
+        target = _SlowHandler(delay=0.05)
+        logger = _pipeline("slow", target)
+        monkeypatch.setenv("DNM_REQ_ID", "req-42")
+        try:
+            start = time.perf_counter()
+            for i in range(20):
+                log_json_event(logger, "command_exec", {"i": i})
+            elapsed = time.perf_counter() - start
+            monkeypatch.setenv("DNM_REQ_ID", "other")
+            logger_module.flush_logs()
+        finally:
+            _stop_last_listener()
+
+        assert elapsed < 0.2
+        assert len(target.records) == 20
+        assert {req for req, _ in target.records} == {"req-42"}
+        first = json.loads(target.records[0][1])
+        assert first == {"event": "command_exec", "req": "req-42", "data": {"i": 0}}
+
+    def test_batched_file_writes(self, tmp_path):
+        """文件按批写入，所有记录都写出且格式为 JSON 行"""
+        path = tmp_path / "structured.log"
+        handler = logger_module._BatchRotatingFileHandler(str(path), maxBytes=0, encoding="utf-8")
+        handler.setFormatter(logging.Formatter(fmt="%(message)s"))
+        logger = _pipeline("file", handler)
+        before = get_logging_stats()
+        try:
+            for i in range(500):
+                log_json_event(logger, "tool_call", {"tool": "read_file", "i": i})
+            logger_module.flush_logs()
+        finally:
+            _stop_last_listener()
+            handler.close()
+
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["data"]["i"] for line in lines] == list(range(500))
+        stats = get_logging_stats()
+        batches = stats["batches"] - before["batches"]
+        assert stats["records"] - before["records"] >= 500
+        assert 0 < batches < 500
+
+    def test_bounded_queue_drops_and_counts(self, monkeypatch):
+        """队列满时丢弃新记录并计数，不阻塞调用方"""
+        monkeypatch.setattr(logger_module, "LOG_QUEUE_MAXSIZE", 5)
+        gate = threading.Event()
+        target = _SlowHandler(gate=gate)
+        logger = _pipeline("bounded", target)
+        before = get_logging_stats()["dropped"]
+        try:
+            start = time.perf_counter()
+            for i in range(50):
+                logger.info("line %d", i)
+            elapsed = time.perf_counter() - start
+            gate.set()
+            logger_module.flush_logs()
+        finally:
+            _stop_last_listener()
+
+        dropped = get_logging_stats()["dropped"] - before
+        assert elapsed < 1.0
+        assert dropped > 0
+        assert len(target.records) + dropped == 50
+
+    def test_event_sampling(self):
+        """采样只作用于 info/debug 事件，错误始终保留并带采样率"""
+        target = _SlowHandler()
+        logger = _pipeline("sampling", target)
+        before = get_logging_stats()["sampled_out"]
+        set_event_sampling("hot_event", 0.0)
+        try:
+            for _ in range(10):
+                log_json_event(logger, "hot_event", {})
+            log_json_event(logger, "hot_event", {"boom": True}, level="error")
+            logger_module.flush_logs()
+        finally:
+            set_event_sampling("hot_event", None)
+            _stop_last_listener()
+
+        assert get_logging_stats()["sampled_out"] - before == 10
+        assert len(target.records) == 1
+        assert json.loads(target.records[0][1])["sample_rate"] == 0.0
+
+    def test_parse_sample_rates(self):
+        """解析 DNM_LOG_SAMPLE，忽略非法项并限制在 0~1"""
+        rates = logger_module._parse_sample_rates("tool_call=0.1, command_exec=2,bad,x=y")
+        assert rates == {"tool_call": 0.1, "command_exec": 1.0}
@@ -0,0 +1,178 @@
+"""
+FileSystemTools 文件读取与目录工具测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.mcp.mcp_filesystem import FileSystemTools
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+class TestRangedRead:
+    """read_file 行/字节范围读取测试类"""
+
+    def test_offset_limit_and_tail(self, tmp_path):
+        """offset/limit 与 tail 按行截取，最后一行没有换行符也能读到"""
+        fs = FileSystemTools([str(tmp_path)])
+        path = _write(tmp_path / "a.txt", "l0\nl1\nl2\nl3\nl4")
+
+        result = fs.read_file(path, offset=1, limit=2)
+        assert result["content"] == "l1\nl2\n"
+        assert (result["total_lines"], result["line_range"], result["truncated"]) == (5, [1, 3], True)
+
+        result = fs.read_file(path, tail=2)
+        assert result["content"] == "l3\nl4"
+        assert result["lines"] == 2 and result["line_range"] == [3, 5]
+
+        assert fs.read_file(path, offset=4, limit=10)["content"] == "l4"
+        assert fs.read_file(path, offset=99)["content"] == ""
+
+    def test_byte_range_aligns_utf8(self, tmp_path):
+        """字节范围读取，起点落在多字节字符中间时丢弃残缺字符"""
+        fs = FileSystemTools([str(tmp_path)])
+        path = _write(tmp_path / "u.txt", "ab中文cd")
+
+        assert fs.read_file(path, byte_offset=0, byte_limit=2)["content"] == "ab"
+        result = fs.read_file(path, byte_offset=3, byte_limit=100)
+        assert result["content"] == "文cd"
+        assert result["byte_range"] == [3, len("ab中文cd".encode("utf-8"))]
+
+    def test_max_lines_reads_only_prefix(self, tmp_path, monkeypatch):
+        """max_lines 只扫描开头若干行，不为整个文件建行索引"""
+        fs = FileSystemTools([str(tmp_path)])
+        path = _write(tmp_path / "big.txt", "".join(f"line {i}\n" for i in range(50000)))
+        monkeypatch.setattr(fs, "_get_line_index", lambda *a: (_ for _ in ()).throw(AssertionError("indexed")))
+
+        result = fs.read_file(path, max_lines=3)
+        assert result["content"] == "line 0\nline 1\nline 2\n"
+        assert result["line_range"] == [0, 3] and "total_lines" not in result
+        assert result["max_lines"] == 3
+
+        short = _write(tmp_path / "short.txt", "x\ny")
+        result = fs.read_file(short, max_lines=10)
+        assert result["content"] == "x\ny"
+        assert result["total_lines"] == 2 and not result["truncated"]
+
+    def test_stream_file_matches_read(self, tmp_path):
+        """stream_file 与 read_file 的范围结果一致"""
+        fs = FileSystemTools([str(tmp_path)])
+        path = _write(tmp_path / "s.txt", "a\nb\nc\n")
+        assert "".join(fs.stream_file(path, offset=1, limit=1)) == "b\n"
+        assert "".join(fs.stream_file(path, limit=2)) == "a\nb\n"
+        assert "".join(fs.stream_file(path)) == "a\nb\nc\n"
+
+
+class TestListDirectory:
+    """list_directory 匹配、分页与排序测试类"""
+
+    def _tree(self, tmp_path):
+        _write(tmp_path / "a.py", "a")
+        _write(tmp_path / "sub" / "b.py", "bb")
+        _write(tmp_path / "sub" / "deep" / "c.txt", "ccc")
+        return FileSystemTools([str(tmp_path)])
+
+    @staticmethod
+    def _names(result):
+        return sorted(os.path.relpath(f["path"], result["path"]).replace(os.sep, "/") for f in result["files"])
+
+    def test_glob_semantics(self, tmp_path):
+        """与 Path.glob/rglob 一致：**/ 匹配零个目录，多段模式无需 recursive"""
+        fs = self._tree(tmp_path)
+        root = str(tmp_path)
+        assert self._names(fs.list_directory(root, "**/*.py", recursive=True)) == ["a.py", "sub/b.py"]
+        assert self._names(fs.list_directory(root, "**/*.py")) == ["a.py", "sub/b.py"]
+        assert self._names(fs.list_directory(root, "sub/*.py")) == ["sub/b.py"]
+        assert self._names(fs.list_directory(root, "*.py", recursive=True)) == ["a.py", "sub/b.py"]
+        assert self._names(fs.list_directory(root, "*.py")) == ["a.py"]
+        assert self._names(fs.list_directory(root, "sub/*/*.txt")) == ["sub/deep/c.txt"]
+        dirs = fs.list_directory(root, "*")["directories"]
+        assert [d["name"] for d in dirs] == ["sub"]
+
+    def test_paging_and_sort(self, tmp_path):
+        """按大小/名称排序后分页，has_more 与总数正确"""
+        fs = FileSystemTools([str(tmp_path)])
+        for i, name in enumerate(["c.txt", "a.txt", "d.txt", "b.txt"]):
+            _write(tmp_path / name, "x" * (i + 1))
+
+        page = fs.list_directory(str(tmp_path), "*.txt", offset=1, limit=2)
+        assert [f["name"] for f in page["files"]] == ["b.txt", "c.txt"]
+        assert page["total_files"] == 4 and page["has_more"]
+
+        page = fs.list_directory(str(tmp_path), "*.txt", sort_by="size", reverse=True, limit=3)
+        assert [f["name"] for f in page["files"]] == ["b.txt", "d.txt", "a.txt"]
+
+        last = fs.list_directory(str(tmp_path), "*.txt", offset=3, limit=2)
+        assert [f["name"] for f in last["files"]] == ["d.txt"] and not last["has_more"]
+
+
+    def test_dirs_first_single_cursor(self, tmp_path, monkeypatch):
+        """目录在前、文件在后的同一序列上分页，目录同样只保留 offset+limit 个"""
+        import src.mcp.mcp_filesystem as mcp_filesystem
+        fs = FileSystemTools([str(tmp_path)])
+        for name in ("d2", "d0", "d1"):
+            (tmp_path / name).mkdir()
+        _write(tmp_path / "b.txt", "b")
+        _write(tmp_path / "a.txt", "a")
+
+        kept = []
+        nsmallest = mcp_filesystem.heapq.nsmallest
+        monkeypatch.setattr(mcp_filesystem.heapq, "nsmallest",
+                            lambda n, it, key: kept.append(n) or nsmallest(n, it, key=key))
+
+        pages = [fs.list_directory(str(tmp_path), "*", offset=offset, limit=2) for offset in (0, 2, 4)]
+        assert [([d["name"] for d in p["directories"]], [f["name"] for f in p["files"]]) for p in pages] == [
+            (["d0", "d1"], []), (["d2"], ["a.txt"]), ([], ["b.txt"]),
+        ]
+        assert [p["has_more"] for p in pages] == [True, True, False]
+        assert (pages[0]["total_dirs"], pages[0]["total_files"], pages[0]["total"]) == (3, 2, 5)
+        assert kept == [2, 4, 6]
+
+        page = fs.list_directory(str(tmp_path), "*", sort_by="size", reverse=True, limit=4)
+        assert [d["name"] for d in page["directories"]] == ["d2", "d1", "d0"]
+        assert len(page["files"]) == 1
+
+class TestSummarizeDirectory:
+    """summarize_directory 深度、数量与条目上限测试类"""
+
+    def _tree(self, tmp_path):
+        _write(tmp_path / "a.py", "a")
+        _write(tmp_path / "sub" / "deep" / "deeper" / "c.txt", "ccc")
+        for i in range(5):
+            _write(tmp_path / "many" / f"f{i}.md", "x")
+        _write(tmp_path / ".git" / "HEAD", "ref")
+        return FileSystemTools([str(tmp_path)])
+
+    def test_depth_limit_counts_but_hides(self, tmp_path):
+        """展示层级之下的目录只计入统计，不展开；跳过的目录单独列出"""
+        fs = self._tree(tmp_path)
+        result = fs.summarize_directory(str(tmp_path), max_depth=1)
+        assert (result["total_files"], result["total_size"], result["truncated"]) == (7, 9, False)
+        summary = result["summary"]
+        assert "sub/ (1 文件" in summary
+        assert "deep/" not in summary and "f0.md" not in summary
+        assert "已跳过: .git" in summary
+
+        summary = fs.summarize_directory(str(tmp_path), max_depth=2)["summary"]
+        assert "deep/ (1 文件" in summary and "deeper/" not in summary
+
+    def test_children_and_entry_limits(self, tmp_path):
+        """每个目录最多展示 max_children 项，超出 max_entries 时标记不完整"""
+        fs = self._tree(tmp_path)
+        _write(tmp_path / "other" / "o.txt", "o")
+        summary = fs.summarize_directory(str(tmp_path), max_children=2)["summary"]
+        assert "f1.md" in summary and "f2.md" not in summary
+        assert "… 还有 3 个文件" in summary
+        assert "… 还有 1 个子目录" in summary
+
+        result = fs.summarize_directory(str(tmp_path), max_entries=3)
+        assert result["truncated"] and result["total_files"] < 8
+        assert "⚠️ 条目过多，仅统计了前 3 项" in result["summary"]
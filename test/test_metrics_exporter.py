@@ -0,0 +1,102 @@
+"""
+Prometheus / OpenMetrics 指标导出测试
+"""
+
+import os
+import sys
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_metrics import MetricsCollector
+from src.core.agent_resilience import ResilienceManager
+from src.core.metrics_exporter import _MetricsHandler, render_metrics, write_textfile
+
+
+def _collector() -> MetricsCollector:
+    collector = MetricsCollector(auto_export=False)
+    for duration in (3, 40, 800, 12000):
+        collector._record_metric("llm_call", "kimi", duration, True,
+                                 token_usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+    collector._record_metric("tool_call", "read_file", 20, False, error_message="boom")
+    collector.register_cache("file_read", lambda: {"hits": 3, "misses": 1, "hit_rate": 0.75})
+    return collector
+
+
+def _resilience() -> ResilienceManager:
+    resilience = ResilienceManager()
+    for _ in range(5):
+        resilience._update_circuit_breaker("llm_call", failed=True)
+    return resilience
+
+
+class TestMetricsExporter:
+    """指标渲染、textfile 与 HTTP 端点测试类"""
+
+    def test_openmetrics_format(self):
+        """OpenMetrics：计数器族名不带 _total，以 # EOF 结尾"""
+        text = render_metrics(collector=_collector(), resilience=_resilience())
+        lines = text.splitlines()
+        assert lines[-1] == "# EOF"
+        assert "# TYPE dnm_operations counter" in lines
+        assert 'dnm_operations_total{type="llm_call",name="kimi",result="success"} 4' in lines
+        assert 'dnm_operations_total{type="tool_call",name="read_file",result="failure"} 1' in lines
+        assert 'dnm_llm_tokens_total{kind="prompt"} 40' in lines
+        assert 'dnm_llm_tokens_total{kind="completion"} 20' in lines
+        assert 'dnm_circuit_breaker_state{operation="llm_call",state="OPEN"} 1' in lines
+        assert 'dnm_circuit_breaker_state{operation="llm_call",state="CLOSED"} 0' in lines
+        assert 'dnm_cache_hit_ratio{cache="file_read"} 0.75' in lines
+
+    def test_histogram_buckets(self):
+        """直方图分桶累计且单调，+Inf 等于总数"""
+        text = render_metrics(collector=_collector(), resilience=ResilienceManager())
+        buckets = [
+            line for line in text.splitlines()
+            if line.startswith('dnm_operation_duration_seconds_bucket{type="llm_call"')
+        ]
+        counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+        assert counts == sorted(counts)
+        assert buckets[-1].endswith('le="+Inf"} 4')
+        assert 'dnm_operation_duration_seconds_bucket{type="llm_call",name="kimi",le="0.005"} 1' in buckets
+        assert 'dnm_operation_duration_seconds_bucket{type="llm_call",name="kimi",le="1"} 3' in buckets
+        assert 'dnm_operation_duration_seconds_sum{type="llm_call",name="kimi"} 12.843' in text
+
+    def test_prometheus_text_format_and_textfile(self, tmp_path, monkeypatch):
+        """Prometheus 文本格式：计数器族名带 _total，无 # EOF；textfile 原子写入"""
+        text = render_metrics(openmetrics=False, collector=_collector(), resilience=ResilienceManager())
+        assert "# TYPE dnm_operations_total counter" in text
+        assert "# EOF" not in text
+
+        import src.core.metrics_exporter as exporter
+        monkeypatch.setattr(exporter, "get_metrics_collector", _collector)
+        path = tmp_path / "dnm.prom"
+        write_textfile(str(path))
+        assert 'dnm_operations_total{type="llm_call",name="kimi",result="success"} 4' in path.read_text()
+        assert [p.name for p in tmp_path.iterdir()] == ["dnm.prom"]
+
+    def test_label_escaping(self):
+        """标签值中的引号、反斜杠、换行被转义"""
+        collector = MetricsCollector(auto_export=False)
+        collector._record_metric("command_exec", 'a"b\\c\nd', 1, True)
+        text = render_metrics(collector=collector, resilience=ResilienceManager())
+        assert 'name="a\\"b\\\\c\\nd"' in text
+
+    def test_http_endpoint_content_negotiation(self):
+        """按 Accept 头返回 OpenMetrics 或 Prometheus 文本格式"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        try:
+            request = urllib.request.Request(url, headers={"Accept": "application/openmetrics-text; version=1.0.0"})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                assert response.headers["Content-Type"].startswith("application/openmetrics-text")
+                assert response.read().decode().endswith("# EOF\n")
+            with urllib.request.urlopen(url, timeout=5) as response:
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        finally:
+            server.shutdown()
+            server.server_close()
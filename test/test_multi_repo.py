@@ -0,0 +1,65 @@
+"""
+多仓库 Git 工具测试
+"""
+
+import os
+import subprocess
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.multi_repo_tools import discover_git_repos, format_multi_repo_report, run_multi_repo
+
+
+def _init_repo(path):
+    """在 path 初始化一个空仓库"""
+    path.mkdir(parents=True)
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+
+
+class TestMultiRepo:
+    """discover_git_repos / run_multi_repo 测试类"""
+
+    def test_discover_skips_dependency_dirs(self, tmp_path):
+        """发现嵌套仓库，跳过 node_modules 等目录且不深入已发现的仓库"""
+        _init_repo(tmp_path / "app")
+        _init_repo(tmp_path / "libs" / "core")
+        _init_repo(tmp_path / "app" / "nested")
+        _init_repo(tmp_path / "node_modules" / "pkg")
+        repos = discover_git_repos(str(tmp_path))
+        assert repos == [str(tmp_path / "app"), str(tmp_path / "libs" / "core")]
+
+    def test_discover_submodules(self, tmp_path):
+        """按 .gitmodules 列出已检出的子模块（包括仓库深处的子模块）"""
+        lib = tmp_path / "lib"
+        _init_repo(lib)
+        (lib / "a.txt").write_text("a")
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-c", "protocol.file.allow=always"]
+        subprocess.run(git + ["add", "."], cwd=lib, check=True)
+        subprocess.run(git + ["commit", "-qm", "init"], cwd=lib, check=True)
+
+        app = tmp_path / "work" / "app"
+        _init_repo(app)
+        subprocess.run(git + ["submodule", "add", "-q", str(lib), "vendor/deep/lib"], cwd=app, check=True)
+        (app / "vendor" / "other").mkdir()
+        with open(app / ".gitmodules", "a") as f:
+            f.write('[submodule "other"]\n\tpath = vendor/other\n\turl = ../other\n')
+
+        repos = discover_git_repos(str(tmp_path / "work"), max_depth=1)
+        assert repos == [str(app), str(app / "vendor" / "deep" / "lib")]
+
+    def test_status_summary(self, tmp_path):
+        """并发获取状态并汇总"""
+        _init_repo(tmp_path / "a")
+        _init_repo(tmp_path / "b")
+        (tmp_path / "a" / "new.txt").write_text("x")
+        result = run_multi_repo("status", str(tmp_path), max_workers=2)
+        assert result["succeeded"] == 2
+        assert [r["repo"] for r in result["results"]] == ["a", "b"]
+        assert "1 个变更" in result["results"][0]["message"]
+        assert "✅ 2 成功" in format_multi_repo_report(result)
+
+    def test_unknown_action(self, tmp_path):
+        """不支持的操作返回错误"""
+        assert not run_multi_repo("rebase", str(tmp_path))["success"]
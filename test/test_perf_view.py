@@ -0,0 +1,121 @@
+"""
+实时性能面板测试
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_metrics import MetricsCollector
+from src.core.agent_resilience import ResilienceManager, RetryBudget
+from src.core.agent_tracing import Tracer
+import src.ui.perf_view as perf_view
+from src.ui.perf_view import PerfMonitor, collect_perf_snapshot, render_perf_view, run_perf_view
+
+
+class _MCP:
+    def get_server_states(self):
+        return {"desktop-commander": {"tools": 12, "discovering": False, "calls": 4, "failures": 1,
+                                      "last_status": "error", "last_latency_ms": 850.0}}
+
+
+def _sources(collector=None, tracer=None):
+    resilience = ResilienceManager(retry_budget=RetryBudget())
+    for _ in range(5):
+        resilience._update_circuit_breaker("llm_call", failed=True)
+    return {
+        "collector": collector or MetricsCollector(auto_export=False),
+        "tracer": tracer or Tracer(),
+        "resilience": resilience,
+        "mcp": _MCP(),
+    }
+
+
+class TestPerfView:
+    """/perf 面板数据采集与渲染测试类"""
+
+    def test_inflight_operations(self):
+        """measure_operation 期间出现在进行中列表，结束后移除"""
+        collector = MetricsCollector(auto_export=False)
+        entered, release = threading.Event(), threading.Event()
+
+        def work():
+            with collector.measure_operation("tool_call", "slow_tool"):
+                entered.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=work, name="worker-1")
+        worker.start()
+        assert entered.wait(5)
+        inflight = collector.get_inflight_operations()
+        release.set()
+        worker.join()
+
+        assert [(op["type"], op["name"], op["thread"]) for op in inflight] == [("tool_call", "slow_tool", "worker-1")]
+        assert collector.get_inflight_operations() == []
+
+    def test_snapshot_llm_and_turn(self):
+        """TTFT 取自流式调用，tokens/s 扣除首块等待；上一轮按节点汇总"""
+        collector = MetricsCollector(auto_export=False)
+        collector._record_metric("llm_stream", "kimi", 2200, True,
+                                 additional_data={"ttft_ms": 200.0, "completion_tokens": 100})
+        collector._record_metric("llm_call", "kimi", 1000, True,
+                                 token_usage={"prompt_tokens": 10, "completion_tokens": 50, "total_tokens": 60})
+        collector._record_metric("tool_call", "read_file", 5, True)
+        collector.register_cache("file_read", lambda: {"hits": 3, "misses": 1, "hit_rate": 0.75})
+
+        tracer = Tracer()
+        with tracer.turn("req1"):
+            for name in ("intent_analyzer", "answer_question", "intent_analyzer"):
+                with tracer.span(name, "node"):
+                    pass
+
+        snapshot = collect_perf_snapshot(**_sources(collector, tracer))
+        assert snapshot["window_1m"]["count"] == 3
+        assert snapshot["llm"] == {"calls": 2, "ttft_p50_ms": 200.0, "ttft_last_ms": 200.0, "tokens_per_s": 50.0}
+        nodes = {node["name"]: node["count"] for node in snapshot["last_turn"]["nodes"]}
+        assert nodes == {"intent_analyzer": 2, "answer_question": 1}
+        assert snapshot["circuit_breakers"]["llm_call"]["state"] == "OPEN"
+
+        text = "\n".join(render_perf_view(snapshot))
+        assert "TTFT p50 200ms" in text and "50.0 tokens/s" in text
+        assert "file_read" in text and "75.0%" in text
+        assert "desktop-commander" in text and "失败 1" in text
+        assert "🔴 llm_call" in text
+        assert "[req:req1]" in text
+
+    def test_empty_state_and_once(self, capsys):
+        """没有数据时也能渲染；非终端输出时只输出一次"""
+        run_perf_view(**_sources())
+        out = capsys.readouterr().out
+        assert "暂无追踪" in out and "(无)" in out
+        assert "\033[" not in out
+
+    def test_pinned_monitor_refreshes_during_work(self, monkeypatch):
+        """常驻面板在后台刷新，能看到正在进行的操作；关闭后恢复滚动区域"""
+        class _Tty(io.StringIO):
+            def isatty(self):
+                return True
+
+        monkeypatch.setattr(perf_view.shutil, "get_terminal_size", lambda: os.terminal_size((100, 40)))
+        collector = MetricsCollector(auto_export=False)
+        stream = _Tty()
+        monitor = PerfMonitor(interval=0.05, stream=stream, **_sources(collector))
+        assert monitor.start()
+        assert "\033[1;24r" in stream.getvalue()
+        with collector.measure_operation("llm_call", "kimi"):
+            deadline = time.time() + 5
+            while "kimi" not in stream.getvalue() and time.time() < deadline:
+                time.sleep(0.02)
+        monitor.stop()
+
+        output = stream.getvalue()
+        assert "llm_call" in output and "kimi" in output
+        assert output.endswith("\0338") and "\033[r" in output
+        assert not monitor.running
+        assert not PerfMonitor(stream=io.StringIO()).start()
@@ -0,0 +1,67 @@
+"""
+Code Review 增量缓存测试
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.tools.diff_chunks import DiffChunk, DiffHunk
+from src.tools.review_cache import ReviewCache, hunk_cache_key
+
+
+class TestReviewCache:
+    """ReviewCache / hunk_cache_key 测试类"""
+
+    def test_key_ignores_line_numbers_and_whitespace(self):
+        """代码移动或只改行内/行尾空白时缓存键不变，缩进、内容、模型、版本变化时改变"""
+        a = DiffHunk("a.py", "@@ -10,2 +10,3 @@ def f():", [" x = 1", "+    y  =  2 "])
+        b = DiffHunk("a.py", "@@ -40,2 +41,3 @@ def f():", [" x = 1", "+    y = 2"])
+        c = DiffHunk("a.py", "@@ -10,2 +10,3 @@ def f():", [" x = 1", "+    y = 3"])
+        dedented = DiffHunk("a.py", "@@ -10,2 +10,3 @@ def f():", [" x = 1", "+y = 2"])
+        assert hunk_cache_key(a, "m", "1") == hunk_cache_key(b, "m", "1")
+        assert hunk_cache_key(a, "m", "1") != hunk_cache_key(c, "m", "1")
+        assert hunk_cache_key(a, "m", "1") != hunk_cache_key(dedented, "m", "1")
+        assert hunk_cache_key(a, "m", "1") != hunk_cache_key(a, "m2", "1")
+        assert hunk_cache_key(a, "m", "1") != hunk_cache_key(a, "m", "2")
+
+    def test_persist_and_evict(self, tmp_path):
+        """结果写回磁盘后可重新加载，超出上限时淘汰最久未使用的条目"""
+        path = str(tmp_path / "cache.json")
+        cache = ReviewCache(path, max_entries=2)
+        cache.put("k1", {"issues": []})
+        cache.put("k2", {"issues": [{"severity": "minor"}]})
+        cache.put("k3", {"issues": []})
+        cache.get("k1")
+        cache.save()
+
+        reloaded = ReviewCache(path, max_entries=2)
+        assert reloaded.get("k1") == {"issues": []}
+        assert reloaded.get("k2") is None
+        assert reloaded.get("k3") == {"issues": []}
+        assert reloaded.get_stats()["hits"] == 2
+
+    def test_unparsed_reply_not_cached(self, tmp_path, monkeypatch):
+        """LLM 回复无法解析为 JSON 时不写入缓存，下次重新审查"""
+        pytest.importorskip("langchain_core")
+        import src.tools.code_review_tools as code_review_tools
+
+        cache = ReviewCache(str(tmp_path / "cache.json"))
+        monkeypatch.setattr(code_review_tools, "review_cache", cache)
+        replies = ["抱歉，这段代码我无法给出结构化结果", '{"issues": [], "highlights": ["ok"]}']
+        monkeypatch.setattr(code_review_tools, "llm_code",
+                            SimpleNamespace(invoke=lambda messages: SimpleNamespace(content=replies.pop(0))))
+        hunk = DiffHunk("a.py", "@@ -1,1 +1,1 @@", ["-x = 1", "+x = 2"])
+        chunk = DiffChunk(files=["a.py"], hunks=[hunk], parts=["diff --git a/a.py b/a.py"])
+
+        review = code_review_tools._review_chunk(chunk, 1, 1)
+        assert review["raw"] and cache.get_stats()["entries"] == 0
+
+        assert code_review_tools._review_chunk(chunk, 1, 1)["highlights"] == ["ok"]
+        assert cache.get_stats()["entries"] == 1
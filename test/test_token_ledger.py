@@ -0,0 +1,98 @@
+"""
+Token 与费用账本测试
+"""
+
+import json
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.agent_tracing import traced_node
+from src.core.token_ledger import LedgerEntry, TokenLedger, estimate_cost
+
+
+PRICING = {"kimi": {"prompt": 4.0, "completion": 16.0, "cached_prompt": 1.0}}
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class TestTokenLedger:
+    """TokenLedger 记录、轮转与汇总测试类"""
+
+    def test_estimate_cost(self):
+        """按每百万 token 单价计费，缓存命中的输入按缓存单价"""
+        assert estimate_cost("kimi", 1_000_000, 500_000, pricing=PRICING) == 4.0 + 8.0
+        assert estimate_cost("kimi", 1_000_000, 0, cached_tokens=400_000, pricing=PRICING) == 2.4 + 0.4
+        assert estimate_cost("unknown", 1000, 1000, pricing=PRICING) == 0.0
+
+    def test_record_call_tags_context(self, tmp_path, monkeypatch):
+        """记录请求ID、节点、context_type 与缓存命中"""
+        ledger = TokenLedger(str(tmp_path / "ledger.jsonl"), pricing=PRICING)
+        monkeypatch.setenv("DNM_REQ_ID", "abc12345")
+
+        def node(state):
+            return ledger.record_call(
+                "kimi", [_Message("系统提示"), _Message("解释一下 git rebase")],
+                {"prompt_tokens": 1000, "completion_tokens": 200, "cached_tokens": 600},
+                latency_ms=850.0, context_type="question",
+            )
+
+        entry = traced_node("answer_question", node)({})
+        assert (entry.req_id, entry.node, entry.context_type) == ("abc12345", "answer_question", "question")
+        assert entry.cache_hit and not entry.estimated
+        assert entry.prompt_preview == "解释一下 git rebase"
+        assert abs(entry.cost - (400 * 4.0 + 600 * 1.0 + 200 * 16.0) / 1_000_000) < 1e-12
+
+        with open(ledger.path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 1 and lines[0]["node"] == "answer_question"
+        assert [e.model for e in ledger.iter_entries()] == ["kimi"]
+
+    def test_missing_usage_is_estimated(self, tmp_path):
+        """没有 usage 时按字符估算并标记"""
+        ledger = TokenLedger(str(tmp_path / "ledger.jsonl"), pricing=PRICING)
+        entry = ledger.record_call("kimi", [_Message("a" * 400)], None, 10.0,
+                                   stream=True, completion_text="你好世界")
+        assert entry.estimated and entry.stream
+        assert (entry.prompt_tokens, entry.completion_tokens) == (100, 4)
+
+    def test_rotation(self, tmp_path):
+        """超出大小上限时轮转，只保留 backup_count 个旧文件，读取包含轮转文件"""
+        path = str(tmp_path / "ledger.jsonl")
+        ledger = TokenLedger(path, max_bytes=600, backup_count=2, pricing=PRICING)
+        for i in range(12):
+            ledger.append(LedgerEntry(ts=1000.0 + i, model="kimi", prompt_tokens=i))
+        names = sorted(p.name for p in tmp_path.iterdir())
+        assert names == ["ledger.jsonl", "ledger.jsonl.1", "ledger.jsonl.2"]
+        kept = [e.prompt_tokens for e in ledger.iter_entries()]
+        assert kept == sorted(kept) and kept[-1] == 11 and len(kept) < 12
+
+    def test_summarize_and_report(self, tmp_path):
+        """按模型/节点/上下文汇总，高费用提示词排序"""
+        ledger = TokenLedger(str(tmp_path / "ledger.jsonl"), pricing=PRICING)
+        now = time.time()
+        ledger.append(LedgerEntry(ts=now - 30 * 86400, model="kimi", prompt_tokens=10 ** 6))
+        for tokens, node, prompt_hash in ((1000, "answer_question", "a"), (5000, "generate_command", "b"),
+                                          (1000, "answer_question", "a")):
+            ledger.append(LedgerEntry(
+                ts=now, model="kimi", prompt_tokens=tokens, completion_tokens=100, node=node,
+                cost=estimate_cost("kimi", tokens, 100, pricing=PRICING), prompt_hash=prompt_hash,
+                prompt_preview=f"prompt {prompt_hash}", cache_hit=node == "generate_command",
+            ))
+        summary = ledger.summarize(since=now - 3600)
+        assert summary["calls"] == 3
+        assert summary["prompt_tokens"] == 7000
+        assert summary["by_node"]["answer_question"]["calls"] == 2
+        assert abs(summary["cache_hit_rate"] - 1 / 3) < 1e-9
+        assert [p["prompt_hash"] for p in summary["top_prompts"]] == ["b", "a"]
+        assert summary["top_prompts"][1]["calls"] == 2
+
+        report = ledger.format_report(days=7)
+        assert "按节点" in report and "generate_command" in report and "prompt b" in report
+        assert "暂无" in TokenLedger(str(tmp_path / "empty.jsonl")).format_report()